@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from core.profiling import record_cache
+from .models import CustomUser
+from .revocation import revoked_token_key
+
+# The only user fields the API needs per request; everything else is loaded lazily on access
+USER_CACHE_FIELDS = ("id", "username", "email", "role", "is_active", "is_staff", "is_superuser", "is_deleted")
+
+
+def user_cache_key(user_id):
+    return f"auth_user_{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request user query.
+
+    The handful of fields in USER_CACHE_FIELDS are cached for AUTH_USER_CACHE_TIMEOUT
+    seconds and request.user is built from them, so a cache hit costs no DB queries.
+    The cache entry is dropped whenever the user is saved (accounts.signals).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        # One cache round trip for both the user fields and the revocation marker
+        user_key = user_cache_key(user_id)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        revoked_key = revoked_token_key(jti) if jti else None
+        cached = cache.get_many([key for key in (user_key, revoked_key) if key])
+
+        if revoked_key in cached:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        fields = cached.get(user_key)
+        record_cache(fields is not None, fields is None)
+        if fields is None:
+            fields = (
+                CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values(*USER_CACHE_FIELDS)
+                .first()
+            )
+            if fields is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(user_key, fields, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+
+        if not fields["is_active"] or fields["is_deleted"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # A regular model instance (usable in FK filters and saves) with the remaining fields deferred
+        return CustomUser.from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+
+UserModel = get_user_model()
+
+# bcrypt releases the GIL, so hashes on this pool run in parallel, but never more than
+# PASSWORD_HASH_WORKERS at once per process: a login burst queues here instead of
+# taking every core away from the API workers.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+def _run_hash(func, *args):
+    return _hash_executor.submit(func, *args).result()
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend that verifies (and, when the hasher cost changed, rehashes) passwords on a bounded pool."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user (#20760).
+            _run_hash(make_password, password)
+            return
+
+        is_correct, must_update = _run_hash(verify_password, password, user.password)
+        if not is_correct:
+            return
+        if must_update:
+            # Transparent upgrade to the configured hasher/work factor
+            user.password = _run_hash(make_password, password)
+            user.save(update_fields=["password"])
+        if self.user_can_authenticate(user):
+            return user
+
+    def user_can_authenticate(self, user):
+        # Soft-deleted accounts keep their row (and username) but can no longer log in
+        return super().user_can_authenticate(user) and not getattr(user, "is_deleted", False)
@@ -0,0 +1,27 @@
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def shared_email_ids(user_model):
+    """
+    Ids of the users sharing an email, compared case-insensitively, one list per address:
+    active before soft-deleted, then oldest first. Takes the model so migrations can pass
+    their historical one.
+    """
+    users = user_model.objects.exclude(email='').annotate(email_lower=Lower('email'))
+    shared = users.values('email_lower').annotate(users=Count('id')).filter(users__gt=1).values_list('email_lower', flat=True)
+    ids = {}
+    for email, user_id in users.filter(email_lower__in=shared).order_by('email_lower', 'is_deleted', 'id').values_list('email_lower', 'id'):
+        ids.setdefault(email, []).append(user_id)
+    return list(ids.values())
+
+
+def check_unique_emails(user_model):
+    """Raises RuntimeError listing the conflicting ids when the email constraint can't be added."""
+    shared = shared_email_ids(user_model)
+    if shared:
+        raise RuntimeError(
+            "Emails must be unique (case-insensitively) before the constraint is added, but these "
+            f"users share one: {'; '.join(', '.join(map(str, ids)) for ids in shared)}. Resolve them, "
+            "or run `manage.py clear_duplicate_emails` to keep each address on its first account."
+        )
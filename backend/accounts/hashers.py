@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import BCryptSHA256PasswordHasher
+
+
+class ConfigurableBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """
+    bcrypt_sha256 with the work factor taken from settings.PASSWORD_BCRYPT_ROUNDS.
+
+    Hashes made at any other cost still verify, and must_update() flags them so the
+    login path rehashes them at the configured cost.
+    """
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_BCRYPT_ROUNDS
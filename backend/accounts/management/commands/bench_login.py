@@ -0,0 +1,55 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client
+from accounts.models import CustomUser
+
+BENCH_USERNAME = "bench_login_user"
+BENCH_PASSWORD = "bench-login-Passw0rd"
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput through /accounts/api/login/ against the configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+
+    def handle(self, *args, **options):
+        hasher = get_hasher()
+        start = time.perf_counter()
+        encoded = hasher.encode(BENCH_PASSWORD, hasher.salt())
+        hash_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(f"hasher: {hasher.algorithm}, one hash {hash_ms:.1f}ms")
+
+        user, _ = CustomUser.objects.update_or_create(
+            username=BENCH_USERNAME, defaults={"email": "bench@example.com", "password": encoded}
+        )
+
+        def login(_):
+            client = Client()
+            start = time.perf_counter()
+            response = client.post("/accounts/api/login/", {"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+            elapsed = time.perf_counter() - start
+            close_old_connections()
+            return elapsed, response.status_code == 200
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                results = list(pool.map(login, range(options["logins"])))
+            elapsed = time.perf_counter() - started
+        finally:
+            CustomUser.objects.filter(pk=user.pk).delete()
+
+        latencies = sorted(duration * 1000 for duration, _ in results)
+        failures = sum(1 for _, ok in results if not ok)
+        quantiles = statistics.quantiles(latencies, n=100)
+
+        self.stdout.write(f"logins:     {len(results)} ({failures} failed)")
+        self.stdout.write(f"throughput: {len(results) / elapsed:.1f} logins/s")
+        self.stdout.write(f"latency:    p50={quantiles[49]:.1f}ms p99={quantiles[98]:.1f}ms")
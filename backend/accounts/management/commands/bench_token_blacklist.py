@@ -0,0 +1,78 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from accounts import revocation
+
+JTI_PREFIX = "bench-"
+
+
+class Command(BaseCommand):
+    help = "Fill the token blacklist tables with synthetic rows and time revocation checks and pruning."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--checks", type=int, default=2000)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--keep", action="store_true", help="Leave the synthetic rows in place")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        rng = random.Random(0)
+
+        start = time.perf_counter()
+        jtis = []
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, rows)):
+                jti = f"{JTI_PREFIX}{uuid.UUID(int=rng.getrandbits(128)).hex}"
+                jtis.append(jti)
+                # Half of the tokens have already expired
+                expires_at = now - timedelta(hours=1) if i % 2 else now + timedelta(days=1)
+                batch.append(OutstandingToken(jti=jti, token="", created_at=now, expires_at=expires_at))
+            created = OutstandingToken.objects.bulk_create(batch)
+            # Every third token is blacklisted
+            BlacklistedToken.objects.bulk_create(
+                [BlacklistedToken(token=token) for i, token in enumerate(created, offset) if i % 3 == 0]
+            )
+        self.stdout.write(f"inserted {rows} tokens in {time.perf_counter() - start:.1f}s")
+
+        try:
+            samples = rng.sample(jtis, min(options["checks"], len(jtis)))
+            samples += [uuid.uuid4().hex for _ in range(len(samples))]  # never issued
+
+            self._time("table lookup", samples, lambda jti: BlacklistedToken.objects.filter(token__jti=jti).exists())
+
+            cache.delete(revocation.FILTER_CACHE_KEY)
+            start = time.perf_counter()
+            revocation._revoked_filter = revocation.RevokedTokenFilter()
+            revocation._revoked_filter.might_contain("warm-up")
+            self.stdout.write(f"filter build: {time.perf_counter() - start:.1f}s")
+            self._time("cache + bloom", samples, revocation.is_jti_revoked)
+
+            start = time.perf_counter()
+            call_command("prune_token_blacklist", stdout=self.stdout)
+            self.stdout.write(f"prune total: {time.perf_counter() - start:.1f}s")
+        finally:
+            if not options["keep"]:
+                OutstandingToken.objects.filter(jti__startswith=JTI_PREFIX).delete()
+
+    def _time(self, label, samples, check):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            revoked = sum(1 for jti in samples if check(jti))
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{label:>14}: {elapsed / len(samples) * 1e6:.0f}us/check, "
+            f"{len(queries) / len(samples):.2f} queries/check ({revoked} revoked of {len(samples)})"
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.emails import shared_email_ids
+from accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Clear the email of users whose address another account also has (compared "
+        "case-insensitively), so the unique email constraint can be added. Each address stays "
+        "with one account: active before soft-deleted, then the oldest. Run it before migrating."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only list the users whose email would be cleared")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cleared = sorted(user_id for ids in shared_email_ids(CustomUser) for user_id in ids[1:])
+            if cleared and not options["dry_run"]:
+                CustomUser.objects.filter(id__in=cleared).update(email='')
+        verb = "Would clear" if options["dry_run"] else "Cleared"
+        self.stdout.write(f"{verb} the email of {len(cleared)} users: {', '.join(map(str, cleared)) or '-'}")
@@ -0,0 +1,94 @@
+import csv
+import time
+
+from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from accounts.models import CustomUser
+from core.models import Watchlist
+
+
+def _password(value):
+    """Keeps legacy hashes Django can verify; anything else gets an unusable password (reset on first login)."""
+    try:
+        identify_hasher(value)
+    except ValueError:
+        return make_password(None)
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import users from a CSV with a header row (username,email[,password]). "
+        "password must be a Django-format hash; rows with anything else get an unusable password. "
+        "Existing usernames/emails are skipped. Every imported user gets the default watchlist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            handle = open(options["path"], newline="", encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        imported = skipped = 0
+        start = time.perf_counter()
+        with handle:
+            batch = []
+            for row in csv.DictReader(handle):
+                batch.append(row)
+                if len(batch) >= options["batch_size"]:
+                    created, ignored = self.import_batch(batch)
+                    imported += created
+                    skipped += ignored
+                    batch = []
+            if batch:
+                created, ignored = self.import_batch(batch)
+                imported += created
+                skipped += ignored
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} users ({skipped} skipped) in {elapsed:.1f}s, {rate:.0f} rows/s"
+        ))
+
+    def import_batch(self, rows):
+        users = {}
+        emails = set()
+        for row in rows:
+            username = CustomUser.normalize_username(row["username"].strip())
+            email = BaseUserManager.normalize_email(row.get("email", "").strip())
+            # Emails are unique case-insensitively (unique_nonblank_email_ci)
+            if not username or username in users or (email and email.lower() in emails):
+                continue
+            users[username] = CustomUser(username=username, email=email, password=_password(row.get("password", "")))
+            if email:
+                emails.add(email.lower())
+
+        # One query per batch for both uniqueness checks
+        taken_usernames = set()
+        taken_emails = set()
+        existing = CustomUser.objects.annotate(email_lower=Lower("email")).filter(
+            Q(username__in=list(users)) | Q(email_lower__in=emails)
+        )
+        for username, email in existing.values_list("username", "email_lower"):
+            taken_usernames.add(username)
+            taken_emails.add(email)
+        new_users = [
+            user for user in users.values()
+            if user.username not in taken_usernames and (not user.email or user.email.lower() not in taken_emails)
+        ]
+
+        with transaction.atomic():
+            # bulk_create skips post_save, so the default watchlist is created here
+            created = CustomUser.objects.bulk_create(new_users)
+            Watchlist.objects.bulk_create([Watchlist(user=user, name="my_watchlist") for user in created])
+
+        return len(created), len(rows) - len(created)
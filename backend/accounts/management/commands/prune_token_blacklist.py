@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from accounts.revocation import build_filter_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding/blacklisted tokens in bounded batches, then republish "
+        "the revoked-token bloom filter. Meant to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between batches")
+        parser.add_argument("--max-batches", type=int, default=None)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        batch_size = options["batch_size"]
+        deleted = 0
+        batches = 0
+
+        start = time.perf_counter()
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            # Each batch is its own short transaction; BlacklistedToken rows go with their token (CASCADE)
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            batches += 1
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        prune_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot = build_filter_snapshot()
+        filter_seconds = time.perf_counter() - start
+
+        self.stdout.write(f"pruned {deleted} expired tokens in {batches} batches ({prune_seconds:.2f}s)")
+        self.stdout.write(
+            f"published revoked-token filter up to id {snapshot['last_id']} ({filter_seconds:.2f}s)"
+        )
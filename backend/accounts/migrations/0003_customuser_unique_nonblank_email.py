@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:19
+
+from django.db import migrations, models
+from accounts.emails import check_unique_emails
+
+
+def check_emails(apps, schema_editor):
+    # Shared emails are not cleared here: migrating stops with the ids, and the operator
+    # decides (or runs `manage.py clear_duplicate_emails`) before migrating again
+    check_unique_emails(apps.get_model('accounts', 'CustomUser'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_outstandingtoken_expires_at_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(condition=models.Q(('email', ''), _negated=True), fields=('email',), name='unique_nonblank_email'),
+        ),
+    ]
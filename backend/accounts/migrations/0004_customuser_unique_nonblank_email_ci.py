@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:06
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from accounts.emails import check_unique_emails
+
+
+def check_emails(apps, schema_editor):
+    # Databases that applied 0003 early may still hold Foo@example.com next to foo@example.com
+    check_unique_emails(apps.get_model('accounts', 'CustomUser'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customuser_unique_nonblank_email'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_emails, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='customuser',
+            name='unique_nonblank_email',
+        ),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='unique_nonblank_email_ci'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
+
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -14,6 +16,13 @@ class CustomUser(AbstractUser):
     # Soft delete
     is_deleted = models.BooleanField(default=False)
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Registration relies on this (not a pre-check) to keep emails unique
+            # Case-insensitive: Foo@example.com and foo@example.com are one address
+            models.UniqueConstraint(Lower('email'), condition=~models.Q(email=''), name='unique_nonblank_email_ci'),
+        ]
+
     def delete(self, *args, **kwargs):
         """Soft delete instead of physical delete."""
         self.is_deleted = True
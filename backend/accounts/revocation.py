@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+FILTER_CACHE_KEY = "token_blacklist_filter"
+
+
+def revoked_token_key(jti):
+    return f"revoked_jti_{jti}"
+
+
+def mark_revoked(jti, expires_at):
+    """Caches a revocation marker for `jti` until `expires_at`, after which the token is dead anyway."""
+    remaining = (expires_at - datetime.now(tz=timezone.utc)).total_seconds()
+    if remaining > 0:
+        cache.set(revoked_token_key(jti), True, timeout=int(remaining) + 1)
+
+
+def revoke_token(token):
+    mark_revoked(
+        token[api_settings.JTI_CLAIM],
+        datetime.fromtimestamp(token["exp"], tz=timezone.utc),
+    )
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings. No false negatives; false positives at ~error_rate."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def build_filter_snapshot():
+    """
+    Bloom filter over every blacklisted jti, published to the cache for worker processes to
+    load. Built after `migrate` (accounts.signals.publish_revoked_token_filter) and by
+    prune_token_blacklist, never on a request: it reads the whole table.
+    """
+    started = time.time()
+    # Rows blacklisted in the last TOKEN_BLACKLIST_FILTER_OVERLAP seconds may still be joined by
+    # lower ids committing late, so processes re-read from the last id before that window
+    cutoff = datetime.fromtimestamp(started, tz=timezone.utc) - timedelta(seconds=settings.TOKEN_BLACKLIST_FILTER_OVERLAP)
+    bloom = BloomFilter(settings.TOKEN_BLACKLIST_FILTER_CAPACITY)
+    last_id = settled_id = 0
+    rows = BlacklistedToken.objects.order_by("id").values_list("id", "token__jti", "blacklisted_at")
+    for last_id, jti, blacklisted_at in rows.iterator(chunk_size=10000):
+        bloom.add(jti)
+        if blacklisted_at < cutoff:
+            settled_id = last_id
+    snapshot = {"bloom": bloom, "last_id": last_id, "settled_id": settled_id, "built_at": started}
+    cache.set(FILTER_CACHE_KEY, snapshot, timeout=None)
+    return snapshot
+
+
+class RevokedTokenFilter:
+    """
+    Per-process view of the token blacklist.
+
+    Starts from the snapshot published by `prune_token_blacklist` and catches up at most
+    every TOKEN_BLACKLIST_FILTER_REFRESH seconds with an index range scan over the ids
+    blacklisted since. The scan starts from the highest id seen at least
+    TOKEN_BLACKLIST_FILTER_OVERLAP seconds earlier, not the highest seen so far, so rows
+    committed out of id order within that window are still picked up.
+
+    Until a snapshot has been published (or without a shared cache, where the snapshot
+    built by `migrate` or the command is not visible here) there is no filter and callers
+    check the table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._built_at = 0
+        self._refreshed_at = 0
+        self._warned = False
+        # (time.time(), id): every row with an id up to `id` was visible at that time, or was
+        # committed out of order within the overlap window after it
+        self._checkpoints = []
+
+    def _scan_from(self, now):
+        settled = [row_id for seen_at, row_id in self._checkpoints if seen_at <= now - settings.TOKEN_BLACKLIST_FILTER_OVERLAP]
+        start = settled[-1] if settled else self._checkpoints[0][1]
+        # Older checkpoints are no longer needed
+        self._checkpoints = [checkpoint for checkpoint in self._checkpoints if checkpoint[1] >= start]
+        return start
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._refreshed_at < settings.TOKEN_BLACKLIST_FILTER_REFRESH:
+            return
+        with self._lock:
+            if now - self._refreshed_at < settings.TOKEN_BLACKLIST_FILTER_REFRESH:
+                return
+            self._refreshed_at = now
+            snapshot = cache.get(FILTER_CACHE_KEY)
+            if snapshot is not None and snapshot["built_at"] > self._built_at:
+                # A newer snapshot also drops the jtis pruned since the last one
+                self._bloom = snapshot["bloom"]
+                self._built_at = snapshot["built_at"]
+                self._checkpoints = [
+                    (snapshot["built_at"] - settings.TOKEN_BLACKLIST_FILTER_OVERLAP, snapshot["settled_id"]),
+                    (snapshot["built_at"], snapshot["last_id"]),
+                ]
+            if self._bloom is None:
+                if not self._warned:
+                    self._warned = True
+                    logger.warning("No revoked-token filter published; checking the blacklist table. Run migrate or prune_token_blacklist.")
+                return
+            seen_at = time.time()
+            last_id = self._checkpoints[-1][1]
+            rows = BlacklistedToken.objects.filter(id__gt=self._scan_from(seen_at)).order_by("id").values_list("id", "token__jti")
+            for row_id, jti in rows:
+                self._bloom.add(jti)
+                last_id = max(last_id, row_id)
+            self._checkpoints.append((seen_at, last_id))
+
+    def might_contain(self, jti):
+        """False if `jti` is certainly not blacklisted; True if it may be, or there is no filter yet."""
+        self._refresh()
+        return self._bloom is None or jti in self._bloom
+
+
+_revoked_filter = RevokedTokenFilter()
+
+
+def is_jti_revoked(jti):
+    """
+    Revocation check that normally costs one cache lookup and no DB query.
+
+    1. Revocation markers are written to the shared cache the moment a token is
+       blacklisted, so every worker sees them immediately.
+    2. A bloom filter miss proves the jti was never blacklisted.
+    3. Only bloom hits (real revocations or ~1% false positives) reach the table, and
+       every check does while there is no filter. That includes deployments without a
+       shared cache, where neither markers nor the snapshot reach other processes.
+    """
+    if cache.get(revoked_token_key(jti)):
+        return True
+    if not _revoked_filter.might_contain(jti):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
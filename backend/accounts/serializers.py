@@ -1,8 +1,15 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 from .models import CustomUser
+from .tokens import CachedBlacklistRefreshToken
 
 
 # RegisterSerializer
@@ -12,32 +19,70 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['username', 'email', 'password']
+        # Drop the generated uniqueness validators (one query each); validate() checks both fields at once
+        extra_kwargs = {
+            'username': {'validators': [UnicodeUsernameValidator()]},
+            'email': {'validators': []},
+        }
+        validators = []
 
-    def validate_email(self, value):
-        if CustomUser.objects.filter(email=value).exists():
-            raise serializers.ValidationError("A user with this email already exists.")
-        return value
+    def uniqueness_errors(self, attrs):
+        """One query for both the username and email uniqueness checks."""
+        email = attrs.get('email', '').lower()
+        lookup = Q(username=attrs['username'])
+        if email:
+            # Matches the unique_nonblank_email_ci constraint (and its index): case-insensitive
+            lookup |= Q(email_lower=email) & ~Q(email='')
 
-    def validate_username(self, value):
-        if CustomUser.objects.filter(username=value).exists():
-            raise serializers.ValidationError("A user with this username already exists.")
-        return value
+        errors = {}
+        users = CustomUser.objects.annotate(email_lower=Lower('email')).filter(lookup)
+        for username, existing_email in users.values_list('username', 'email_lower'):
+            if email and existing_email == email:
+                errors['email'] = ["A user with this email already exists."]
+            if username == attrs['username']:
+                errors['username'] = ["A user with this username already exists."]
+        return errors
+
+    def validate(self, attrs):
+        errors = self.uniqueness_errors(attrs)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
     def create(self, validated_data):
-        user = CustomUser.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password'],
-            is_active=True   
-        )
+        # The unique constraints are what actually guarantee uniqueness under concurrent
+        # signups; the user and its default watchlist (core.signals) commit together.
+        try:
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(
+                    username=validated_data['username'],
+                    email=validated_data.get('email', ''),
+                    password=validated_data['password'],
+                    is_active=True   
+                )
+        except IntegrityError:
+            # The conflicting row may be gone again (or not visible yet); never answer with an empty error
+            errors = self.uniqueness_errors(validated_data) or {'email': ["A user with this email or username already exists."]}
+            raise serializers.ValidationError(errors)
         return user
     
 
 
 # LoginSerializer
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = CachedBlacklistRefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Copied into every access token minted from this refresh token
+        token['username'] = user.username
+        token['role'] = user.role
+        return token
+
     def validate(self, attrs):
         user = authenticate(
+            request=self.context.get('request'),
             username=attrs.get('username'), 
             password=attrs.get('password')
         )
@@ -48,7 +93,19 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         if not user.is_active:
             raise AuthenticationFailed('User account is not active')
 
-        data = super().validate(attrs)
+        # authenticate() already checked the password; super().validate() would hash it a second time
+        self.user = user
+        refresh = self.get_token(user)
+        data = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+
         data['message'] = 'Login successful'
         data['username'] = user.username
         return data
+
+
+# Refresh serializer (wired in through SIMPLE_JWT["TOKEN_REFRESH_SERIALIZER"])
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedBlacklistRefreshToken
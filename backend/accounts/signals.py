@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from accounts.models import CustomUser
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+@receiver(post_save,sender=CustomUser)
+def drop_cached_auth_user(sender,instance,**kwargs):
+    # Deactivation, soft delete and role changes must not wait for the cache TTL.
+    # Imported here, like mark_revoked below, so startup doesn't load simplejwt's settings
+    # (and django.test with them) in processes that never authenticate anyone.
+    from accounts.authentication import invalidate_cached_user
+
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save,sender=BlacklistedToken)
+def cache_revoked_jti(sender,instance,created,**kwargs):
+    # Makes the revocation visible to every worker before their bloom filters catch up
+    if created:
+        from accounts.revocation import mark_revoked
+
+        mark_revoked(instance.token.jti, instance.token.expires_at)
+
+
+def publish_revoked_token_filter(sender, using, **kwargs):
+    """
+    post_migrate (connected in AccountsConfig.ready): publishes the revoked-token filter on
+    every deploy, so workers don't check the blacklist table on each refresh until the
+    first prune_token_blacklist run. Reads the whole table, which migrate can afford.
+    """
+    from django.db import DEFAULT_DB_ALIAS, connections
+    from accounts.revocation import build_filter_snapshot
+
+    # Skipped for other databases, and for a migrate that stopped short of the blacklist table
+    if using == DEFAULT_DB_ALIAS and BlacklistedToken._meta.db_table in connections[using].introspection.table_names():
+        build_filter_snapshot()
@@ -1,3 +1,147 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts import revocation
+from accounts.models import CustomUser
+from accounts.serializers import RegisterSerializer
+from core.benchmark import BenchmarkTestCase, measure
+from core.synthetic import PASSWORD, USERNAME_PREFIX
+
+# Each login runs bcrypt at the configured cost, so fewer runs than the other benchmarks
+LOGIN_RUNS = 5
+
+
+class AuthBenchmarks(BenchmarkTestCase):
+    credentials = {"username": f"{USERNAME_PREFIX}0000000", "password": PASSWORD}
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_login(self):
+        results = measure(
+            lambda i: self.client.post("/accounts/api/login/", self.credentials, format="json"),
+            runs=min(LOGIN_RUNS, settings.BENCHMARK_RUNS),
+        )
+        self.assertWithinBaseline("auth.login", results)
+
+    def test_refresh(self):
+        # Refresh tokens rotate, so every run presents the one the previous run got back
+        tokens = [self.client.post("/accounts/api/login/", self.credentials, format="json").data["refresh"]]
+
+        def refresh(i):
+            response = self.client.post("/accounts/api/token/refresh/", {"refresh": tokens[-1]}, format="json")
+            tokens.append(response.data.get("refresh"))
+            return response
+
+        results = measure(refresh)
+        self.assertWithinBaseline("auth.refresh", results)
+
+
+@override_settings(TOKEN_BLACKLIST_FILTER_CAPACITY=1000)
+class RevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="revoked", password="password123")
+        patcher = mock.patch.object(revocation, "_revoked_filter", revocation.RevokedTokenFilter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_blacklisted_refresh_token_rejected_without_filter(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh.blacklist()
+        # As seen from another process: no revocation marker and no published filter
+        cache.clear()
+        response = APIClient().post("/accounts/api/token/refresh/", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 401)
+        # The filter is only built by prune_token_blacklist, never on a request
+        self.assertIsNone(cache.get(revocation.FILTER_CACHE_KEY))
+
+    def test_migrate_publishes_the_filter(self):
+        revoked, valid = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        revoked.blacklist()
+        cache.clear()
+        call_command("migrate", verbosity=0)
+        self.assertIsNotNone(cache.get(revocation.FILTER_CACHE_KEY))
+        # The first check loads the snapshot and catches up; later ones are answered by the filter
+        self.assertFalse(revocation.is_jti_revoked(valid["jti"]))
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation.is_jti_revoked(valid["jti"]))
+        self.assertTrue(revocation.is_jti_revoked(revoked["jti"]))
+
+    @override_settings(TOKEN_BLACKLIST_FILTER_REFRESH=0)
+    def test_catch_up_sees_rows_committed_out_of_order(self):
+        first, late, last = (RefreshToken.for_user(self.user) for _ in range(3))
+        outstanding = {token["jti"]: OutstandingToken.objects.get(jti=token["jti"]) for token in (first, late, last)}
+        BlacklistedToken.objects.create(id=1000, token=outstanding[first["jti"]])
+        BlacklistedToken.objects.create(id=1002, token=outstanding[last["jti"]])
+        revocation.build_filter_snapshot()
+        token_filter = revocation.RevokedTokenFilter()
+        self.assertTrue(token_filter.might_contain(last["jti"]))
+
+        # Committed after id 1002 had been read
+        BlacklistedToken.objects.create(id=1001, token=outstanding[late["jti"]])
+        self.assertTrue(token_filter.might_contain(late["jti"]))
+
+
+class RegistrationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        CustomUser.objects.create_user(username="taken", email="taken@example.com", password="password123")
+
+    def register(self, username, email):
+        return self.client.post(
+            "/accounts/api/register/", {"username": username, "email": email, "password": "password123"}, format="json"
+        )
+
+    def test_duplicate_email_rejected(self):
+        response = self.register("newcomer", "taken@example.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ["email"])
+        self.assertEqual(list(self.register("newcomer", "Taken@Example.com").data), ["email"])
+        self.assertEqual(self.register("newcomer", "new@example.com").status_code, 201)
+
+    def test_constraint_violation_has_an_error(self):
+        # As if the conflicting row was committed after validate() looked
+        with mock.patch.object(RegisterSerializer, "uniqueness_errors", return_value={}):
+            response = self.register("newcomer", "TAKEN@example.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.data)
+
+    def test_clear_duplicate_emails(self):
+        # The constraint keeps real duplicates out of the test database
+        kept = CustomUser.objects.get(username="taken")
+        other = CustomUser.objects.create_user(username="other", email="other@example.com", password="password123")
+        with mock.patch("accounts.management.commands.clear_duplicate_emails.shared_email_ids", return_value=[[kept.id, other.id]]):
+            out = StringIO()
+            call_command("clear_duplicate_emails", "--dry-run", stdout=out)
+            self.assertIn(f"Would clear the email of 1 users: {other.id}", out.getvalue())
+            self.assertEqual(CustomUser.objects.get(id=other.id).email, "other@example.com")
+            call_command("clear_duplicate_emails", stdout=StringIO())
+        self.assertEqual(CustomUser.objects.get(id=other.id).email, "")
+        self.assertEqual(CustomUser.objects.get(id=kept.id).email, "taken@example.com")
+
+
+@override_settings(PASSWORD_BCRYPT_ROUNDS=4)
+class AuthThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rotating_forwarded_for_does_not_reset_the_limit(self):
+        client = APIClient()
+        credentials = {"username": "nobody", "password": "wrong-password"}
+        # auth_ip allows 10 attempts a minute
+        for attempt in range(10):
+            response = client.post("/accounts/api/login/", credentials, format="json", HTTP_X_FORWARDED_FOR=f"10.0.0.{attempt}")
+            self.assertEqual(response.status_code, 401)
+        response = client.post("/accounts/api/login/", credentials, format="json", HTTP_X_FORWARDED_FOR="10.0.0.99")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
@@ -4,13 +4,17 @@ from rest_framework import status
 from .serializers import RegisterSerializer
 from rest_framework import status,permissions
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.tokens import TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .serializers import CustomTokenObtainPairSerializer
+from .revocation import revoke_token
+from .tokens import CachedBlacklistRefreshToken
 
 
 # Register View
 class RegisterAPIView(APIView):
+    throttle_scope = 'auth'
+
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
@@ -22,6 +26,12 @@ class RegisterAPIView(APIView):
 # Login View
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_scope = 'auth'
+
+
+# Refresh View
+class CustomTokenRefreshView(TokenRefreshView):
+    throttle_scope = 'auth'
 
     
 # Logout View
@@ -31,8 +41,10 @@ class LogoutAPIView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = CachedBlacklistRefreshToken(refresh_token)
             token.blacklist()
+            # The access token used for this request stays valid until it expires otherwise
+            revoke_token(request.auth)
             return Response({"message": "Logged out successfully."}, status=status.HTTP_205_RESET_CONTENT)
         except KeyError:
             return Response({"error": "Refresh token required."}, status=status.HTTP_400_BAD_REQUEST)
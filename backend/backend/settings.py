@@ -50,10 +50,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',  # first, so its timings cover everything below
+    'core.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  #Cors orgin middleware for handling cross orgin https request
     'django.middleware.security.SecurityMiddleware',
+    'core.compression.CompressionMiddleware',  # brotli/gzip; must come before anything that reads the body
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.db.ReadReplicaMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -78,16 +82,110 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# Serve the market-data and watchlist endpoints with coroutine views. Experimental: keep it off
+# for production traffic, where these views measured about 4x slower than the sync ones. Only
+# meaningful under an ASGI server (uvicorn backend.asgi:application).
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Threads used to rebuild cold market-data groups in parallel (1 = build inline)
+MARKET_DATA_BUILD_WORKERS = config('MARKET_DATA_BUILD_WORKERS', default=4, cast=int)
+
+# Delta sync (core.changes) only hands out versions of change-log entries at least this many seconds
+# old, so an entry whose transaction commits after a later one's isn't skipped. Keep it above the
+# longest transaction that writes the log (a price batch) plus the replica's lag.
+CHANGE_LOG_SETTLE_SECONDS = config('CHANGE_LOG_SETTLE_SECONDS', default=10, cast=int)
+
+
+# Response compression (core.compression). Smaller bodies are sent as they are.
+RESPONSE_COMPRESS_MIN_SIZE = config('RESPONSE_COMPRESS_MIN_SIZE', default=1024, cast=int)  # bytes
+BROTLI_QUALITY = config('BROTLI_QUALITY', default=4, cast=int)  # 0-11; per-request brotli only
+
+
+# Per-request profiling (core.profiling): one JSON log line per request, and a Server-Timing header
+# for staff users. Off by default.
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=False, cast=bool)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=int)  # logged at WARNING, profiles kept
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)  # share of requests profiled
+PROFILER = config('PROFILER', default='cprofile')  # or 'pyinstrument', if installed
+PROFILE_DIR = config('PROFILE_DIR', default='/tmp/profiles')
+
+# Metrics (core.metrics) at /metrics. Under gunicorn, point METRICS_DIR at a directory that is
+# emptied on every restart so the workers' metrics are added up; unset, each process reports its own.
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)  # seconds
+METRICS_TOKEN = config('METRICS_TOKEN', default='')  # scrapers send "Authorization: Bearer <token>"; unset, /metrics is 404
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO logs every request
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': config('REQUEST_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Endpoint benchmarks (core.benchmark), run as part of `manage.py test`. Query counts may not
+# exceed the baseline. Latency is wall-clock and only gated with BENCHMARK_LATENCY=True, on a
+# quiet machine: p50/p99 may then not exceed TOLERANCE x baseline + SLACK_MS.
+BENCHMARK_BASELINE = config('BENCHMARK_BASELINE', default=str(BASE_DIR / 'benchmark_baseline.json'))
+BENCHMARK_RECORD = config('BENCHMARK_RECORD', default=False, cast=bool)  # write results as the new baseline
+BENCHMARK_SCALE = config('BENCHMARK_SCALE', default=0.002, cast=float)  # fraction of seed_dummy_data --scale 1
+BENCHMARK_RUNS = config('BENCHMARK_RUNS', default=20, cast=int)
+BENCHMARK_LATENCY = config('BENCHMARK_LATENCY', default=False, cast=bool)
+BENCHMARK_LATENCY_TOLERANCE = config('BENCHMARK_LATENCY_TOLERANCE', default=1.5, cast=float)
+BENCHMARK_LATENCY_SLACK_MS = config('BENCHMARK_LATENCY_SLACK_MS', default=5.0, cast=float)
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)  # seconds to keep a connection open
+
 DATABASES = {
-    'default': dj_database_url.config(default=config('DATABASE_URL'))
+    'default': dj_database_url.config(
+        default=config('DATABASE_URL'),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
 }
 
+# Optional read replica for the market-data and watchlist GETs (see core.db.ReplicaRouter)
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
+        test_options={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+
+# Seconds after a market-data group is invalidated during which it is rebuilt from default, not the
+# replica, so a lagging replica can't be cached as the new version. Keep it above the replica's usual lag.
+DATABASE_REPLICA_MAX_LAG = config('DATABASE_REPLICA_MAX_LAG', default=5, cast=int)
+
+# psycopg3's built-in connection pool (PostgreSQL only). Replaces persistent connections.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+if DB_POOL:
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),  # seconds to wait for a free connection
+        }
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.postgresql',
@@ -123,19 +221,41 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 PASSWORD_HASHERS = [
-    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",   
+    "accounts.hashers.ConfigurableBCryptSHA256PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
     "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.ScryptPasswordHasher",
 ]
 
+# bcrypt work factor (2^rounds iterations). Existing hashes are upgraded or downgraded on next login.
+PASSWORD_BCRYPT_ROUNDS = config('PASSWORD_BCRYPT_ROUNDS', default=12, cast=int)
+
+# Threads per process allowed to run password hashes at the same time
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=2, cast=int)
+
+AUTHENTICATION_BACKENDS = ['accounts.backends.PooledModelBackend']
+
 
 
 # User model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 
+# Cache
+# A shared cache (Redis) is needed once there is more than one worker process:
+# token revocation, auth user invalidation and market-data snapshots live here.
+
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -165,20 +285,59 @@ REST_FRAMEWORK = {
  
     'DEFAULT_AUTHENTICATION_CLASSES': (
          
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
-    
+        'accounts.authentication.CachedJWTAuthentication',
+    ),
+
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+
+    # Reverse proxies in front of the app. Per-IP throttles key on the address the last of them
+    # saw (the last NUM_PROXIES entry of X-Forwarded-For); 0 uses REMOTE_ADDR and ignores the
+    # header, which clients control. Behind one nginx/ALB, set 1.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+
+    # Views opt in with `throttle_scope`; see core.throttling
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.UserTokenBucketThrottle',
+        'core.throttling.IPTokenBucketThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'market_data_user': config('THROTTLE_MARKET_DATA_USER', default='120/min'),
+        'market_data_ip': config('THROTTLE_MARKET_DATA_IP', default='300/min'),
+        'watchlist_write_user': config('THROTTLE_WATCHLIST_WRITE_USER', default='60/min'),
+        'watchlist_write_ip': config('THROTTLE_WATCHLIST_WRITE_IP', default='120/min'),
+        'auth_ip': config('THROTTLE_AUTH_IP', default='10/min'),
+    },
 }
 
 
 
+# Seconds request.user fields are served from cache before re-reading the user row
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=1440),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=2),
     "BLACKLIST_AFTER_ROTATION": True,
     "ROTATE_REFRESH_TOKENS": True,
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.CustomTokenRefreshSerializer",
 }
 
+# Revoked refresh-token filter (accounts.revocation): expected blacklist size and
+# how often each process picks up tokens blacklisted elsewhere (seconds)
+TOKEN_BLACKLIST_FILTER_CAPACITY = config('TOKEN_BLACKLIST_FILTER_CAPACITY', default=1_000_000, cast=int)
+TOKEN_BLACKLIST_FILTER_REFRESH = config('TOKEN_BLACKLIST_FILTER_REFRESH', default=30, cast=int)
+# Seconds of recent blacklist rows re-read on every refresh, for rows committed out of id order
+TOKEN_BLACKLIST_FILTER_OVERLAP = config('TOKEN_BLACKLIST_FILTER_OVERLAP', default=60, cast=int)
+
 
 
 # Allow specific trusted domains during development and production
@@ -0,0 +1,23 @@
+"""
+Settings for management commands and worker processes (ingest_prices, the cron jobs).
+
+Same database, cache and feature settings as backend.settings, but only the apps that
+own models these processes read or write: no admin, sessions, messages, staticfiles,
+CORS or DRF, and no middleware. manage.py picks this module for the commands in
+WORKER_COMMANDS; anything else (runserver, migrate, test, shell) gets the full settings.
+"""
+from backend.settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    # Its models only; the rest_framework_simplejwt app would load simplejwt's settings
+    'rest_framework_simplejwt.token_blacklist',
+
+    'accounts',
+    'core',
+]
+
+# Commands don't serve requests; system checks would otherwise import every view
+MIDDLEWARE = []
+ROOT_URLCONF = 'backend.urls_worker'
@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
+from core.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),             # Admin panel
     path('accounts/', include('accounts.urls')), # URLs from accounts app
     path('core/', include('core.urls')),         # URLs from core app
+    path('metrics', MetricsView.as_view(), name='metrics'),  # internal: Prometheus scrapes
 ]
 
@@ -0,0 +1,3 @@
+"""URLconf of backend.settings_worker: commands and workers serve no requests."""
+
+urlpatterns = []
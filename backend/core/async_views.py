@@ -0,0 +1,211 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework import status
+from core.models import Stock, Index, MutualFund, WatchlistMembership, visible_objects
+from core.serializers import StockSerializer, IndexSerializer, MutualFundSerializer
+from rest_framework.settings import api_settings
+from core.market_data import parse_data_types, parse_layout, aget_payload, aget_encoded_body, ainvalidate_user_groups
+from core.compression import negotiate_encoding, encoded_response
+from core.renderers import CompactJSONRenderer
+from core.watchlists import asset_kind, get_watchlist, in_list_order, next_position, parse_asset_id
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines.
+
+    Authentication, permissions and throttling are synchronous in DRF and run in a
+    worker thread; the handler itself runs on the event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class MarketDataGroupedAsyncAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    read_replica = True
+    throttle_scope = 'market_data'
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CompactJSONRenderer]
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user if request.user.is_authenticated else None
+        names = parse_data_types(request)
+        layout = parse_layout(request)
+
+        if request.accepted_renderer.format in ('json', 'compact'):
+            return encoded_response(*await aget_encoded_body(names, user, negotiate_encoding(request), layout))
+
+        response_data = await aget_payload(names, user, layout)
+
+        return Response(response_data)
+
+
+async def _resolve_asset(asset_type, asset_id):
+    """Returns (asset_kind, error_response) for an asset_type/asset_id pair."""
+    kind = asset_kind(asset_type)
+    if kind is None:
+        return None, Response(
+            {"error": f"Invalid asset_type '{asset_type}'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    model_class = WatchlistMembership.ASSET_MODELS[kind]
+    if not await visible_objects(model_class).filter(id=asset_id).aexists():
+        return None, Response(
+            {"error": f"{asset_type} with id {asset_id} not found."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    return kind, None
+
+
+class AddAssetToWatchlistAsyncAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'watchlist_write'
+
+    async def post(self, request, *args, **kwargs):
+        user = request.user
+        asset_type = request.data.get("asset_type")
+        asset_id = request.data.get("asset_id")
+
+        if not all([asset_type, asset_id]):
+            return Response(
+                {"error": "asset_type and asset_id are required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        asset_id = parse_asset_id(asset_id)
+        if asset_id is None:
+            return Response(
+                {"error": "asset_id must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        watchlist = await sync_to_async(get_watchlist)(user, request.data.get("watchlist_id"))
+        if watchlist is None:
+            return Response(
+                {"error": "Watchlist not found. Please contact support."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        kind, error = await _resolve_asset(asset_type, asset_id)
+        if error:
+            return error
+
+        # Like the sync view: a concurrent add of the same asset is answered like a repeat
+        _, created = await WatchlistMembership.objects.aget_or_create(
+            watchlist=watchlist,
+            asset_kind=kind,
+            asset_id=asset_id,
+            defaults={"position": lambda: next_position(watchlist)},
+        )
+
+        if not created:
+            return Response({"message": "Asset already in watchlist."}, status=status.HTTP_200_OK)
+
+        await ainvalidate_user_groups(user)
+
+        return Response({"message": "Asset added to watchlist."}, status=status.HTTP_201_CREATED)
+
+
+class WatchlistAsyncAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+    read_replica = True
+
+    async def get(self, request):
+        user = request.user
+        watchlist = await sync_to_async(get_watchlist)(user, request.query_params.get("watchlist_id"))
+
+        if not watchlist:
+            return Response({"error": "No watchlist found"}, status=404)
+
+        stocks, mfs, indexes = await asyncio.gather(
+            _alist(
+                in_list_order(watchlist, WatchlistMembership.STOCK, Stock.objects.unblocked())
+                .select_related("exchange", "sector", "index")
+            ),
+            _alist(in_list_order(watchlist, WatchlistMembership.MUTUAL_FUND, MutualFund.objects.all())),
+            _alist(in_list_order(watchlist, WatchlistMembership.INDEX, Index.objects.unblocked())),
+        )
+
+        return Response({
+            "stocks": StockSerializer(stocks, many=True).data,
+            "mutual_funds": MutualFundSerializer(mfs, many=True).data,
+            "indexes": IndexSerializer(indexes, many=True).data
+        })
+
+
+class RemoveAssetFromWatchlistAsyncAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'watchlist_write'
+
+    async def delete(self, request, *args, **kwargs):
+        user = request.user
+        asset_type = request.data.get('asset_type')
+        asset_id = request.data.get('asset_id')
+
+        if not all([asset_id, asset_type]):
+            return Response(
+                {"error": "asset_type and asset_id are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        asset_id = parse_asset_id(asset_id)
+        if asset_id is None:
+            return Response(
+                {"error": "asset_id must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        watchlist = await sync_to_async(get_watchlist)(user, request.data.get('watchlist_id'))
+        if watchlist is None:
+            return Response(
+                {'error': 'Watchlist not found. Please contact support.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        kind, error = await _resolve_asset(asset_type, asset_id)
+        if error:
+            return error
+
+        # Through the list's manager, like the sync view
+        deleted, _ = await watchlist.memberships.filter(
+            asset_kind=kind,
+            asset_id=asset_id,
+        ).adelete()
+
+        if deleted:
+            await ainvalidate_user_groups(user)
+            return Response({"message": "Asset removed from watchlist."}, status=status.HTTP_200_OK)
+        else:
+            return Response({"error": "Asset not found in watchlist."}, status=status.HTTP_404_NOT_FOUND)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
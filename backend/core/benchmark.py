@@ -0,0 +1,123 @@
+"""
+Endpoint benchmarks checked against a recorded baseline (settings.BENCHMARK_BASELINE).
+
+Each case calls an endpoint BENCHMARK_RUNS times against synthetic data (core.synthetic)
+and records p50/p99 latency, the most queries any run made and the response size, per
+database vendor. Run `BENCHMARK_RECORD=1 python manage.py test` to write the results as
+the new baseline, and commit it together with the change that moved them. Query budgets
+are always checked; latency only with BENCHMARK_LATENCY=1, since it depends on the machine.
+"""
+import gc
+import json
+import statistics
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from rest_framework.views import APIView
+from core.synthetic import VOLUMES, SyntheticData
+
+
+def measure(request, setup=None, runs=None):
+    """
+    Calls request(i) for each run i, after setup(i) if given (not timed or counted), and
+    returns {"p50_ms", "p99_ms", "queries", "bytes"}. Every response must succeed.
+    Like timeit, garbage is collected between runs rather than during them: with this
+    few runs p99 is close to the slowest run, which a collection would otherwise decide.
+    """
+    runs = runs or settings.BENCHMARK_RUNS
+    latencies = []
+    queries = 0
+    gc_enabled = gc.isenabled()
+    try:
+        for i in range(runs):
+            if setup is not None:
+                setup(i)
+            gc.collect()
+            gc.disable()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request(i)
+                latencies.append((time.perf_counter() - start) * 1000)
+            if gc_enabled:
+                gc.enable()
+            if response.status_code >= 400:
+                raise AssertionError(f"{response.status_code} response: {response.content[:200]!r}")
+            queries = max(queries, len(captured))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if runs > 1 else latencies * 99
+    return {
+        "p50_ms": round(quantiles[49], 2),
+        "p99_ms": round(quantiles[98], 2),
+        "queries": queries,
+        "bytes": len(response.content),
+    }
+
+
+def load_baseline():
+    try:
+        with open(settings.BENCHMARK_BASELINE, encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def record(case, results):
+    baseline = load_baseline()
+    baseline.setdefault(connection.vendor, {})[case] = results
+    with open(settings.BENCHMARK_BASELINE, "w", encoding="utf-8") as handle:
+        json.dump(baseline, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+
+
+def regressions(case, results):
+    """How `results` fall short of the baseline for `case`; empty when they don't or there is none yet."""
+    expected = load_baseline().get(connection.vendor, {}).get(case)
+    if expected is None:
+        return []
+    problems = []
+    if results["queries"] > expected["queries"]:
+        problems.append(f"{results['queries']} queries, budget {expected['queries']}")
+    if not settings.BENCHMARK_LATENCY:
+        return problems
+    for key in ("p50_ms", "p99_ms"):
+        limit = expected[key] * settings.BENCHMARK_LATENCY_TOLERANCE + settings.BENCHMARK_LATENCY_SLACK_MS
+        if results[key] > limit:
+            problems.append(f"{key} {results[key]:.1f}ms, limit {limit:.1f}ms")
+    return problems
+
+
+@tag("benchmark")
+# Cold groups are built on the test connection, so their queries are counted
+@override_settings(MARKET_DATA_BUILD_WORKERS=1)
+class BenchmarkTestCase(TestCase):
+    """
+    Synthetic data at BENCHMARK_SCALE, an empty cache per test and no throttling
+    (the buckets would run dry across runs). Skip with `manage.py test --exclude-tag benchmark`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        volumes = {name: max(round(volume * settings.BENCHMARK_SCALE), 1) for name, volume in VOLUMES.items()}
+        SyntheticData(volumes, seed=0).generate()
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(APIView, "get_throttles", return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertWithinBaseline(self, case, results):
+        if settings.BENCHMARK_RECORD:
+            record(case, results)
+            return
+        problems = regressions(case, results)
+        if problems:
+            self.fail(f"{case} regressed: {'; '.join(problems)} ({results})")
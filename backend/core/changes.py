@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db.models.functions import Now
+from django.utils.module_loading import import_string
+from core.models import ChangeLogEntry, Index, MutualFund, Stock
+from core.compact import watchlisted_ids
+
+# Most log entries one delta response covers; clients page with the returned version
+PAGE_SIZE = 5000
+
+# kind -> (response key, queryset, serializer); blocked objects are reported as deleted.
+# Serializers are imported on first use: record_changes runs in every worker and command,
+# which have no use for DRF.
+KINDS = {
+    "stock": ("stocks", lambda: Stock.objects.unblocked().select_related("exchange", "sector", "index"), "core.serializers.StockSerializer"),
+    "index": ("indexes", lambda: Index.objects.unblocked(), "core.serializers.IndexSerializer"),
+    "mutualfund": ("mutual_funds", lambda: MutualFund.objects.all(), "core.serializers.MutualFundSerializer"),
+}
+
+
+class VersionExpired(Exception):
+    """The requested version is older than the oldest retained log entry."""
+
+
+def record_changes(kind, object_ids, action=ChangeLogEntry.ACTION_UPSERT):
+    ChangeLogEntry.objects.bulk_create(
+        [ChangeLogEntry(kind=kind, object_id=object_id, action=action) for object_id in object_ids]
+    )
+
+
+def _horizon():
+    """
+    The newest version that is safe to hand out: just below the oldest entry written in the
+    last CHANGE_LOG_SETTLE_SECONDS. Ids are assigned on insert but become visible on commit,
+    so with concurrent writers a newer id can commit first; a client that read past it would
+    never see the older one. Waiting until entries settle leaves in-flight transactions
+    time to commit. Both the entries' changed_at and the cutoff come from the database
+    clock, so app servers with skewed clocks can't settle entries early.
+    """
+    cutoff = Now() - timedelta(seconds=settings.CHANGE_LOG_SETTLE_SECONDS)
+    unsettled = ChangeLogEntry.objects.filter(changed_at__gte=cutoff).aggregate(oldest=Min("id"))["oldest"]
+    if unsettled is not None:
+        return unsettled - 1
+    return ChangeLogEntry.objects.aggregate(version=Max("id"))["version"] or 0
+
+
+def current_version():
+    return _horizon()
+
+
+def changes_since(since, user):
+    """
+    Instruments changed after version `since`, in their regular serialized form.
+
+    Each object appears once, in its latest state, however often it changed; objects
+    whose last entry is a deletion are listed under "deleted". At most PAGE_SIZE entries
+    are read per call; "has_more" tells the client to ask again from "version". Entries
+    newer than the settle horizon (_horizon) wait for a later call.
+    """
+    oldest = ChangeLogEntry.objects.aggregate(oldest=Min("id"))["oldest"]
+    if oldest is not None and since < oldest - 1:
+        raise VersionExpired(since)
+
+    entries = list(
+        ChangeLogEntry.objects.filter(id__gt=since, id__lte=_horizon())
+        .order_by("id")
+        .values_list("id", "kind", "object_id", "action")[:PAGE_SIZE + 1]
+    )
+    has_more = len(entries) > PAGE_SIZE
+    entries = entries[:PAGE_SIZE]
+
+    # Later entries win
+    latest = {}
+    for _, kind, object_id, action in entries:
+        latest[kind, object_id] = action
+
+    upserted = {kind: [] for kind in KINDS}
+    deleted = {kind: [] for kind in KINDS}
+    for (kind, object_id), action in latest.items():
+        if action == ChangeLogEntry.ACTION_DELETE:
+            deleted[kind].append(object_id)
+        else:
+            upserted[kind].append(object_id)
+
+    # One query for watchlist_status instead of one per row
+    context = {"user": user, "watchlisted": {kind: set(ids) for kind, ids in watchlisted_ids(user).items()}}
+    payload = {"version": entries[-1][0] if entries else since, "has_more": has_more}
+    for kind, (key, get_queryset, serializer_path) in KINDS.items():
+        objects = list(get_queryset().filter(id__in=upserted[kind])) if upserted[kind] else []
+        payload[key] = import_string(serializer_path)(objects, many=True, context=context).data
+        # Blocked, or deleted by a write whose log entry is not visible yet
+        found = {obj.id for obj in objects}
+        deleted[kind].extend(object_id for object_id in upserted[kind] if object_id not in found)
+    payload["deleted"] = deleted
+    return payload
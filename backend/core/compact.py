@@ -0,0 +1,128 @@
+"""
+The `?format=compact` market-data representation: column/row arrays built from
+values_list(), stocks referencing exchanges/sectors/indexes by id (sent once in
+"lookups"), and the user's watchlisted ids sent once instead of per row, so the
+groups are the same for every user. Values are encoded as in the regular format.
+"""
+from django.utils.module_loading import import_string
+from core.models import Exchange, Index, MutualFund, Sector, Stock, WatchlistMembership, visible_objects
+
+# Serializers by dotted path, imported on first use (see core.market_data)
+LOOKUPS = {
+    "exchanges": (Exchange, "core.serializers.ExchangeSerializer"),
+    "sectors": (Sector, "core.serializers.SectorSerializer"),
+    "indexes": (Index, "core.serializers.IndexSerializer"),
+}
+
+STOCK_COLUMNS = (
+    "id", "symbol", "name", "last_price", "previous_close_price", "currency",
+    "sector", "index", "exchange", "price_updated_at", "updated_at", "is_block",
+)
+INDEX_COLUMNS = ("id", "name", "symbol", "Value", "change", "country", "currency", "created_at", "updated_at", "is_block")
+MUTUAL_FUND_COLUMNS = (
+    "id", "scheme_code", "name", "category", "nav", "nav_date",
+    "one_month_return", "three_month_return", "one_year_return", "three_year_return",
+)
+MUTUAL_FUND_DECIMALS = ("nav", "one_month_return", "three_month_return", "one_year_return", "three_year_return")
+
+
+def _str_or_none(value):
+    return None if value is None else str(value)
+
+
+def _lookups(model, serializer_path, ids):
+    ids = ids - {None}
+    if not ids:
+        return {}
+    serializer_class = import_string(serializer_path)
+    return {row["id"]: row for row in serializer_class(visible_objects(model).filter(id__in=ids), many=True).data}
+
+
+def build_stocks(country):
+    rows = []
+    referenced = {"exchanges": set(), "sectors": set(), "indexes": set()}
+    queryset = Stock.objects.unblocked().filter(exchange__country=country).values_list(*STOCK_COLUMNS)
+    for (pk, symbol, name, last_price, previous_close, currency,
+         sector, index, exchange, price_updated_at, updated_at, is_block) in queryset:
+        # Same arithmetic as Stock.price_difference() / price_difference_percentage()
+        difference = percentage = None
+        if last_price is not None and previous_close is not None:
+            difference = float(last_price - previous_close)
+        if previous_close and last_price is not None:
+            percentage = float((last_price - previous_close) / previous_close * 100)
+        rows.append([
+            pk, symbol, name, _str_or_none(last_price), _str_or_none(previous_close), currency,
+            sector, index, exchange, price_updated_at, updated_at, is_block, difference, percentage,
+        ])
+        referenced["sectors"].add(sector)
+        referenced["indexes"].add(index)
+        referenced["exchanges"].add(exchange)
+
+    lookups = {
+        name: _lookups(model, serializer_path, referenced[name])
+        for name, (model, serializer_path) in LOOKUPS.items()
+    }
+    # Blocked sectors/indexes are left out of the lookups; rows referencing them get None
+    sector_column, index_column = STOCK_COLUMNS.index("sector"), STOCK_COLUMNS.index("index")
+    for row in rows:
+        if row[sector_column] not in lookups["sectors"]:
+            row[sector_column] = None
+        if row[index_column] not in lookups["indexes"]:
+            row[index_column] = None
+
+    return {
+        "columns": [*STOCK_COLUMNS, "price_difference", "price_difference_percentage"],
+        "rows": rows,
+        "lookups": lookups,
+    }
+
+
+def build_indexes(queryset):
+    return {"columns": list(INDEX_COLUMNS), "rows": [list(row) for row in queryset.values_list(*INDEX_COLUMNS)]}
+
+
+def build_mutual_funds():
+    decimals = [i for i, column in enumerate(MUTUAL_FUND_COLUMNS) if column in MUTUAL_FUND_DECIMALS]
+    rows = []
+    for row in MutualFund.objects.values_list(*MUTUAL_FUND_COLUMNS):
+        row = list(row)
+        for i in decimals:
+            row[i] = _str_or_none(row[i])
+        rows.append(row)
+    return {"columns": list(MUTUAL_FUND_COLUMNS), "rows": rows}
+
+
+def watchlisted_ids(user):
+    """{"stock": [...], "mutualfund": [...], "index": [...]} for the user's watchlist, in one query."""
+    watchlisted = {"stock": [], "mutualfund": [], "index": []}
+    if user is None:
+        return watchlisted
+    names = dict(WatchlistMembership.ASSET_KIND_CHOICES)
+    memberships = WatchlistMembership.objects.unblocked().filter(
+        watchlist__user=user, watchlist__is_block=False
+    ).values_list("asset_kind", "asset_id")
+    for kind, asset_id in memberships:
+        watchlisted[names[kind]].append(asset_id)
+    return watchlisted
+
+
+def assemble(groups, layout):
+    """
+    Response body from compact groups ({name: group}) built above.
+
+    layout="columns" keeps the column/row arrays; layout="rows" turns every row into an
+    object keyed by column. Groups without a compact form (regular lists) pass through.
+    """
+    payload = {"lookups": {name: {} for name in LOOKUPS}}
+    for name, group in groups.items():
+        if isinstance(group, list):
+            payload[name] = group
+            continue
+        for lookup, objects in group.get("lookups", {}).items():
+            payload["lookups"][lookup].update(objects)
+        if layout == "columns":
+            payload[name] = {"columns": group["columns"], "rows": group["rows"]}
+        else:
+            columns = group["columns"]
+            payload[name] = [dict(zip(columns, row)) for row in group["rows"]]
+    return payload
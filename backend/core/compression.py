@@ -0,0 +1,102 @@
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from core.profiling import phase
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def accepted_encodings(request):
+    """Content codings the client accepts, ignoring any listed with q=0."""
+    encodings = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        name, _, value = params.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                if float(value) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def negotiate_encoding(request):
+    """Picks 'br', 'gzip' or None for the response to `request`."""
+    encodings = accepted_encodings(request)
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding, level=None):
+    """
+    Compresses `content` with `encoding` ('br' or 'gzip').
+
+    `level` defaults to the per-request setting; bodies that are compressed once
+    and cached can afford the slower, smaller ones.
+    """
+    if encoding == 'br':
+        quality = settings.BROTLI_QUALITY if level is None else level
+        return brotli.compress(content, quality=quality)
+    # Level 6 matches GZipMiddleware
+    return gzip.compress(content, compresslevel=6 if level is None else level, mtime=0)
+
+
+def encoded_response(content, encoding, content_type='application/json'):
+    """HttpResponse for a body that is already rendered and, if `encoding` is set, compressed."""
+    response = HttpResponse(content, content_type=content_type)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that prefers brotli when the client accepts it.
+
+    Responses smaller than RESPONSE_COMPRESS_MIN_SIZE, and responses a view has already
+    encoded (cached market-data bodies), are passed through untouched. Streaming
+    responses and gzip-only clients get Django's gzip handling, including its
+    BREACH padding. Brotli has no such padding; tokens only appear in responses
+    that echo nothing an attacker controls.
+    """
+
+    def process_response(self, request, response):
+        with phase('compress'):
+            return self.compress_response(request, response)
+
+    def compress_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.RESPONSE_COMPRESS_MIN_SIZE:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        encoding = negotiate_encoding(request)
+        if encoding == 'gzip' or (encoding == 'br' and response.streaming):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if encoding is None:
+            # Also covers "gzip;q=0", which GZipMiddleware alone would still gzip
+            return response
+        compressed_content = compress(response.content, 'br')
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+REPLICA_ALIAS = "replica"
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+class ReplicaRouter:
+    """Sends reads to the replica while a read-only view is being served, everything else to default."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA_ALIAS in settings.DATABASES:
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+def has_replica():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def primary_reads():
+    """Reads in the block go to default, even while a read-only view is being served."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReadReplicaMiddleware(MiddlewareMixin):
+    """Routes reads to the replica for GET requests to views that set `read_replica = True`."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if request.method == "GET" and getattr(view_class, "read_replica", False):
+            _use_replica.set(True)
+
+    def process_response(self, request, response):
+        # Worker threads are reused between requests, so always clear the flag
+        _use_replica.set(False)
+        return response
+
+
+def pool_stats():
+    """Connection settings and, when psycopg's pool is enabled, its sizing and wait-time counters."""
+    stats = {}
+    for alias in settings.DATABASES:
+        connection = connections[alias]
+        entry = {
+            "vendor": connection.vendor,
+            "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+            "conn_health_checks": connection.settings_dict["CONN_HEALTH_CHECKS"],
+        }
+        pool = getattr(connection, "pool", None)
+        if pool is not None:
+            # pool_min, pool_max, pool_size, pool_available, requests_waiting,
+            # requests_num, requests_wait_ms, requests_errors, ...
+            entry["pool"] = pool.get_stats()
+        stats[alias] = entry
+    return stats
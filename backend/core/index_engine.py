@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+from core.changes import record_changes
+from core.models import Index, IndexConstituent, Stock
+
+# Bumped whenever constituents change, so every process reloads its engine
+CONSTITUENTS_VERSION_KEY = "index_constituents_version"
+
+
+def _price(value):
+    return np.nan if value is None else float(value)
+
+
+class IndexEngine:
+    """
+    Per-process index calculator built from IndexConstituent rows.
+
+    Each index's constituents are a slice of one flat array of stock ids with a matching
+    weight vector, both fixed when the engine is loaded. Prices are not kept: compute()
+    reads the current prices of the constituents it needs in one query, so writes by other
+    processes or a rolled-back batch can't leave it working from stale ones. Only the
+    indexes containing a changed stock are recomputed, each as two dot products over its
+    own slice.
+
+    value = sum(weight * last_price), change = sum(weight * (last_price - previous_close)).
+    A constituent without a price adds nothing to either.
+    """
+
+    def __init__(self, version, constituents):
+        self.version = version
+        self.index_ids = []
+        offsets = [0]
+        members = []
+        weights = []
+        self.indexes_of_stock = defaultdict(list)
+        for index_id, stock_weights in constituents.items():
+            position = len(self.index_ids)
+            self.index_ids.append(index_id)
+            for stock_id, weight in stock_weights:
+                members.append(stock_id)
+                weights.append(float(weight))
+                self.indexes_of_stock[stock_id].append(position)
+            offsets.append(len(members))
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.members = np.array(members, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float64)
+
+    @classmethod
+    def load(cls, version):
+        constituents = defaultdict(list)
+        rows = IndexConstituent.objects.order_by("index_id", "stock_id").values_list("index_id", "stock_id", "weight")
+        for index_id, stock_id, weight in rows:
+            constituents[index_id].append((stock_id, weight))
+        return cls(version, constituents)
+
+    def affected(self, stock_ids):
+        """Positions of the indexes the given stocks belong to."""
+        return {position for stock_id in stock_ids for position in self.indexes_of_stock.get(stock_id, ())}
+
+    def compute(self, positions):
+        """{index_id: (value, change)} for the given index positions, rounded to the integer fields."""
+        positions = sorted(positions)
+        if not positions:
+            return {}
+        stock_ids = np.unique(np.concatenate([
+            self.members[self.offsets[position]:self.offsets[position + 1]] for position in positions
+        ]))
+        last = np.full(len(stock_ids), np.nan)
+        previous = np.full(len(stock_ids), np.nan)
+        for stock_id, last_price, previous_close in Stock.objects.filter(id__in=stock_ids.tolist()).values_list(
+            "id", "last_price", "previous_close_price"
+        ):
+            i = np.searchsorted(stock_ids, stock_id)
+            last[i], previous[i] = _price(last_price), _price(previous_close)
+
+        results = {}
+        for position in positions:
+            members = np.searchsorted(stock_ids, self.members[self.offsets[position]:self.offsets[position + 1]])
+            weights = self.weights[self.offsets[position]:self.offsets[position + 1]]
+            member_last = last[members]
+            priced = ~np.isnan(member_last)
+            # No previous close: the constituent counts as unchanged
+            member_previous = np.where(np.isnan(previous[members]), member_last, previous[members])
+            value = weights[priced] @ member_last[priced]
+            change = weights[priced] @ (member_last[priced] - member_previous[priced])
+            results[self.index_ids[position]] = (round(value), round(change))
+        return results
+
+
+_engine = None
+
+
+def get_engine():
+    global _engine
+    version = cache.get(CONSTITUENTS_VERSION_KEY, 0)
+    if _engine is None or _engine.version != version:
+        _engine = IndexEngine.load(version)
+    return _engine
+
+
+def constituents_changed():
+    if not cache.add(CONSTITUENTS_VERSION_KEY, 1, timeout=None):
+        cache.incr(CONSTITUENTS_VERSION_KEY)
+
+
+def update_indexes(stocks):
+    """
+    Recomputes Value/change of the indexes containing `stocks` (already saved with their
+    new prices, which are read back in the caller's transaction) and writes the ones that
+    moved. Returns the updated Index instances.
+    """
+    engine = get_engine()
+    results = engine.compute(engine.affected(stock.id for stock in stocks))
+    if not results:
+        return []
+
+    now = timezone.now()
+    updated = []
+    for index in Index.objects.filter(id__in=list(results)).only("id", "Value", "change"):
+        value, change = results[index.id]
+        if (index.Value, index.change) != (value, change):
+            index.Value, index.change, index.updated_at = value, change, now
+            updated.append(index)
+    Index.objects.bulk_update(updated, ["Value", "change", "updated_at"])
+    record_changes("index", [index.id for index in updated])
+    return updated
@@ -0,0 +1,49 @@
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from core.models import WatchlistItem, WatchlistMembership
+from core.watchlists import copy_watchlist_items, kinds_by_content_type, reconcile_watchlist_memberships
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy WatchlistItem rows into WatchlistMembership in short batches. Run it with --all "
+        "after migrating, next to the old code, then with --after <the last id it reported> "
+        "--reconcile just before the new code goes live, to pick up items the old code wrote, "
+        "deleted or blocked in between. Rows already copied are skipped."
+    )
+
+    def add_arguments(self, parser):
+        start = parser.add_mutually_exclusive_group(required=True)
+        start.add_argument("--after", type=int, help="Only copy items with a greater id (the last id printed by the previous run)")
+        start.add_argument("--all", action="store_true", help="Copy from the first item, scanning the whole table")
+        parser.add_argument(
+            "--reconcile", action="store_true",
+            help="Then remove memberships whose item was deleted and copy is_block from the items. "
+                 "Only before the switch: memberships added by the new code have no item.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        if options["after"] is not None and options["after"] < 0:
+            raise CommandError("--after must be a non-negative item id")
+        start = time.perf_counter()
+        kinds = kinds_by_content_type(ContentType)
+        read, last_id = copy_watchlist_items(
+            WatchlistItem, WatchlistMembership, kinds,
+            after=options["after"] or 0, batch_size=options["batch_size"], sleep=options["sleep"],
+        )
+        self.stdout.write(
+            f"copied {read} watchlist items up to id {last_id} ({time.perf_counter() - start:.2f}s)"
+        )
+        if options["reconcile"]:
+            start = time.perf_counter()
+            removed, updated = reconcile_watchlist_memberships(
+                WatchlistItem, WatchlistMembership, kinds, sleep=options["sleep"],
+            )
+            self.stdout.write(
+                f"removed {removed} memberships of deleted items, updated is_block on {updated} "
+                f"({time.perf_counter() - start:.2f}s)"
+            )
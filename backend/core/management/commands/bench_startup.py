@@ -0,0 +1,86 @@
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MANAGE = str(settings.BASE_DIR / "manage.py")
+
+# (label, interpreter arguments, DJANGO_SETTINGS_MODULE; None leaves the choice to manage.py or the module)
+TARGETS = [
+    ("python -c pass", ["-c", "pass"], None),
+    ("manage.py check (web)", [MANAGE, "check"], "backend.settings"),
+    ("manage.py check (worker)", [MANAGE, "check"], "backend.settings_worker"),
+    ("import backend.wsgi", ["-c", "import backend.wsgi"], None),
+    ("import backend.asgi", ["-c", "import backend.asgi"], None),
+]
+
+
+def _imports(stderr):
+    """(module, cumulative µs, depth) per line of `python -X importtime` output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        yield name.strip(), int(cumulative), (len(name) - len(name.lstrip()) - 1) // 2
+
+
+def _top_level(imports, entry=None):
+    """The imports made by the script itself, or by the `entry` module it imports."""
+    top, nested = [], []
+    # A module's own imports are printed before it, one level deeper
+    for name, cumulative, depth in imports:
+        if depth == 1:
+            nested.append((name, cumulative))
+        elif depth == 0:
+            top.extend(nested if name == entry else [(name, cumulative)])
+            nested = []
+    return sorted(top, key=lambda item: -item[1])
+
+
+class Command(BaseCommand):
+    help = (
+        "Time cold starts, each in a fresh interpreter: manage.py under the web and worker "
+        "settings, and importing the WSGI/ASGI application. Runs against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument(
+            "--command", action="append", dest="commands", default=[],
+            help="Also time a manage.py command line, with the settings manage.py picks for it, "
+                 "e.g. --command 'ingest_prices --help'. Repeatable.",
+        )
+        parser.add_argument("--top", type=int, default=0, help="Show each target's N slowest top-level imports")
+
+    def handle(self, *args, **options):
+        targets = TARGETS + [(f"manage.py {line}", [MANAGE, *shlex.split(line)], None) for line in options["commands"]]
+
+        self.stdout.write(f"{'target':<34} {'p50':>8} {'min':>8} {'max':>8} {'modules':>8}")
+        for label, arguments, settings_module in targets:
+            durations = [self.run(arguments, settings_module)[0] for _ in range(options["runs"])]
+            # Separate run: -X importtime slows the interpreter down
+            imports = list(_imports(self.run(arguments, settings_module, importtime=True)[1]))
+            self.stdout.write(
+                f"{label:<34} {statistics.median(durations):>6.0f}ms {min(durations):>6.0f}ms "
+                f"{max(durations):>6.0f}ms {len(imports):>8}"
+            )
+            entry = arguments[1].split()[-1] if arguments[0] == "-c" and arguments[1].startswith("import ") else None
+            for name, cumulative in _top_level(imports, entry)[:options["top"]]:
+                self.stdout.write(f"    {cumulative / 1000:>7.1f}ms  {name}")
+
+    def run(self, arguments, settings_module, importtime=False):
+        env = {name: value for name, value in os.environ.items() if name != "DJANGO_SETTINGS_MODULE"}
+        if settings_module:
+            env["DJANGO_SETTINGS_MODULE"] = settings_module
+        command = [sys.executable, *(["-X", "importtime"] if importtime else []), *arguments]
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode:
+            raise CommandError(f"{shlex.join(arguments)} exited with {result.returncode}:\n{result.stderr[-2000:]}")
+        return elapsed, result.stderr
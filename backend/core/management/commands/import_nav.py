@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from core.nav import import_batch, parse_amfi, recompute_returns, stage
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream an AMFI NAV file (semicolon-delimited daily NAVAll.txt or history download; - for stdin), "
+        "upsert funds by scheme code and their NAV history, then recompute NAVs and 1m/3m/1y/3y returns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--skip-returns", action="store_true", help="Only load NAVs, e.g. when importing several files")
+
+    def handle(self, *args, **options):
+        if options["path"] == "-":
+            handle = sys.stdin
+        else:
+            try:
+                handle = open(options["path"], encoding="utf-8", errors="replace")
+            except OSError as exc:
+                raise CommandError(exc)
+
+        timings = {}
+        imported = 0
+        try:
+            records = parse_amfi(handle)
+            while True:
+                with stage(timings, "parse"):
+                    batch = []
+                    for record in records:
+                        batch.append(record)
+                        if len(batch) >= options["batch_size"]:
+                            break
+                if not batch:
+                    break
+                imported += import_batch(batch, timings)
+        except ValueError as exc:
+            raise CommandError(exc)
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+        funds = 0
+        if not options["skip_returns"]:
+            funds = recompute_returns(timings)
+
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name:>16}: {seconds:.2f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} NAVs, recomputed returns for {funds} funds in {sum(timings.values()):.2f}s"
+        ))
@@ -0,0 +1,50 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.ingestion import apply_price_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply price ticks from a CSV with a header row (symbol,last_price[,previous_close_price]). "
+        "Use - to read from stdin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options["path"] == "-":
+            handle = sys.stdin
+        else:
+            try:
+                handle = open(options["path"], newline="", encoding="utf-8")
+            except OSError as exc:
+                raise CommandError(exc)
+
+        read = updated = 0
+        start = time.perf_counter()
+        batch = []
+        try:
+            for row in csv.DictReader(handle):
+                batch.append((row["symbol"].strip(), row["last_price"], row.get("previous_close_price")))
+                if len(batch) >= options["batch_size"]:
+                    updated += len(apply_price_batch(batch))
+                    read += len(batch)
+                    batch = []
+            if batch:
+                updated += len(apply_price_batch(batch))
+                read += len(batch)
+        except (KeyError, ValueError) as exc:
+            raise CommandError(f"Bad row after {read} ticks: {exc}")
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {read} ticks, {updated} stocks changed, in {elapsed:.2f}s"
+        ))
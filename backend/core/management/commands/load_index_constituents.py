@@ -0,0 +1,52 @@
+import csv
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.index_engine import constituents_changed, update_indexes
+from core.models import Index, IndexConstituent, Stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace the constituents of the indexes in a CSV with a header row "
+        "(index_symbol,stock_symbol,weight), then recompute their values."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+
+    def handle(self, *args, **options):
+        rows = defaultdict(dict)
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as handle:
+                for row in csv.DictReader(handle):
+                    rows[row["index_symbol"].strip()][row["stock_symbol"].strip()] = Decimal(row["weight"])
+        except OSError as exc:
+            raise CommandError(exc)
+        except (KeyError, InvalidOperation) as exc:
+            raise CommandError(f"Bad row: {exc}")
+
+        indexes = dict(Index.objects.filter(symbol__in=list(rows)).values_list("symbol", "id"))
+        stock_symbols = {symbol for members in rows.values() for symbol in members}
+        stocks = dict(Stock.objects.filter(symbol__in=stock_symbols).values_list("symbol", "id"))
+        missing = (set(rows) - set(indexes)) | (stock_symbols - set(stocks))
+        if missing:
+            raise CommandError(f"Unknown symbols: {', '.join(sorted(missing))}")
+
+        with transaction.atomic():
+            # bulk_create sends no signals, so engines are told to reload here
+            IndexConstituent.objects.filter(index_id__in=indexes.values()).delete()
+            IndexConstituent.objects.bulk_create([
+                IndexConstituent(index_id=indexes[index_symbol], stock_id=stocks[stock_symbol], weight=weight)
+                for index_symbol, members in rows.items()
+                for stock_symbol, weight in members.items()
+            ])
+            constituents_changed()
+            updated = update_indexes(Stock.objects.filter(id__in=stocks.values()))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {sum(len(members) for members in rows.values())} constituents for {len(rows)} indexes, "
+            f"{len(updated)} index values updated"
+        ))
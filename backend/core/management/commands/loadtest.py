@@ -0,0 +1,47 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Fire concurrent GET requests at a running server and report throughput and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="e.g. http://127.0.0.1:8000/core/api/market-data/?data_type=indian_stocks")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--token", help="JWT access token sent as a Bearer Authorization header")
+
+    def handle(self, *args, **options):
+        url = options["url"]
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Bearer {options['token']}"
+
+        def fetch(_):
+            request = urllib.request.Request(url, headers=headers)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    ok = response.status < 400
+            except urllib.error.URLError:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(fetch, range(options["requests"])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(duration * 1000 for duration, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        quantiles = statistics.quantiles(latencies, n=100)
+
+        self.stdout.write(f"requests:   {len(results)} ({errors} errors)")
+        self.stdout.write(f"throughput: {len(results) / elapsed:.1f} req/s")
+        self.stdout.write(f"latency:    p50={quantiles[49]:.1f}ms p95={quantiles[94]:.1f}ms p99={quantiles[98]:.1f}ms")
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete market-data change-log entries older than --days. Clients syncing from a "
+        "pruned version get 410 and refetch the full list. Meant to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=2)
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted = 0
+        while True:
+            ids = list(
+                ChangeLogEntry.objects.filter(changed_at__lt=cutoff)
+                .order_by("id")
+                .values_list("id", flat=True)[:options["batch_size"]]
+            )
+            if not ids:
+                break
+            ChangeLogEntry.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+        self.stdout.write(f"pruned {deleted} change-log entries older than {options['days']} days")
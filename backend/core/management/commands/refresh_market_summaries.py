@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.rollups import refresh_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild every sector and exchange summary. Price batches keep the affected ones up to "
+        "date; run this after loading data by other means or moving stocks between sectors."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        refresh_summaries()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed market summaries in {time.perf_counter() - start:.2f}s"))
@@ -1,13 +1,26 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from accounts.models import CustomUser
-from core.models import Exchange, Index, Sector, Stock, MutualFund, Watchlist, WatchlistItem
-from django.contrib.contenttypes.models import ContentType
+from core import synthetic
+from core.models import Exchange, Index, Sector, Stock, MutualFund, Watchlist, WatchlistMembership
 
 class Command(BaseCommand):
-    help = "Seed the database with dummy data for testing."
+    help = (
+        "Seed the database with dummy data for testing. With --scale, generate deterministic "
+        "synthetic data instead: at --scale 1, 50k stocks, 20k funds, 1M users and 10M watchlist items."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, help="Fraction of production volumes to generate, e.g. 0.01 or 1")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        for name in synthetic.VOLUMES:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f"Override the number of {name}")
 
     def handle(self, *args, **kwargs):
+        if kwargs["scale"] is not None:
+            return self.seed_scale(kwargs)
+
         # -------------------------
         # Create a test user
         # -------------------------
@@ -75,20 +88,39 @@ class Command(BaseCommand):
         # -------------------------
         # Add Stocks to Watchlist
         # -------------------------
-        stock_ct = ContentType.objects.get_for_model(Stock)
-        WatchlistItem.objects.get_or_create(watchlist=watchlist, content_type=stock_ct, object_id=tcs.id)
-        WatchlistItem.objects.get_or_create(watchlist=watchlist, content_type=stock_ct, object_id=apple.id)
+        WatchlistMembership.objects.get_or_create(watchlist=watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=tcs.id)
+        WatchlistMembership.objects.get_or_create(watchlist=watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=apple.id)
 
         # -------------------------
         # Add Mutual Funds to Watchlist
         # -------------------------
-        mf_ct = ContentType.objects.get_for_model(MutualFund)
-        WatchlistItem.objects.get_or_create(watchlist=watchlist, content_type=mf_ct, object_id=mf1.id)
+        WatchlistMembership.objects.get_or_create(
+            watchlist=watchlist, asset_kind=WatchlistMembership.MUTUAL_FUND, asset_id=mf1.id
+        )
 
         # -------------------------
         # Add Index to Watchlist
         # -------------------------
-        index_ct = ContentType.objects.get_for_model(Index)
-        WatchlistItem.objects.get_or_create(watchlist=watchlist, content_type=index_ct, object_id=nifty50.id)
+        WatchlistMembership.objects.get_or_create(
+            watchlist=watchlist, asset_kind=WatchlistMembership.INDEX, asset_id=nifty50.id
+        )
 
         self.stdout.write(self.style.SUCCESS("Dummy data seeded successfully!"))
+
+    def seed_scale(self, options):
+        if synthetic.exists():
+            raise CommandError("Synthetic data already exists; generate into an empty database")
+        volumes = {
+            name: options[name] if options[name] is not None else round(volume * options["scale"])
+            for name, volume in synthetic.VOLUMES.items()
+        }
+        generator = synthetic.SyntheticData(volumes, seed=options["seed"], batch_size=options["batch_size"])
+        created = generator.generate()
+
+        for name, seconds in generator.timings.items():
+            self.stdout.write(f"{name:>18}: {seconds:.2f}s")
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{count} {name}" for name, count in created.items())
+            + f" created in {sum(generator.timings.values()):.1f}s"
+            + f" (password for every user: {synthetic.PASSWORD})"
+        ))
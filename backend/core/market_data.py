@@ -0,0 +1,456 @@
+import asyncio
+import contextvars
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from core import compact
+from core.compression import brotli, compress
+from core.db import has_replica, primary_reads
+from core.metrics import market_data_body_cache, market_data_cache
+from core.profiling import phase, record_cache
+from core.watchlists import user_watchlists
+from core.models import (
+    Exchange, Stock, Index, MutualFund, Sector, SectorSummary, ExchangeSummary,
+)
+
+CACHE_TIMEOUT = 60  # seconds
+
+# Cached bodies are compressed once, so they get slower, denser settings than per-request compression
+BODY_COMPRESS_LEVELS = {"gzip": 9, "br": 9}
+
+
+class MarketDataGroup:
+    """One `data_type` of the market-data endpoint: how to query, serialize and cache it."""
+
+    def __init__(self, name, get_queryset, serializer_path, per_user=False, build_compact=None, watchlist_kind=None):
+        self.name = name
+        self.get_queryset = get_queryset
+        self.serializer_path = serializer_path
+        self.per_user = per_user
+        # Shared groups are built without a user; rows of this kind get the requesting user's
+        # watchlist_status afterwards (apply_watchlist_status)
+        self.watchlist_kind = watchlist_kind
+        # Builds the `?format=compact` form (see core.compact); groups without one are sent as usual
+        self.build_compact = build_compact
+
+    @cached_property
+    def serializer_class(self):
+        # Imported on first use: workers and commands load this module only to invalidate groups
+        return import_string(self.serializer_path)
+
+    def is_compact(self, compact):
+        return compact and self.build_compact is not None
+
+    def cache_key(self, user, compact=False):
+        if self.per_user:
+            return f"{self.name}_user_{user.id}"
+        if self.is_compact(compact):
+            return f"{self.name}_compact"
+        return self.name
+
+    def serialize(self, instances, user):
+        return self.serializer_class(instances, many=True, context={"user": user}).data
+
+    def build(self, user, compact=False):
+        if self.is_compact(compact):
+            return self.build_compact()
+        # Shared groups are cached for everyone, so nothing user-specific may go into them
+        user = user if self.per_user else None
+        return self.serialize(self.get_queryset(user), user)
+
+    async def abuild(self, user, compact=False):
+        if self.is_compact(compact):
+            return await sync_to_async(self.build_compact)()
+        user = user if self.per_user else None
+        instances = [obj async for obj in self.get_queryset(user)]
+        # Serializer method fields may still query (watchlist_status, generic assets),
+        # so serialization runs in a worker thread.
+        return await sync_to_async(self.serialize)(instances, user)
+
+
+def _stocks(country):
+    return lambda user: (
+        Stock.objects.unblocked().filter(exchange__country=country).select_related("exchange", "sector", "index")
+    )
+
+
+def _indian_indexes(user):
+    return Index.objects.unblocked().filter(country__iexact="India")
+
+
+def _global_indexes(user):
+    return Index.objects.unblocked().exclude(country__iexact="India")
+
+
+GROUPS = {
+    group.name: group
+    for group in [
+        MarketDataGroup(
+            "indian_stocks", _stocks("India"), "core.serializers.StockSerializer", watchlist_kind="stock",
+            build_compact=lambda: compact.build_stocks("India"),
+        ),
+        MarketDataGroup(
+            "us_stocks", _stocks("USA"), "core.serializers.StockSerializer", watchlist_kind="stock",
+            build_compact=lambda: compact.build_stocks("USA"),
+        ),
+        MarketDataGroup(
+            "indian_indexes", _indian_indexes, "core.serializers.IndexSerializer",
+            build_compact=lambda: compact.build_indexes(_indian_indexes(None)),
+        ),
+        MarketDataGroup(
+            "global_indexes", _global_indexes, "core.serializers.IndexSerializer",
+            build_compact=lambda: compact.build_indexes(_global_indexes(None)),
+        ),
+        MarketDataGroup(
+            "mutual_funds", lambda user: MutualFund.objects.all(), "core.serializers.MutualFundSerializer",
+            watchlist_kind="mutualfund", build_compact=compact.build_mutual_funds,
+        ),
+        MarketDataGroup(
+            "watchlists",
+            # Assets are loaded by WatchlistSerializer's list serializer (core.watchlists.attach_assets)
+            user_watchlists,
+            "core.serializers.WatchlistSerializer",
+            per_user=True,
+        ),
+        # Rollups maintained by core.rollups after every price batch
+        MarketDataGroup(
+            "sector_summary",
+            lambda user: SectorSummary.objects.filter(sector__is_block=False).select_related("sector"),
+            "core.serializers.SectorSummarySerializer",
+        ),
+        MarketDataGroup(
+            "exchange_summary", lambda user: ExchangeSummary.objects.select_related("exchange"), "core.serializers.ExchangeSummarySerializer"
+        ),
+    ]
+}
+
+
+# model -> the shared groups showing its rows, dropped from the cache when one is saved or deleted
+GROUPS_BY_MODEL = {
+    Stock: ["indian_stocks", "us_stocks", "sector_summary", "exchange_summary"],
+    Index: ["indian_stocks", "us_stocks", "indian_indexes", "global_indexes"],
+    Sector: ["indian_stocks", "us_stocks", "sector_summary"],
+    Exchange: ["indian_stocks", "us_stocks", "exchange_summary"],
+    MutualFund: ["mutual_funds"],
+}
+
+
+def parse_data_types(request):
+    data_types = request.query_params.get("data_type", "indian_stocks")
+    requested_types = [t.strip() for t in data_types.split(",")]
+    # Keep the response order stable regardless of the order in the query string
+    return [name for name in GROUPS if name in requested_types]
+
+
+def parse_layout(request):
+    """None for the regular format; "rows" or "columns" for `?format=compact[&layout=columns]`."""
+    if request.accepted_renderer.format != "compact":
+        return None
+    return "columns" if request.query_params.get("layout") == "columns" else "rows"
+
+
+def _cache_keys(names, user, compact=False):
+    # Per-user groups have nothing to show anonymous visitors and are never cached for them
+    return {
+        name: GROUPS[name].cache_key(user, compact)
+        for name in names
+        if user is not None or not GROUPS[name].per_user
+    }
+
+
+# Threads are only started on first use, so processes that never rebuild a group pay nothing
+_executor = ThreadPoolExecutor(
+    max_workers=max(settings.MARKET_DATA_BUILD_WORKERS, 1), thread_name_prefix="market-data"
+)
+
+
+def _primary_key(cache_key):
+    # Set for DATABASE_REPLICA_MAX_LAG seconds when the entry is invalidated (see _mark_invalidated)
+    return f"{cache_key}_primary"
+
+
+def _mark_invalidated(cache_keys):
+    """Has the next rebuilds of these entries read default: the replica may not have the write yet."""
+    if has_replica():
+        cache.set_many({_primary_key(key): 1 for key in cache_keys}, timeout=settings.DATABASE_REPLICA_MAX_LAG)
+
+
+def _lookup_keys(cache_keys):
+    keys = list(cache_keys.values())
+    return keys + [_primary_key(key) for key in keys] if has_replica() else keys
+
+
+def _build(name, user, compact, primary):
+    with primary_reads() if primary else nullcontext():
+        return GROUPS[name].build(user, compact)
+
+
+async def _abuild(name, user, compact, primary):
+    with primary_reads() if primary else nullcontext():
+        return await GROUPS[name].abuild(user, compact)
+
+
+def _build_in_worker(name, user, compact, primary):
+    # Worker threads hold their own DB connections; recycle them the way a request would
+    close_old_connections()
+    try:
+        return _build(name, user, compact, primary)
+    finally:
+        close_old_connections()
+
+
+def _build_concurrently(names, user, compact=False, primary=()):
+    workers = min(settings.MARKET_DATA_BUILD_WORKERS, len(names))
+    if workers <= 1:
+        return {name: _build(name, user, compact, name in primary) for name in names}
+    # Run in a copy of the request's context so DB routing (read replica) carries over
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, _build_in_worker, name, user, compact, name in primary)
+        for name in names
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _split_cached(names, cache_keys, cached):
+    """(results found in `cached`, names to rebuild, names to rebuild from default)."""
+    results = {}
+    missing = []
+    for name in names:
+        if name not in cache_keys:
+            results[name] = []
+        elif cache_keys[name] in cached:
+            results[name] = cached[cache_keys[name]]
+        else:
+            missing.append(name)
+    primary = {name for name in missing if _primary_key(cache_keys[name]) in cached}
+    return results, missing, primary
+
+
+def _record_lookups(cache_keys, missing):
+    record_cache(len(cache_keys) - len(missing), len(missing))
+    for name in cache_keys:
+        market_data_cache.inc(group=name, result="miss" if name in missing else "hit")
+
+
+def get_groups(names, user, compact=False):
+    """
+    Returns {name: data} for the requested groups.
+
+    Cache hits are fetched in one get_many round trip; only the missing groups are
+    rebuilt, concurrently, and written back with one set_many.
+    """
+    cache_keys = _cache_keys(names, user, compact)
+    with phase("cache"):
+        cached = cache.get_many(_lookup_keys(cache_keys))
+
+    results, missing, primary = _split_cached(names, cache_keys, cached)
+    _record_lookups(cache_keys, missing)
+
+    if missing:
+        with phase("build"):
+            built = _build_concurrently(missing, user, compact, primary)
+        with phase("cache"):
+            cache.set_many({cache_keys[name]: built[name] for name in missing}, timeout=CACHE_TIMEOUT)
+        results.update(built)
+
+    return {name: results[name] for name in names}
+
+
+async def aget_groups(names, user, compact=False):
+    cache_keys = _cache_keys(names, user, compact)
+    with phase("cache"):
+        cached = await cache.aget_many(_lookup_keys(cache_keys))
+
+    results, missing, primary = _split_cached(names, cache_keys, cached)
+    _record_lookups(cache_keys, missing)
+
+    if missing:
+        with phase("build"):
+            built = await asyncio.gather(*(_abuild(name, user, compact, name in primary) for name in missing))
+        built = dict(zip(missing, built))
+        with phase("cache"):
+            await cache.aset_many({cache_keys[name]: built[name] for name in missing}, timeout=CACHE_TIMEOUT)
+        results.update(built)
+
+    return {name: results[name] for name in names}
+
+
+def apply_watchlist_status(groups, watchlisted):
+    """
+    Sets watchlist_status on the rows of the user's watchlisted assets, in the shared groups
+    of `groups` ({name: rows}), which are built and cached with it False for everyone.
+    `watchlisted` is compact.watchlisted_ids(user).
+    """
+    for name, rows in groups.items():
+        ids = set(watchlisted.get(GROUPS[name].watchlist_kind, ()))
+        if ids:
+            # Copies of the changed rows only; the others may be shared with the cache
+            groups[name] = [{**row, "watchlist_status": True} if row["id"] in ids else row for row in rows]
+    return groups
+
+
+def _needs_watchlist_status(names, user):
+    return user is not None and any(GROUPS[name].watchlist_kind for name in names)
+
+
+def get_payload(names, user, layout=None):
+    """Response data for the requested groups: regular format, or compact when a layout is given."""
+    if layout is None:
+        groups = get_groups(names, user)
+        if _needs_watchlist_status(names, user):
+            apply_watchlist_status(groups, compact.watchlisted_ids(user))
+        return groups
+    payload = compact.assemble(get_groups(names, user, compact=True), layout)
+    payload["watchlisted"] = compact.watchlisted_ids(user)
+    return payload
+
+
+async def aget_payload(names, user, layout=None):
+    if layout is None:
+        groups = await aget_groups(names, user)
+        if _needs_watchlist_status(names, user):
+            apply_watchlist_status(groups, await sync_to_async(compact.watchlisted_ids)(user))
+        return groups
+    payload = compact.assemble(await aget_groups(names, user, compact=True), layout)
+    payload["watchlisted"] = await sync_to_async(compact.watchlisted_ids)(user)
+    return payload
+
+
+def _version_key(name):
+    return f"market_data_version_{name}"
+
+
+def invalidate_groups(names):
+    """
+    Drops the cached data of the given shared groups, so the next request rebuilds them.
+
+    Encoded bodies span several groups and are not deleted; instead each group's version
+    is bumped, and a body built against an older version is ignored when read. With a
+    read replica, the rebuilds in the next DATABASE_REPLICA_MAX_LAG seconds read default.
+    """
+    keys = []
+    for name in names:
+        keys.append(GROUPS[name].cache_key(None))
+        if GROUPS[name].build_compact is not None:
+            keys.append(GROUPS[name].cache_key(None, compact=True))
+        if not cache.add(_version_key(name), 1, timeout=None):
+            cache.incr(_version_key(name))
+    _mark_invalidated(keys)
+    cache.delete_many(keys)
+
+
+def _user_version_key(user):
+    return f"market_data_user_version_{user.id}"
+
+
+def invalidate_user_groups(user):
+    """
+    Drops the user's cached per-user groups (their watchlists) after they change them,
+    and bumps their version so their encoded bodies are rebuilt (see invalidate_groups).
+    """
+    keys = [group.cache_key(user) for group in GROUPS.values() if group.per_user]
+    _mark_invalidated(keys)
+    cache.delete_many(keys)
+    if not cache.add(_user_version_key(user), 1, timeout=None):
+        cache.incr(_user_version_key(user))
+
+
+async def ainvalidate_user_groups(user):
+    keys = [group.cache_key(user) for group in GROUPS.values() if group.per_user]
+    if has_replica():
+        await cache.aset_many({_primary_key(key): 1 for key in keys}, timeout=settings.DATABASE_REPLICA_MAX_LAG)
+    await cache.adelete_many(keys)
+    if not await cache.aadd(_user_version_key(user), 1, timeout=None):
+        await cache.aincr(_user_version_key(user))
+
+
+def _is_personal(names, user, layout):
+    """Whether the body depends on the user: their watchlists, watchlisted ids or watchlist_status flags."""
+    if user is None:
+        return False
+    return layout is not None or any(GROUPS[name].per_user for name in names) or _needs_watchlist_status(names, user)
+
+
+def _body_cache_key(names, layout, user=None):
+    key = f"market_data_body_{layout or 'regular'}_" + ",".join(names)
+    return f"{key}_user_{user.id}" if user is not None else key
+
+
+def _body_lookup_keys(names, user, layout):
+    """[body key, *version keys]: the groups' versions, plus the user's for a personal body."""
+    if not _is_personal(names, user, layout):
+        return [_body_cache_key(names, layout), *(_version_key(name) for name in names)]
+    return [_body_cache_key(names, layout, user), *(_version_key(name) for name in names), _user_version_key(user)]
+
+
+def _current_body(cached, keys):
+    """(body or None if missing/outdated, the versions a rebuilt body is stored with)."""
+    versions = [cached.get(key, 0) for key in keys[1:]]
+    body = cached.get(keys[0])
+    if body is not None and body["versions"] != versions:
+        body = None
+    return body, versions
+
+
+def _encode_body(data, versions):
+    # core.renderers imports DRF, which only the web processes need (see MarketDataGroup.serializer_class)
+    from core.renderers import dumps
+
+    with phase("encode"):
+        body = {"versions": versions, "identity": dumps(data)}
+        if len(body["identity"]) >= settings.RESPONSE_COMPRESS_MIN_SIZE:
+            for encoding, level in BODY_COMPRESS_LEVELS.items():
+                if encoding == "br" and brotli is None:
+                    continue
+                body[encoding] = compress(body["identity"], encoding, level)
+    return body
+
+
+def _pick_encoding(body, encoding):
+    if encoding in body:
+        return body[encoding], encoding
+    return body["identity"], None
+
+
+def _record_body_lookup(body, layout):
+    record_cache(int(body is not None), int(body is None))
+    market_data_body_cache.inc(layout=layout or "regular", result="miss" if body is None else "hit")
+
+
+def get_encoded_body(names, user, encoding, layout=None):
+    """
+    Returns (content, content_encoding) for a JSON response of the requested groups.
+
+    The rendered body, plus gzip/brotli versions once it reaches RESPONSE_COMPRESS_MIN_SIZE,
+    is cached for CACHE_TIMEOUT, so a hit costs one cache lookup and no encoding work.
+    The body is fetched together with its groups' versions (see invalidate_groups).
+    Bodies that depend on the user are cached per user, and also carry the user's version,
+    which invalidate_user_groups bumps when they change their watchlists.
+    """
+    keys = _body_lookup_keys(names, user, layout)
+    with phase("cache"):
+        body, versions = _current_body(cache.get_many(keys), keys)
+    _record_body_lookup(body, layout)
+    if body is None:
+        body = _encode_body(get_payload(names, user, layout), versions)
+        with phase("cache"):
+            cache.set(keys[0], body, timeout=CACHE_TIMEOUT)
+    return _pick_encoding(body, encoding)
+
+
+async def aget_encoded_body(names, user, encoding, layout=None):
+    keys = _body_lookup_keys(names, user, layout)
+    with phase("cache"):
+        body, versions = _current_body(await cache.aget_many(keys), keys)
+    _record_body_lookup(body, layout)
+    if body is None:
+        body = await sync_to_async(_encode_body)(await aget_payload(names, user, layout), versions)
+        with phase("cache"):
+            await cache.aset(keys[0], body, timeout=CACHE_TIMEOUT)
+    return _pick_encoding(body, encoding)
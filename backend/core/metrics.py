@@ -0,0 +1,374 @@
+"""
+In-process metrics, served in the Prometheus text format at /metrics.
+
+Updates go to a per-thread shard, so recording never takes a lock or touches a file. With
+METRICS_DIR set, a background thread in each process (gunicorn workers, ingest_prices)
+writes its totals to METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL seconds and at
+exit, and /metrics adds up all the files:
+counters and histograms from every process that ever wrote one, gauges only from
+processes still running. Empty METRICS_DIR whenever the service is restarted.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the +Inf bucket is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.gauge_values = {}
+        # Called before this process's values are read: on flush, and on scrape without METRICS_DIR
+        self.collectors = []
+        # Called by the scraping process only; return {key: value} for gauges nothing else records
+        self.scrape_collectors = []
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()  # only taken the first time a thread records something
+        # The process the flush thread runs in; threads don't survive a fork (gunicorn --preload)
+        self._flusher_pid = None
+        self._flusher = None
+
+    def shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def recorded(self):
+        if settings.METRICS_DIR and self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def _start_flusher(self):
+        with self._shards_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="metrics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self._flush_if_enabled)
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            if self._flusher_pid != pid:
+                return
+            self._flush_if_enabled()
+
+    def _flush_if_enabled(self):
+        if not settings.METRICS_DIR:
+            return
+        try:
+            self.flush()
+        except OSError:
+            logger.exception("Could not write metrics to %s", settings.METRICS_DIR)
+
+    def snapshot(self):
+        """This process's values: {"series": {key: value or histogram counts}, "gauges": {key: value}}."""
+        for collect in self.collectors:
+            collect()
+        series = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # list() copies without releasing the GIL, so concurrent updates can't break the iteration
+            for key, value in list(shard.items()):
+                if isinstance(value, list):
+                    total = series.setdefault(key, [0] * len(value))
+                    for i, count in enumerate(list(value)):
+                        total[i] += count
+                else:
+                    series[key] = series.get(key, 0) + value
+        gauges = dict(self.gauge_values)
+        # inc()/dec() gauges are kept in the shards like counters, but must be reported as gauges
+        for key in [key for key in series if isinstance(self.metrics[key[0]], Gauge)]:
+            gauges[key] = gauges.get(key, 0) + series.pop(key)
+        return {"series": series, "gauges": gauges}
+
+    def flush(self):
+        snapshot = self.snapshot()
+        data = {kind: [[name, labels, value] for (name, labels), value in values.items()] for kind, values in snapshot.items()}
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self):
+        """Values of every process (see the module docstring), or of this one without METRICS_DIR."""
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self.flush()
+        series = {}
+        gauges = {}
+        for filename in os.listdir(settings.METRICS_DIR):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, filename), encoding="utf-8") as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data["series"]:
+                key = (name, tuple(labels))
+                if isinstance(value, list):
+                    total = series.setdefault(key, [0] * len(value))
+                    for i, count in enumerate(value):
+                        total[i] += count
+                else:
+                    series[key] = series.get(key, 0) + value
+            if _alive(int(filename[:-len(".json")])):
+                for name, labels, value in data["gauges"]:
+                    key = (name, tuple(labels))
+                    gauges[key] = self.metrics[name].combine(gauges.get(key), value)
+        return {"series": series, "gauges": gauges}
+
+    def render(self):
+        collected = self.collect()
+        for collect in self.scrape_collectors:
+            collected["gauges"].update(collect())
+        by_metric = {}
+        for kind in ("series", "gauges"):
+            for (name, labels), value in collected[kind].items():
+                by_metric.setdefault(name, {})[labels] = value
+
+        lines = []
+        for name in sorted(self.metrics):
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(by_metric.get(name, {}).items()):
+                lines.extend(metric.exposition(dict(zip(metric.labelnames, labels)), value))
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        registry.metrics[name] = self
+
+    def key(self, labels):
+        return self.name, tuple(str(labels[name]) for name in self.labelnames)
+
+    def exposition(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = registry.shard()
+        key = self.key(labels)
+        shard[key] = shard.get(key, 0) + amount
+        registry.recorded()
+
+
+class Gauge(Metric):
+    """Per-process value: set() replaces it, inc()/dec() move it. Processes are summed, or maxed with aggregate="max"."""
+
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=(), aggregate="sum"):
+        super().__init__(name, help, labelnames)
+        self.aggregate = aggregate
+
+    def combine(self, current, value):
+        if current is None:
+            return value
+        return max(current, value) if self.aggregate == "max" else current + value
+
+    def set(self, value, **labels):
+        registry.gauge_values[self.key(labels)] = value
+        registry.recorded()
+
+    def inc(self, amount=1, **labels):
+        shard = registry.shard()
+        key = self.key(labels)
+        shard[key] = shard.get(key, 0) + amount
+        registry.recorded()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = registry.shard()
+        key = self.key(labels)
+        # One count per bucket (not cumulative) plus +Inf, then the sum of observations
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+        registry.recorded()
+
+    def exposition(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), value[:-1]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+# Every metric is declared here, so each process can render the ones recorded by the others
+
+http_requests = Counter("http_requests_total", "Requests served, by view, method and status class.", ["view", "method", "status"])
+http_request_duration = Histogram("http_request_duration_seconds", "Request latency by view.", ["view"])
+http_streaming_responses = Gauge("http_streaming_responses_active", "Streaming responses still being sent.")
+
+market_data_cache = Counter(
+    "market_data_cache_requests_total", "Market-data group cache lookups by group and result (hit/miss).", ["group", "result"]
+)
+market_data_body_cache = Counter(
+    "market_data_body_cache_requests_total", "Encoded market-data body cache lookups by layout and result.", ["layout", "result"]
+)
+market_data_price_age = Gauge("market_data_price_age_seconds", "Seconds since the most recent stock price update.")
+
+ingestion_ticks = Counter("ingestion_ticks_total", "Price ticks applied, by result (changed/unchanged).", ["result"])
+ingestion_batch_duration = Histogram("ingestion_batch_duration_seconds", "Time to apply and commit one price batch.")
+ingestion_last_batch = Gauge(
+    "ingestion_last_batch_timestamp_seconds", "Unix time the last price batch was committed.", aggregate="max"
+)
+
+db_pool = Gauge("db_pool_connections", "Database pool connections by alias and state (size/available/waiting).", ["alias", "state"])
+
+
+def _collect_pool_stats():
+    from core.db import pool_stats
+
+    for alias, stats in pool_stats().items():
+        pool = stats.get("pool")
+        if pool is None:
+            continue
+        db_pool.set(pool.get("pool_size", 0), alias=alias, state="size")
+        db_pool.set(pool.get("pool_available", 0), alias=alias, state="available")
+        db_pool.set(pool.get("requests_waiting", 0), alias=alias, state="waiting")
+
+
+registry.collectors.append(_collect_pool_stats)
+
+
+def _collect_price_age():
+    # Read from the database, so it holds however prices were updated
+    from core.models import Stock
+
+    latest = Stock.objects.aggregate(latest=Max("price_updated_at"))["latest"]
+    if latest is None:
+        return {}
+    return {market_data_price_age.key({}): (timezone.now() - latest).total_seconds()}
+
+
+registry.scrape_collectors.append(_collect_price_age)
+
+
+class MetricsMiddleware:
+    """Request count and latency per view, and streaming responses in flight."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.record(request, response, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, start)
+
+    def record(self, request, response, start):
+        match = request.resolver_match
+        view = match.view_name if match and match.view_name else "unmatched"
+        http_request_duration.observe(time.perf_counter() - start, view=view)
+        http_requests.inc(view=view, method=request.method, status=f"{response.status_code // 100}xx")
+        if response.streaming:
+            track = self.track_async_stream if response.is_async else self.track_stream
+            response.streaming_content = track(response.streaming_content)
+        return response
+
+    @staticmethod
+    def track_stream(content):
+        http_streaming_responses.inc()
+        try:
+            yield from content
+        finally:
+            http_streaming_responses.dec()
+
+    @staticmethod
+    async def track_async_stream(content):
+        http_streaming_responses.inc()
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            http_streaming_responses.dec()
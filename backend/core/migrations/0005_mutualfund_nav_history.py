@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mutualfund',
+            name='nav_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mutualfund',
+            name='one_month_return',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='mutualfund',
+            name='scheme_code',
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='mutualfund',
+            name='three_month_return',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='mutualfund',
+            name='three_year_return',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AlterField(
+            model_name='mutualfund',
+            name='one_year_return',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.CreateModel(
+            name='MutualFundNAV',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nav', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('fund', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nav_history', to='core.mutualfund')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fund', 'date'), name='unique_fund_nav_date')],
+            },
+        ),
+    ]
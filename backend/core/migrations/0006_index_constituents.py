@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_mutualfund_nav_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexConstituent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.DecimalField(decimal_places=6, default=1, max_digits=18)),
+                ('index', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='constituent_weights', to='core.index')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='index_memberships', to='core.stock')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='index',
+            name='constituents',
+            field=models.ManyToManyField(blank=True, related_name='member_of_indexes', through='core.IndexConstituent', to='core.stock'),
+        ),
+        migrations.AddConstraint(
+            model_name='indexconstituent',
+            constraint=models.UniqueConstraint(fields=('index', 'stock'), name='unique_index_constituent'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_index_constituents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeSummary',
+            fields=[
+                ('stock_count', models.PositiveIntegerField(default=0)),
+                ('advancers', models.PositiveIntegerField(default=0)),
+                ('decliners', models.PositiveIntegerField(default=0)),
+                ('unchanged', models.PositiveIntegerField(default=0)),
+                ('avg_change_percentage', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('watch_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exchange', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.exchange')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SectorSummary',
+            fields=[
+                ('stock_count', models.PositiveIntegerField(default=0)),
+                ('advancers', models.PositiveIntegerField(default=0)),
+                ('decliners', models.PositiveIntegerField(default=0)),
+                ('unchanged', models.PositiveIntegerField(default=0)),
+                ('avg_change_percentage', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('watch_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sector', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.sector')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:36
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0007_market_summaries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='index',
+            index=models.Index(django.db.models.functions.text.Upper('country'), condition=models.Q(('is_block', False)), name='index_unblocked_country'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(condition=models.Q(('is_block', False)), fields=['exchange'], name='stock_unblocked_exchange'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(condition=models.Q(('is_block', False)), fields=['user'], name='watchlist_unblocked_user'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlistitem',
+            index=models.Index(condition=models.Q(('is_block', False)), fields=['content_type', 'object_id'], name='watchlistitem_unblocked_asset'),
+        ),
+    ]
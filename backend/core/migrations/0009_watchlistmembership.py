@@ -0,0 +1,67 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Hash partitions of core_watchlistmembership on PostgreSQL. Changing it later means
+# rebuilding the table, so it is sized for growth: a few million rows per partition.
+PARTITIONS = 16
+
+
+def create_table(apps, schema_editor):
+    model = apps.get_model('core', 'WatchlistMembership')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(model)
+        return
+
+    # A watchlist's rows all land in one partition, so reading or changing a list touches
+    # one partition's (small, cache-resident) primary key index
+    table = schema_editor.quote_name(model._meta.db_table)
+    default_sql = schema_editor.sql_create_table
+    schema_editor.sql_create_table = default_sql + ' PARTITION BY HASH ("watchlist_id")'
+    try:
+        schema_editor.create_model(model)
+    finally:
+        schema_editor.sql_create_table = default_sql
+    for remainder in range(PARTITIONS):
+        partition = schema_editor.quote_name(f'{model._meta.db_table}_p{remainder}')
+        schema_editor.execute(
+            f'CREATE TABLE {partition} PARTITION OF {table} '
+            f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})'
+        )
+
+
+def drop_table(apps, schema_editor):
+    # Dropping the partitioned table drops its partitions
+    schema_editor.delete_model(apps.get_model('core', 'WatchlistMembership'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unblocked_partial_indexes'),
+    ]
+
+    # The table is created by create_table (partitioned on PostgreSQL), after the model is in the state
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='WatchlistMembership',
+                    fields=[
+                        ('pk', models.CompositePrimaryKey('watchlist', 'asset_kind', 'asset_id', blank=True, editable=False, primary_key=True, serialize=False)),
+                        ('asset_kind', models.PositiveSmallIntegerField(choices=[(1, 'stock'), (2, 'mutualfund'), (3, 'index')])),
+                        ('asset_id', models.BigIntegerField()),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('is_block', models.BooleanField(default=False)),
+                        ('watchlist', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='core.watchlist')),
+                    ],
+                    options={
+                        'indexes': [models.Index(condition=models.Q(('is_block', False)), fields=['asset_kind', 'asset_id', 'watchlist'], name='membership_unblocked_asset')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
@@ -0,0 +1,28 @@
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+
+def report_pending_items(apps, schema_editor):
+    # The copy itself is `manage.py backfill_watchlist_memberships`: a full-table copy here
+    # would run inside `migrate`, with no way to pace it or pick up where it stopped
+    WatchlistItem = apps.get_model('core', 'WatchlistItem')
+    if WatchlistItem.objects.using(schema_editor.connection.alias).exists():
+        logger.warning(
+            "Watchlist items are not copied by this migration; run "
+            "`manage.py backfill_watchlist_memberships --all`, then `--after <last id> --reconcile` "
+            "just before switching to the new code."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_watchlistmembership'),
+    ]
+
+    operations = [
+        migrations.RunPython(report_pending_items, migrations.RunPython.noop),
+    ]
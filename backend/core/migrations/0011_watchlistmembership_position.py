@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_backfill_watchlist_memberships'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchlistmembership',
+            name='position',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,10 +1,24 @@
 from django.db import models
+from django.db.models.functions import Now, Upper
 from django.utils import timezone
 from accounts.models import CustomUser
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 
+class BlockableQuerySet(models.QuerySet):
+    """For models with `is_block`. Default managers stay unfiltered so the admin and FKs still see blocked rows."""
+
+    def unblocked(self):
+        return self.filter(is_block=False)
+
+
+def visible_objects(model):
+    """All rows of `model` a user may see: blocked ones excluded where the model can be blocked."""
+    queryset = model._default_manager.all()
+    return queryset.unblocked() if isinstance(queryset, BlockableQuerySet) else queryset
+
+
 class Exchange(models.Model):
     name = models.CharField(max_length=100)
     country = models.CharField(max_length=100, blank=True, null=True)
@@ -26,17 +40,47 @@ class Index(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     is_block = models.BooleanField(default=False)
+    # Value/change are recomputed from these on every price batch; indexes without constituents are maintained by hand
+    constituents = models.ManyToManyField('Stock', through='IndexConstituent', related_name='member_of_indexes', blank=True)
+
+    objects = BlockableQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The market-data groups filter on country__iexact
+            models.Index(Upper('country'), condition=models.Q(is_block=False), name='index_unblocked_country'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.symbol or 'N/A'})"
 
 
+class IndexConstituent(models.Model):
+    """
+    A stock's membership of an index. The index value is sum(weight * last_price) over
+    its constituents (core.index_engine), so weight is the stock's units in the basket.
+    """
+    index = models.ForeignKey('Index', on_delete=models.CASCADE, related_name='constituent_weights')
+    stock = models.ForeignKey('Stock', on_delete=models.CASCADE, related_name='index_memberships')
+    weight = models.DecimalField(max_digits=18, decimal_places=6, default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['index', 'stock'], name='unique_index_constituent'),
+        ]
+
+    def __str__(self):
+        return f"{self.stock} in {self.index} ({self.weight})"
+
+
 class Sector(models.Model):
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     is_block = models.BooleanField(default=False)
 
+    objects = BlockableQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -54,6 +98,13 @@ class Stock(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_block = models.BooleanField(default=False)
 
+    objects = BlockableQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['exchange'], condition=models.Q(is_block=False), name='stock_unblocked_exchange'),
+        ]
+
     def price_difference(self):
         if self.last_price is not None and self.previous_close_price is not None:
             return self.last_price - self.previous_close_price
@@ -69,16 +120,36 @@ class Stock(models.Model):
 
 
 class MutualFund(models.Model):
+    scheme_code = models.CharField(max_length=20, unique=True, blank=True, null=True)  # AMFI scheme code
     name = models.CharField(max_length=150)
     category = models.CharField(max_length=100, blank=True, null=True)
     nav = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
-    one_year_return = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # in %
+    nav_date = models.DateField(blank=True, null=True)
+    # Returns in %, recomputed from NAV history by import_nav (core.nav)
+    one_month_return = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    three_month_return = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    one_year_return = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)  # in %
+    three_year_return = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)  # annualised
 
 
     def __str__(self):
         return self.name
 
 
+class MutualFundNAV(models.Model):
+    fund = models.ForeignKey(MutualFund, on_delete=models.CASCADE, related_name='nav_history')
+    date = models.DateField()
+    nav = models.DecimalField(max_digits=14, decimal_places=4)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fund', 'date'], name='unique_fund_nav_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.fund} {self.date}: {self.nav}"
+
+
 
 class Watchlist(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -87,11 +158,64 @@ class Watchlist(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_block = models.BooleanField(default=False)
 
+    objects = BlockableQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user'], condition=models.Q(is_block=False), name='watchlist_unblocked_user'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
 
+class WatchlistMembership(models.Model):
+    """
+    An asset in a watchlist, as (watchlist, asset_kind, asset_id): the primary key, so
+    membership checks are index lookups with no content-type join. On PostgreSQL the
+    table is hash-partitioned by watchlist (migration 0009).
+    """
+    STOCK = 1
+    MUTUAL_FUND = 2
+    INDEX = 3
+    ASSET_KIND_CHOICES = [
+        (STOCK, 'stock'),
+        (MUTUAL_FUND, 'mutualfund'),
+        (INDEX, 'index'),
+    ]
+    ASSET_MODELS = {STOCK: Stock, MUTUAL_FUND: MutualFund, INDEX: Index}
+
+    pk = models.CompositePrimaryKey('watchlist', 'asset_kind', 'asset_id')
+    # The primary key starts with watchlist_id, so no separate index
+    watchlist = models.ForeignKey(Watchlist, on_delete=models.CASCADE, related_name='memberships', db_index=False)
+    asset_kind = models.PositiveSmallIntegerField(choices=ASSET_KIND_CHOICES)
+    asset_id = models.BigIntegerField()
+    # Order within the list, with gaps so a move rewrites one row (core.watchlists.move_membership).
+    # Ties (rows copied from WatchlistItem all start at 0) fall back to created_at.
+    position = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    is_block = models.BooleanField(default=False)
+
+    objects = BlockableQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Watch counts and "who watches this asset" lookups; covers them, so no table reads
+            models.Index(
+                fields=['asset_kind', 'asset_id', 'watchlist'], condition=models.Q(is_block=False),
+                name='membership_unblocked_asset',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_asset_kind_display().capitalize()} #{self.asset_id} in watchlist #{self.watchlist_id}"
+
+
 class WatchlistItem(models.Model):
+    """
+    Watchlist contents before WatchlistMembership. No longer written; kept until
+    backfill_watchlist_memberships has run everywhere, then dropped.
+    """
     watchlist = models.ForeignKey(Watchlist, on_delete=models.CASCADE, related_name='items')
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
@@ -99,9 +223,76 @@ class WatchlistItem(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     is_block = models.BooleanField(default=False)
 
+    objects = BlockableQuerySet.as_manager()
+
     class Meta:
         unique_together = (('watchlist', 'content_type', 'object_id'),)
+        indexes = [
+            # Watch counts and "is this asset watchlisted" lookups go by asset
+            models.Index(
+                fields=['content_type', 'object_id'], condition=models.Q(is_block=False),
+                name='watchlistitem_unblocked_asset',
+            ),
+        ]
 
     def __str__(self):
         asset_type = self.content_type.model
         return f"{asset_type.capitalize()} - {self.asset} in {self.watchlist.name}"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log of instrument changes behind the market-data delta sync.
+
+    `id` is the version clients sync from. Rows are written by model signals and,
+    for bulk price updates, by core.ingestion.
+    """
+    KIND_CHOICES = [
+        ('stock', 'Stock'),
+        ('index', 'Index'),
+        ('mutualfund', 'Mutual fund'),
+    ]
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+    ACTION_CHOICES = [
+        (ACTION_UPSERT, 'Created or updated'),
+        (ACTION_DELETE, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default=ACTION_UPSERT)
+    # Set by the database, so app servers with skewed clocks agree with core.changes._horizon
+    changed_at = models.DateTimeField(db_default=Now(), db_index=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.action} {self.kind} {self.object_id}"
+
+
+class MarketSummary(models.Model):
+    """Price and watch statistics over a group of stocks, maintained by core.rollups."""
+    stock_count = models.PositiveIntegerField(default=0)
+    advancers = models.PositiveIntegerField(default=0)
+    decliners = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    avg_change_percentage = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    watch_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class SectorSummary(MarketSummary):
+    sector = models.OneToOneField(Sector, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+
+    def __str__(self):
+        return f"{self.sector} summary"
+
+
+class ExchangeSummary(MarketSummary):
+    exchange = models.OneToOneField(Exchange, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+
+    def __str__(self):
+        return f"{self.exchange} summary"
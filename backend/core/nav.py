@@ -0,0 +1,201 @@
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from core.changes import record_changes
+from core.models import MutualFund, MutualFundNAV
+
+# field -> (horizon in days, annualised)
+RETURN_HORIZONS = {
+    "one_month_return": (30, False),
+    "three_month_return": (91, False),
+    "one_year_return": (365, False),
+    "three_year_return": (1095, True),
+}
+# The NAV used for a horizon may be this many days older than the horizon date (weekends, holidays)
+MAX_NAV_GAP_DAYS = 7
+# Largest value the return fields (max_digits=7, decimal_places=2) can hold
+MAX_RETURN = 99999.99
+# Funds whose NAV history is loaded at once, so memory grows with this rather than with the table
+FUND_CHUNK_SIZE = 500
+
+
+class NAVRecord(NamedTuple):
+    scheme_code: str
+    name: str
+    category: str
+    nav: Decimal
+    date: date
+
+
+@contextmanager
+def stage(timings, name):
+    """Adds the time spent in the block to timings[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(value):
+    # A file holds thousands of rows per date, so each date string is parsed once
+    return datetime.strptime(value, "%d-%b-%Y").date()
+
+
+def parse_amfi(lines):
+    """
+    Yields NAVRecords from an AMFI NAV file: the daily NAVAll.txt or a NAV history download.
+
+    Columns are located from the header row, so both layouts work. Lines without a
+    ";" are section headers; "Open Ended Schemes(Equity Scheme - Large Cap Fund)"
+    sets the category of the rows below it, fund house names are skipped. Rows
+    without a NAV ("N.A.") are skipped.
+    """
+    columns = None
+    category = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if ";" not in line:
+            if line.endswith(")") and "(" in line:
+                category = line[line.index("(") + 1:-1].strip()
+            continue
+
+        fields = [field.strip() for field in line.split(";")]
+        if columns is None:
+            header = {name.lower(): i for i, name in enumerate(fields)}
+            try:
+                columns = [header[name] for name in ("scheme code", "scheme name", "net asset value", "date")]
+            except KeyError as exc:
+                raise ValueError(f"Not an AMFI NAV file, missing column {exc}")
+            continue
+
+        try:
+            code, name, nav, nav_date = (fields[i] for i in columns)
+            yield NAVRecord(code, name[:150], category, Decimal(nav), _parse_date(nav_date))
+        except (IndexError, InvalidOperation, ValueError):
+            continue
+
+
+def import_batch(records, timings):
+    """Upserts the funds (by scheme code) and NAV rows of one batch of NAVRecords."""
+    with stage(timings, "upsert funds"), transaction.atomic():
+        funds = {}
+        for record in records:
+            funds[record.scheme_code] = record
+        with_category = [fund for fund in funds.values() if fund.category]
+        without_category = [fund for fund in funds.values() if not fund.category]
+        # History files may lack section headers; keep the category a daily file set
+        for group, update_fields in ((with_category, ["name", "category"]), (without_category, ["name"])):
+            MutualFund.objects.bulk_create(
+                [MutualFund(scheme_code=fund.scheme_code, name=fund.name, category=fund.category) for fund in group],
+                update_conflicts=True,
+                unique_fields=["scheme_code"],
+                update_fields=update_fields,
+                batch_size=1000,
+            )
+        fund_ids = dict(MutualFund.objects.filter(scheme_code__in=list(funds)).values_list("scheme_code", "id"))
+
+    with stage(timings, "upsert NAVs"), transaction.atomic():
+        navs = {(fund_ids[record.scheme_code], record.date): record.nav for record in records}
+        MutualFundNAV.objects.bulk_create(
+            [MutualFundNAV(fund_id=fund_id, date=nav_date, nav=nav) for (fund_id, nav_date), nav in navs.items()],
+            update_conflicts=True,
+            unique_fields=["fund", "date"],
+            update_fields=["nav"],
+            batch_size=2000,
+        )
+    return len(navs)
+
+
+def compute_returns(fund_ids, days, navs):
+    """
+    Latest NAV and trailing returns per fund, for all funds at once.
+
+    Takes parallel arrays sorted by (fund_id, day), days as date ordinals. For each
+    fund and horizon, the base NAV is the last one on or before (latest day - horizon)
+    found by a single searchsorted over combined (fund, day) keys. Returns
+    (funds, latest_index, {field: returns in %, NaN where history is too short}).
+    """
+    starts = np.flatnonzero(np.r_[True, fund_ids[1:] != fund_ids[:-1]])
+    latest = np.r_[starts[1:], len(fund_ids)] - 1
+
+    # Days stay below 10**6 (date ordinals), so the combined keys sort like (fund, day)
+    keys = fund_ids * 1_000_000 + days
+    returns = {}
+    for field, (horizon, annualised) in RETURN_HORIZONS.items():
+        target_day = days[latest] - horizon
+        base = np.searchsorted(keys, fund_ids[latest] * 1_000_000 + target_day, side="right") - 1
+        base_safe = np.maximum(base, 0)
+        valid = (base >= starts) & (target_day - days[base_safe] <= MAX_NAV_GAP_DAYS) & (navs[base_safe] > 0)
+        ratio = np.full(len(latest), np.nan)
+        ratio[valid] = navs[latest[valid]] / navs[base[valid]]
+        if annualised:
+            ratio = ratio ** (365 / horizon)
+        returns[field] = (ratio - 1) * 100
+    return fund_ids[latest], latest, returns
+
+
+def _decimal(value):
+    if np.isnan(value) or abs(value) > MAX_RETURN:
+        return None
+    return Decimal(f"{value:.2f}")
+
+
+def _load_history(first_fund, last_fund, oldest):
+    """NAV rows since `oldest` of the funds with ids in [first_fund, last_fund], as rows and (fund, day, nav) arrays."""
+    rows = list(
+        MutualFundNAV.objects.filter(fund_id__gte=first_fund, fund_id__lte=last_fund, date__gte=oldest)
+        .order_by("fund_id", "date")
+        .values_list("fund_id", "date", "nav")
+    )
+    fund_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    days = np.fromiter((row[1].toordinal() for row in rows), dtype=np.int64, count=len(rows))
+    navs = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    return rows, fund_ids, days, navs
+
+
+def recompute_returns(timings):
+    """
+    Recomputes nav, nav_date and the return fields of every fund with NAV history,
+    FUND_CHUNK_SIZE funds at a time.
+    """
+    last_date = MutualFundNAV.objects.aggregate(last=Max("date"))["last"]
+    if last_date is None:
+        return 0
+    oldest = last_date - timedelta(days=max(h for h, _ in RETURN_HORIZONS.values()) + MAX_NAV_GAP_DAYS)
+    all_funds = list(MutualFund.objects.order_by("id").values_list("id", flat=True))
+
+    count = 0
+    for chunk_start in range(0, len(all_funds), FUND_CHUNK_SIZE):
+        chunk = all_funds[chunk_start:chunk_start + FUND_CHUNK_SIZE]
+        with stage(timings, "load history"):
+            rows, fund_ids, days, navs = _load_history(chunk[0], chunk[-1], oldest)
+        if not rows:
+            continue
+
+        with stage(timings, "compute returns"):
+            funds, latest, returns = compute_returns(fund_ids, days, navs)
+
+        with stage(timings, "update funds"):
+            updated = []
+            for i, fund_id in enumerate(funds.tolist()):
+                _, nav_date, nav = rows[latest[i]]
+                fund = MutualFund(id=fund_id, nav=nav.quantize(Decimal("0.01")), nav_date=nav_date)
+                for field, values in returns.items():
+                    setattr(fund, field, _decimal(values[i]))
+                updated.append(fund)
+            with transaction.atomic():
+                MutualFund.objects.bulk_update(updated, ["nav", "nav_date", *RETURN_HORIZONS], batch_size=500)
+                record_changes("mutualfund", [fund.id for fund in updated])
+        count += len(updated)
+    return count
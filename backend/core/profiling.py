@@ -0,0 +1,201 @@
+"""
+Per-request profiling: time per phase, SQL query count and time, cache hits and misses
+and response size, logged as one JSON line per request (WARNING above SLOW_REQUEST_MS,
+INFO otherwise) and sent to staff users as a Server-Timing header. A PROFILE_SAMPLE_RATE
+share of requests also runs under a profiler; profiles of the slow ones are written to
+PROFILE_DIR.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+# The current request's RequestProfile; worker threads and sync_to_async calls share it
+_profile = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+
+@contextmanager
+def phase(name):
+    """Adds the time spent in the block to the current request's `name` phase; a no-op outside requests."""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[name] = profile.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def record_cache(hits, misses):
+    profile = _profile.get()
+    if profile is not None:
+        profile.cache_hits += hits
+        profile.cache_misses += misses
+
+
+def _count_sql(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.sql_time += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # The wrapper object outlives reconnects, so install it once
+    if _count_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_sql)
+
+
+def _server_timing(profile, total_ms):
+    entries = [
+        f"total;dur={total_ms:.1f}",
+        f'db;desc="{profile.queries} queries";dur={profile.sql_time * 1000:.1f}',
+    ]
+    phases = dict(profile.phases)
+    if profile.cache_hits or profile.cache_misses:
+        cache_time = phases.pop("cache", None)
+        entry = f'cache;desc="{profile.cache_hits} hits, {profile.cache_misses} misses"'
+        entries.append(entry if cache_time is None else f"{entry};dur={cache_time * 1000:.1f}")
+    entries.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items())
+    return ", ".join(entries)
+
+
+class ProfilingMiddleware:
+    """Goes first in MIDDLEWARE, so its timings include the other middleware (and compression)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.REQUEST_PROFILING:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        try:
+            if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+                response, profile_path = self.run_profiled(request, profile)
+            else:
+                response, profile_path = self.get_response(request), None
+        finally:
+            _profile.reset(token)
+        self.report(request, response, profile, profile_path)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_PROFILING:
+            return await self.get_response(request)
+
+        # No sampled profiles here: cProfile would also time whatever else the event loop runs
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        self.report(request, response, profile, None)
+        return response
+
+    def report(self, request, response, profile, profile_path):
+        total_ms = profile.elapsed_ms()
+        # Query counts and phase names are for the people running the service, not its users.
+        # DRF sets request.user from the token by the time the response gets here.
+        user = getattr(request, "user", None)
+        if user is not None and user.is_staff:
+            response.headers["Server-Timing"] = _server_timing(profile, total_ms)
+        slow = total_ms >= settings.SLOW_REQUEST_MS
+        level = logging.WARNING if slow else logging.INFO
+        if logger.isEnabledFor(level):
+            match = request.resolver_match
+            logger.log(level, json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else None,
+                "status": response.status_code,
+                "duration_ms": round(total_ms, 2),
+                "db_queries": profile.queries,
+                "db_ms": round(profile.sql_time * 1000, 2),
+                "cache_hits": profile.cache_hits,
+                "cache_misses": profile.cache_misses,
+                "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in profile.phases.items()},
+                "bytes": None if response.streaming else len(response.content),
+                "profile": profile_path,
+            }))
+
+    def run_profiled(self, request, profile):
+        """Serves the request under cProfile (or pyinstrument); returns (response, profile file or None)."""
+        # Only the request thread is profiled, not the market-data build workers
+        if settings.PROFILER == "pyinstrument" and pyinstrument is not None:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+
+        total_ms = profile.elapsed_ms()
+        if total_ms < settings.SLOW_REQUEST_MS:
+            return response, None
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_')}"
+        if isinstance(profiler, cProfile.Profile):
+            path = os.path.join(settings.PROFILE_DIR, f"{name}-{total_ms:.0f}ms.prof")
+            profiler.dump_stats(path)
+        else:
+            path = os.path.join(settings.PROFILE_DIR, f"{name}-{total_ms:.0f}ms.html")
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(profiler.output_html())
+        return response, path
@@ -0,0 +1,86 @@
+import math
+from decimal import Decimal
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from core.profiling import phase
+
+_fallback_encoder = JSONEncoder()
+
+
+NON_FINITE_ERROR = "Out of range float values are not JSON compliant"
+
+
+def _default(obj):
+    # Decimals are sent as strings, like DRF's DecimalField with COERCE_DECIMAL_TO_STRING
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    return _fallback_encoder.default(obj)
+
+
+def _reject_non_finite(data):
+    """Raises ValueError on NaN/Infinity, which orjson would silently write as null (DRF raises too)."""
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, (float, Decimal)):
+            if not math.isfinite(obj):
+                raise ValueError(NON_FINITE_ERROR)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif getattr(obj, "dtype", None) is not None and obj.dtype.kind in "fc":
+            # numpy is only loaded here when the data already holds numpy values
+            import numpy
+
+            if not numpy.isfinite(obj).all():
+                raise ValueError(NON_FINITE_ERROR)
+
+
+def dumps(data, indent=False):
+    _reject_non_finite(data)
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, default=_default, option=option)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Drop-in replacement for DRF's JSONRenderer that encodes with orjson."""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # orjson only indents by two spaces; any `; indent=N` in the Accept header turns it on
+        indent = 'indent' in (accepted_media_type or '')
+        with phase('render'):
+            return dumps(data, indent=indent)
+
+
+class CompactJSONRenderer(ORJSONRenderer):
+    """Selected with `?format=compact`; the view builds the normalized payload (core.compact)."""
+
+    format = 'compact'
+
+
+class ORJSONParser(BaseParser):
+    """Parses JSON request bodies with orjson."""
+
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
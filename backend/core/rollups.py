@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from core.models import ExchangeSummary, SectorSummary, Stock, WatchlistMembership
+
+# summary model -> the Stock foreign key it groups by
+ROLLUPS = {
+    SectorSummary: "sector",
+    ExchangeSummary: "exchange",
+}
+
+SUMMARY_FIELDS = ["stock_count", "advancers", "decliners", "unchanged", "avg_change_percentage", "watch_count"]
+
+# Float arithmetic: SQLite stores whole-number decimals as integers and would divide them as such
+_change_percentage = (
+    Cast(F("last_price") - F("previous_close_price"), FloatField()) * 100
+    / Cast(F("previous_close_price"), FloatField())
+)
+
+# Watchers of one stock: unblocked memberships (membership_unblocked_asset) in unblocked lists.
+# Summed per group below, so watch counts come out of the same GROUP BY without joining (and
+# multiplying) rows. core.signals keeps them current between refreshes (adjust_watch_counts).
+_watchers = Subquery(
+    WatchlistMembership.objects.unblocked()
+    .filter(asset_kind=WatchlistMembership.STOCK, asset_id=OuterRef("id"), watchlist__is_block=False)
+    .order_by()
+    .values("asset_kind")
+    .annotate(count=Count("*"))
+    .values("count")
+)
+
+
+def _group_stats(field, group_ids):
+    """One GROUP BY over the unblocked stocks of the given groups (all groups when group_ids is None)."""
+    stocks = Stock.objects.unblocked()
+    if group_ids is not None:
+        stocks = stocks.filter(**{f"{field}_id__in": group_ids})
+    else:
+        stocks = stocks.filter(**{f"{field}__isnull": False})
+
+    stats = {
+        row.pop(f"{field}_id"): row
+        for row in stocks.values(f"{field}_id").order_by().annotate(
+            stock_count=Count("id"),
+            advancers=Count("id", filter=Q(last_price__gt=F("previous_close_price"))),
+            decliners=Count("id", filter=Q(last_price__lt=F("previous_close_price"))),
+            unchanged=Count("id", filter=Q(last_price=F("previous_close_price"))),
+            avg_change_percentage=Avg(_change_percentage, filter=Q(previous_close_price__gt=0)),
+            watch_count=Coalesce(Sum(_watchers), 0),
+        )
+    }
+    for row in stats.values():
+        if row["avg_change_percentage"] is not None:
+            row["avg_change_percentage"] = Decimal(f"{row['avg_change_percentage']:.4f}")
+    return stats
+
+
+def refresh_summaries(stocks=None):
+    """
+    Recomputes the sector and exchange summaries the given stocks belong to, or all of
+    them when `stocks` is None. Groups left without stocks lose their summary row.
+    """
+    with transaction.atomic():
+        for model, field in ROLLUPS.items():
+            group_ids = None
+            if stocks is not None:
+                group_ids = {getattr(stock, f"{field}_id") for stock in stocks} - {None}
+                if not group_ids:
+                    continue
+
+            stats = _group_stats(field, group_ids)
+            model.objects.bulk_create(
+                [model(**{f"{field}_id": group_id}, **row) for group_id, row in stats.items()],
+                update_conflicts=True,
+                unique_fields=[field],
+                update_fields=[*SUMMARY_FIELDS, "updated_at"],
+            )
+            stale = model.objects.exclude(**{f"{field}_id__in": list(stats)})
+            if group_ids is not None:
+                stale = stale.filter(**{f"{field}_id__in": group_ids})
+            stale.delete()
+
+
+def adjust_watch_counts(stock_id, delta):
+    """
+    Adds `delta` to the watch count of the stock's sector and exchange summaries: one UPDATE
+    per rollup, no recount, so adding to or removing from a watchlist doesn't contend with
+    price batches over the summary rows. Blocked stocks aren't counted, and groups without a
+    summary row yet get theirs from refresh_summaries. Callers only pass memberships that
+    _watchers counts: unblocked, in an unblocked list.
+    """
+    stock = Stock.objects.unblocked().filter(id=stock_id)
+    for model, field in ROLLUPS.items():
+        summaries = model.objects.filter(**{f"{field}_id__in": stock.values(f"{field}_id")})
+        if delta < 0:
+            # Never below zero, should a rebuild have raced the removal
+            summaries = summaries.filter(watch_count__gte=-delta)
+        summaries.update(watch_count=F("watch_count") + delta, updated_at=timezone.now())
@@ -1,6 +1,9 @@
 # core/serializers.py
 from rest_framework import serializers
-from core.models import Exchange, Index, Sector, Stock, MutualFund, Watchlist, WatchlistItem
+from core.models import (
+    Exchange, Index, Sector, Stock, MutualFund, Watchlist, WatchlistMembership, SectorSummary, ExchangeSummary,
+)
+from core.watchlists import attach_assets
 
 class ExchangeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,7 +14,7 @@ class ExchangeSerializer(serializers.ModelSerializer):
 class IndexSerializer(serializers.ModelSerializer):
     class Meta:
         model = Index
-        fields = "__all__"
+        exclude = ["constituents"]
 
 
 class SectorSerializer(serializers.ModelSerializer):
@@ -33,6 +36,15 @@ class StockSerializer(serializers.ModelSerializer):
         model = Stock
         fields = "__all__"
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # A blocked sector or index is hidden, not the stocks in it
+        for field in ("sector", "index"):
+            related = getattr(instance, field)
+            if related is not None and related.is_block:
+                data[field] = None
+        return data
+
     def get_price_difference(self, obj):
         return obj.price_difference()
 
@@ -43,10 +55,13 @@ class StockSerializer(serializers.ModelSerializer):
         user = self.context.get("user")
         if not user or user.is_anonymous:
             return False
-        return WatchlistItem.objects.filter(
+        # Ids looked up once for the whole list (core.changes)
+        if "watchlisted" in self.context:
+            return obj.id in self.context["watchlisted"]["stock"]
+        return WatchlistMembership.objects.filter(
             watchlist__user=user,
-            content_type__model="stock",
-            object_id=obj.id
+            asset_kind=WatchlistMembership.STOCK,
+            asset_id=obj.id
         ).exists()
 
 
@@ -61,15 +76,18 @@ class MutualFundSerializer(serializers.ModelSerializer):
         user = self.context.get("user")
         if not user or user.is_anonymous:
             return False
-        return WatchlistItem.objects.filter(
+        if "watchlisted" in self.context:
+            return obj.id in self.context["watchlisted"]["mutualfund"]
+        return WatchlistMembership.objects.filter(
             watchlist__user=user,
-            content_type__model="mutualfund",
-            object_id=obj.id
+            asset_kind=WatchlistMembership.MUTUAL_FUND,
+            asset_id=obj.id
         ).exists()
 
 
-class GenericAssetRelatedField(serializers.RelatedField):
-    """Handles GenericForeignKey for assets"""
+class AssetField(serializers.Field):
+    """A membership's asset (set by core.watchlists.attach_assets), serialized by its type."""
+
     def to_representation(self, value):
         if isinstance(value, Stock):
             return StockSerializer(value, context=self.context).data
@@ -80,17 +98,65 @@ class GenericAssetRelatedField(serializers.RelatedField):
         return str(value)
 
 
-class WatchlistItemSerializer(serializers.ModelSerializer):
-    asset = GenericAssetRelatedField(read_only=True)
+class WatchlistMembershipListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        memberships = data.all() if hasattr(data, "all") else data
+        # Blocked memberships, and memberships whose asset has been blocked or deleted since, are left out
+        return super().to_representation([
+            membership for membership in memberships
+            if not membership.is_block and getattr(membership, "asset", None) is not None
+        ])
+
+
+class WatchlistMembershipSerializer(serializers.ModelSerializer):
+    # Memberships have no id of their own: asset_type and asset_id identify an item within its
+    # list, and are what the add/remove endpoints take
+    asset_type = serializers.CharField(source="get_asset_kind_display", read_only=True)
+    asset = AssetField(read_only=True)
 
     class Meta:
-        model = WatchlistItem
-        fields = ["id", "asset", "created_at", "is_block"]
+        model = WatchlistMembership
+        list_serializer_class = WatchlistMembershipListSerializer
+        fields = ["asset_type", "asset_id", "asset", "created_at", "is_block"]
+
+
+class WatchlistListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        watchlists = list(data.all() if hasattr(data, "all") else data)
+        memberships = [membership for watchlist in watchlists for membership in watchlist.memberships.all()]
+        # The assets of every list in one query per kind, instead of per list or per asset
+        attach_assets(memberships)
+        # Every asset here is watchlisted by the user, so watchlist_status needs no query
+        self.context["watchlisted"] = {
+            name: {m.asset_id for m in memberships if m.asset_kind == kind}
+            for kind, name in WatchlistMembership.ASSET_KIND_CHOICES
+        }
+        return super().to_representation(watchlists)
 
 
 class WatchlistSerializer(serializers.ModelSerializer):
-    items = WatchlistItemSerializer(many=True)
+    items = WatchlistMembershipSerializer(source="memberships", many=True)
 
     class Meta:
         model = Watchlist
+        list_serializer_class = WatchlistListSerializer
         fields = ["id", "name", "created_at", "items"]
+
+
+SUMMARY_FIELDS = ["name", "stock_count", "advancers", "decliners", "unchanged", "avg_change_percentage", "watch_count", "updated_at"]
+
+
+class SectorSummarySerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="sector.name", read_only=True)
+
+    class Meta:
+        model = SectorSummary
+        fields = ["sector", *SUMMARY_FIELDS]
+
+
+class ExchangeSummarySerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="exchange.name", read_only=True)
+
+    class Meta:
+        model = ExchangeSummary
+        fields = ["exchange", *SUMMARY_FIELDS]
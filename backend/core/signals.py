@@ -1,9 +1,137 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.db import transaction
 from django.dispatch import receiver
 from accounts.models import CustomUser
-from core.models import Watchlist
+from core.models import (
+    Watchlist, WatchlistMembership, Exchange, Sector, Stock, Index, MutualFund, ChangeLogEntry, IndexConstituent,
+)
+from core.changes import record_changes
+from core.market_data import GROUPS_BY_MODEL, invalidate_groups
+from core.rollups import adjust_watch_counts, refresh_summaries
 
 @receiver(post_save,sender=CustomUser)
 def create_user_watchlist(sender,instance,created,**kwargs):
     if created:
         Watchlist.objects.create(user=instance,name='my_watchlist')
+
+
+# Delta sync log (core.changes); bulk price updates write theirs in core.ingestion
+@receiver(post_save, sender=Stock)
+@receiver(post_save, sender=Index)
+@receiver(post_save, sender=MutualFund)
+def log_instrument_saved(sender, instance, **kwargs):
+    record_changes(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_delete, sender=Stock)
+@receiver(post_delete, sender=Index)
+@receiver(post_delete, sender=MutualFund)
+def log_instrument_deleted(sender, instance, **kwargs):
+    record_changes(sender._meta.model_name, [instance.pk], ChangeLogEntry.ACTION_DELETE)
+
+
+# Stocks embed their sector and exchange, so editing or blocking one changes every stock in it. A
+# deleted sector is cleared from its stocks without saving them; deleted exchanges take theirs along.
+@receiver(post_save, sender=Sector)
+@receiver(post_save, sender=Exchange)
+@receiver(pre_delete, sender=Sector)
+def log_group_stocks(sender, instance, created=False, **kwargs):
+    if not created:
+        field = sender._meta.model_name
+        record_changes("stock", Stock.objects.filter(**{field: instance}).values_list("id", flat=True))
+
+
+# Index values (core.index_engine)
+@receiver(post_save, sender=IndexConstituent)
+@receiver(post_delete, sender=IndexConstituent)
+@receiver(m2m_changed, sender=Index.constituents.through)
+def reload_index_engines(sender, **kwargs):
+    # Imported here so processes that never touch indexes don't load NumPy
+    from core.index_engine import constituents_changed
+
+    constituents_changed()
+
+
+@receiver(post_save, sender=Stock)
+def recompute_stock_indexes(sender, instance, **kwargs):
+    # Price batches recompute in core.ingestion; this covers single saves (admin, shell)
+    from core.index_engine import update_indexes
+
+    # After commit, so a rolled-back save doesn't move the indexes
+    transaction.on_commit(lambda: update_indexes([instance]))
+    transaction.on_commit(lambda: refresh_summaries([instance]))
+
+
+# Watch counts leave out blocked memberships and the memberships of blocked lists, so edits
+# compare is_block with the stored row. Saves that name their fields skip the read unless
+# is_block is one of them.
+@receiver(pre_save, sender=WatchlistMembership)
+@receiver(pre_save, sender=Watchlist)
+def remember_block(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and "is_block" not in update_fields):
+        return
+    instance._was_blocked = sender.objects.filter(pk=instance.pk).values_list("is_block", flat=True).first()
+
+
+def _block_flip(instance, created):
+    """+1 when a save unblocked the instance, -1 when it blocked it, else 0."""
+    was_blocked = getattr(instance, "_was_blocked", None)
+    if created or was_blocked is None or was_blocked == instance.is_block:
+        return 0
+    return 1 if was_blocked else -1
+
+
+@receiver(post_save, sender=WatchlistMembership)
+@receiver(post_delete, sender=WatchlistMembership)
+def refresh_watch_counts(sender, instance, created=None, **kwargs):
+    if instance.asset_kind != WatchlistMembership.STOCK:
+        return
+    if created is False:
+        delta = _block_flip(instance, created)
+    elif instance.is_block:
+        return
+    else:
+        # created is None for post_delete
+        delta = 1 if created else -1
+    if delta and not instance.watchlist.is_block:
+        # The delete clears the instance's key before commit
+        stock_id = instance.asset_id
+        transaction.on_commit(lambda: adjust_watch_counts(stock_id, delta))
+
+
+@receiver(post_save, sender=Watchlist)
+def recount_watchlist_stocks(sender, instance, created, **kwargs):
+    # (Un)blocking a list moves the count of every stock in it; recount their groups. Rare: admin, shell.
+    if not _block_flip(instance, created):
+        return
+    stock_ids = instance.memberships.unblocked().filter(asset_kind=WatchlistMembership.STOCK).values("asset_id")
+    stocks = list(Stock.objects.filter(id__in=stock_ids).only("id", "sector_id", "exchange_id"))
+    if stocks:
+        transaction.on_commit(lambda: refresh_summaries(stocks))
+
+
+# asset_id is not a foreign key, so a deleted asset's memberships are removed here
+@receiver(post_delete, sender=Stock)
+@receiver(post_delete, sender=Index)
+@receiver(post_delete, sender=MutualFund)
+def delete_memberships(sender, instance, **kwargs):
+    kind = next(kind for kind, model in WatchlistMembership.ASSET_MODELS.items() if model is sender)
+    WatchlistMembership.objects.filter(asset_kind=kind, asset_id=instance.pk).delete()
+
+
+# Market-data caches (core.market_data): blocking, editing or deleting an instrument shows up
+# on the next request instead of after CACHE_TIMEOUT. Price batches (core.ingestion) don't
+# send signals and still rely on the timeout.
+@receiver(post_save, sender=Stock)
+@receiver(post_save, sender=Index)
+@receiver(post_save, sender=Sector)
+@receiver(post_save, sender=Exchange)
+@receiver(post_save, sender=MutualFund)
+@receiver(post_delete, sender=Stock)
+@receiver(post_delete, sender=Index)
+@receiver(post_delete, sender=Sector)
+@receiver(post_delete, sender=Exchange)
+@receiver(post_delete, sender=MutualFund)
+def invalidate_market_data(sender, **kwargs):
+    # After commit, so a request racing the write can't cache the old rows again
+    transaction.on_commit(lambda: invalidate_groups(GROUPS_BY_MODEL[sender]))
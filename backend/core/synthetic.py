@@ -0,0 +1,290 @@
+"""
+Synthetic market data and users at production volumes, for measuring performance
+locally (`seed_dummy_data --scale`). Output depends only on the seed and the volumes.
+Every generated symbol, scheme code and username starts with PREFIX.
+"""
+import random
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from accounts.models import CustomUser
+from core.index_engine import constituents_changed, update_indexes
+from core.market_data import GROUPS_BY_MODEL, invalidate_groups
+from core.models import Exchange, Index, IndexConstituent, MutualFund, Sector, Stock, Watchlist, WatchlistMembership
+from core.nav import stage
+from core.rollups import refresh_summaries
+from core.watchlists import ASSET_KINDS
+
+# Volumes at --scale 1
+VOLUMES = {"stocks": 50_000, "funds": 20_000, "users": 1_000_000, "watchlist_items": 10_000_000}
+
+PREFIX = "SYN"
+USERNAME_PREFIX = "syn_user_"
+PASSWORD = "password123"
+
+# name, country, currency; stocks are split evenly between the exchanges of their country
+EXCHANGES = [("NSE", "India", "INR"), ("BSE", "India", "INR"), ("NYSE", "USA", "USD"), ("NASDAQ", "USA", "USD")]
+INDIA_SHARE = 0.6
+SECTORS = [
+    "Technology", "Finance", "Banking", "Energy", "Healthcare", "Pharmaceuticals", "Automobile",
+    "FMCG", "Metals", "Real Estate", "Telecom", "Utilities", "Infrastructure", "Chemicals",
+    "Media", "Textiles", "Aviation", "Logistics", "Insurance", "Consumer Durables",
+]
+INDEXES_PER_COUNTRY = 25
+CONSTITUENTS_PER_INDEX = 50
+# Share of stocks shown with a benchmark index (Stock.index)
+BENCHMARKED_SHARE = 0.5
+FUND_CATEGORIES = [
+    "Equity Scheme - Large Cap Fund", "Equity Scheme - Mid Cap Fund", "Equity Scheme - Small Cap Fund",
+    "Equity Scheme - ELSS", "Debt Scheme - Liquid Fund", "Debt Scheme - Gilt Fund",
+    "Hybrid Scheme - Balanced Advantage", "Other Scheme - Index Funds",
+]
+NAME_WORDS = [
+    "Aurora", "Bharat", "Crest", "Delta", "Everest", "Falcon", "Ganga", "Horizon", "Indus", "Jupiter",
+    "Kaveri", "Lotus", "Meridian", "Nova", "Orion", "Pioneer", "Quantum", "Royal", "Summit", "Titan",
+]
+NAME_SUFFIXES = ["Industries", "Holdings", "Technologies", "Finance", "Motors", "Pharma", "Power", "Corp", "Ltd"]
+
+# Watchlist items per asset kind; users hold WATCHLIST_ITEMS / USERS items on average (geometric)
+ITEM_KINDS = {"stock": 0.7, "mutualfund": 0.2, "index": 0.1}
+# Asset popularity: position = n * u**POPULARITY_SKEW, so low positions are watched far more often
+POPULARITY_SKEW = 3
+# Users whose watchlist items are generated and inserted together
+USERS_PER_ITEM_CHUNK = 20_000
+
+
+def exists():
+    return Stock.objects.filter(symbol__startswith=PREFIX).exists() or CustomUser.objects.filter(
+        username__startswith=USERNAME_PREFIX
+    ).exists()
+
+
+def _symbol(i):
+    letters = []
+    for _ in range(4):
+        i, digit = divmod(i, 26)
+        letters.append(chr(ord("A") + digit))
+    return PREFIX + "".join(reversed(letters)) + (str(i) if i else "")
+
+
+def _insert_rows(model, fields, rows):
+    """
+    Inserts rows (tuples of database-ready values for `fields`) without building model
+    instances: COPY on PostgreSQL, executemany elsewhere. Other columns get their default,
+    evaluated once, so generated timestamps are all the same.
+    """
+    now = timezone.now()
+    columns = list(fields)
+    constants = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.attname in fields:
+            continue
+        value = now if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False) else field.get_default()
+        columns.append(field.column)
+        constants.append(field.get_db_prep_save(value, connection))
+    constants = tuple(constants)
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_list = ", ".join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            with cursor.copy(f"COPY {table} ({column_list}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row + constants)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", [row + constants for row in rows]
+            )
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SyntheticData:
+    def __init__(self, volumes, seed=0, batch_size=5000):
+        self.volumes = volumes
+        self.seed = seed
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.timings = {}
+
+    def generate(self):
+        """Creates everything; returns {name: rows created}."""
+        created = {}
+        with stage(self.timings, "reference data"):
+            self.reference_data()
+        with stage(self.timings, "stocks"):
+            created["stocks"] = self.stocks()
+        with stage(self.timings, "index constituents"):
+            created["index_constituents"] = self.index_constituents()
+        with stage(self.timings, "mutual funds"):
+            created["mutual_funds"] = self.mutual_funds()
+        with stage(self.timings, "users"):
+            created["users"] = self.users()
+        with stage(self.timings, "watchlist items"):
+            created["watchlist_items"] = self.watchlist_items()
+        with stage(self.timings, "summaries"):
+            # Nothing above sends signals: rebuild what they would have maintained
+            refresh_summaries()
+            invalidate_groups({name for names in GROUPS_BY_MODEL.values() for name in names})
+        return created
+
+    def reference_data(self):
+        self.exchanges = {}
+        for name, country, currency in EXCHANGES:
+            exchange = Exchange.objects.get_or_create(name=name, country=country, defaults={"currency": currency})[0]
+            self.exchanges.setdefault(country, []).append(exchange)
+        self.sectors = [Sector.objects.get_or_create(name=name)[0] for name in SECTORS]
+
+        self.indexes = {}
+        for country, exchanges in self.exchanges.items():
+            Index.objects.bulk_create([
+                Index(
+                    name=f"{PREFIX} {country} {i + 1}", symbol=f"{PREFIX}{country[:2].upper()}{i + 1}",
+                    country=country, currency=exchanges[0].currency,
+                )
+                for i in range(INDEXES_PER_COUNTRY)
+            ])
+            self.indexes[country] = list(
+                Index.objects.filter(symbol__startswith=f"{PREFIX}{country[:2].upper()}").order_by("id")
+            )
+
+    def stocks(self):
+        rng = self.random
+        now = timezone.now()
+        stocks = []
+        for i in range(self.volumes["stocks"]):
+            country = "India" if rng.random() < INDIA_SHARE else "USA"
+            exchange = self.exchanges[country][i % len(self.exchanges[country])]
+            last = rng.lognormvariate(6.2, 1.2)
+            previous = last / (1 + rng.gauss(0, 0.02))
+            stocks.append(Stock(
+                symbol=_symbol(i),
+                name=f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_SUFFIXES)}",
+                last_price=Decimal(f"{last:.2f}"),
+                previous_close_price=Decimal(f"{previous:.2f}"),
+                currency=exchange.currency,
+                sector=rng.choice(self.sectors),
+                index=rng.choice(self.indexes[country]) if rng.random() < BENCHMARKED_SHARE else None,
+                exchange=exchange,
+                price_updated_at=now,
+            ))
+        with transaction.atomic():
+            Stock.objects.bulk_create(stocks, batch_size=self.batch_size)
+        return len(stocks)
+
+    def index_constituents(self):
+        rng = self.random
+        by_country = {}
+        for stock_id, country in (
+            Stock.objects.filter(symbol__startswith=PREFIX).order_by("id").values_list("id", "exchange__country")
+        ):
+            by_country.setdefault(country, []).append(stock_id)
+
+        constituents = []
+        for country, indexes in self.indexes.items():
+            stock_ids = by_country.get(country, [])
+            for index in indexes:
+                for stock_id in rng.sample(stock_ids, min(CONSTITUENTS_PER_INDEX, len(stock_ids))):
+                    constituents.append(IndexConstituent(index=index, stock_id=stock_id, weight=rng.randint(1, 5000)))
+        with transaction.atomic():
+            IndexConstituent.objects.bulk_create(constituents, batch_size=self.batch_size)
+            # bulk_create sends no signals (see load_index_constituents)
+            constituents_changed()
+            update_indexes(Stock.objects.filter(id__in={c.stock_id for c in constituents}))
+        return len(constituents)
+
+    def mutual_funds(self):
+        rng = self.random
+        today = timezone.localdate()
+
+        def percent(mean, deviation):
+            return Decimal(f"{rng.gauss(mean, deviation):.2f}")
+
+        funds = [
+            MutualFund(
+                scheme_code=f"{PREFIX}{i:07d}",
+                name=f"{rng.choice(NAME_WORDS)} {category.split(' - ')[-1]} - Direct Plan - Growth",
+                category=category,
+                nav=Decimal(f"{rng.lognormvariate(4, 1):.2f}"),
+                nav_date=today,
+                one_month_return=percent(1, 3),
+                three_month_return=percent(3, 6),
+                one_year_return=percent(12, 15),
+                three_year_return=percent(11, 8),
+            )
+            for i, category in ((i, rng.choice(FUND_CATEGORIES)) for i in range(self.volumes["funds"]))
+        ]
+        with transaction.atomic():
+            MutualFund.objects.bulk_create(funds, batch_size=self.batch_size)
+        return len(funds)
+
+    def users(self):
+        # One hash shared by every user: hashing a million passwords would take hours
+        password = make_password(PASSWORD)
+        usernames = [f"{USERNAME_PREFIX}{i:07d}" for i in range(self.volumes["users"])]
+        for batch in _batches(usernames, self.batch_size):
+            with transaction.atomic():
+                _insert_rows(CustomUser, ("username", "email", "password"), [
+                    (username, f"{username}@example.com", password) for username in batch
+                ])
+
+        # Users were inserted in username order, so ordering by id keeps it
+        self.user_ids = list(
+            CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).order_by("id").values_list("id", flat=True)
+        )
+        for batch in _batches(self.user_ids, self.batch_size):
+            with transaction.atomic():
+                # The default watchlist post_save would have created
+                _insert_rows(Watchlist, ("user_id", "name"), [(user_id, "my_watchlist") for user_id in batch])
+        return len(self.user_ids)
+
+    def watchlist_items(self):
+        if not self.user_ids:
+            return 0
+        watchlist_ids = np.fromiter(
+            Watchlist.objects.filter(user__username__startswith=USERNAME_PREFIX)
+            .order_by("user_id")
+            .values_list("id", flat=True),
+            dtype=np.int64,
+        )
+        assets = {
+            "stock": Stock.objects.filter(symbol__startswith=PREFIX),
+            "mutualfund": MutualFund.objects.filter(scheme_code__startswith=PREFIX),
+            "index": Index.objects.filter(symbol__startswith=PREFIX),
+        }
+        kinds = [kind for kind in ITEM_KINDS if assets[kind].exists()]
+        if not kinds:
+            return 0
+        shares = np.array([ITEM_KINDS[kind] for kind in kinds])
+        kind_ids = [
+            np.fromiter(assets[kind].order_by("id").values_list("id", flat=True), dtype=np.int64) for kind in kinds
+        ]
+        asset_kinds = np.array([ASSET_KINDS[kind] for kind in kinds])
+        sizes = np.array([len(ids) for ids in kind_ids])
+        offsets = np.r_[0, np.cumsum(sizes)[:-1]]
+        all_ids = np.concatenate(kind_ids)
+
+        rng = np.random.default_rng(self.seed)
+        mean = self.volumes["watchlist_items"] / len(watchlist_ids)
+        created = 0
+        for chunk in _batches(watchlist_ids, USERS_PER_ITEM_CHUNK):
+            counts = rng.geometric(1 / (mean + 1), size=len(chunk)) - 1
+            owners = np.repeat(np.arange(len(chunk)), counts)
+            kind = rng.choice(len(kinds), size=len(owners), p=shares / shares.sum())
+            picks = (rng.random(len(owners)) ** POPULARITY_SKEW * sizes[kind]).astype(np.int64)
+            # One key per (watchlist, asset); np.unique drops repeats and sorts, deterministically
+            keys = np.unique(owners * len(all_ids) + offsets[kind] + picks)
+            positions = keys % len(all_ids)
+            kind = np.searchsorted(offsets, positions, side="right") - 1
+            rows = zip(chunk[keys // len(all_ids)].tolist(), asset_kinds[kind].tolist(), all_ids[positions].tolist())
+            with transaction.atomic():
+                _insert_rows(WatchlistMembership, ("watchlist_id", "asset_kind", "asset_id"), list(rows))
+            created += len(keys)
+        return created
@@ -1,3 +1,820 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import nullcontext
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import CustomUser
+from core.async_views import AddAssetToWatchlistAsyncAPIView, RemoveAssetFromWatchlistAsyncAPIView
+from core.benchmark import BenchmarkTestCase, measure
+from core.changes import current_version
+from core import market_data
+from core.ingestion import apply_price_batch
+from core.market_data import GROUPS, get_groups, invalidate_user_groups
+from core.metrics import MetricsMiddleware, http_requests, registry
+from core.nav import recompute_returns
+from core.profiling import ProfilingMiddleware
+from core.renderers import ORJSONRenderer, dumps
+from core.models import (
+    ChangeLogEntry, Exchange, ExchangeSummary, Index, IndexConstituent, MutualFund, MutualFundNAV, Sector, SectorSummary, Stock,
+    Watchlist, WatchlistItem, WatchlistMembership,
+)
+from core.rollups import refresh_summaries
+from core.throttling import ScopedTokenBucketThrottle
+from core.watchlists import POSITION_GAP
+
+# Assets in the benchmark user's watchlist
+WATCHLIST_SIZE = {Stock: 30, MutualFund: 15, Index: 5}
+# Further lists of the user in the watchlist benchmarks, and the stocks in each
+EXTRA_WATCHLISTS = 4
+EXTRA_WATCHLIST_SIZE = 10
+# Modules worker processes must not import at startup (backend.settings_worker); they are
+# loaded on first use instead. `manage.py bench_startup` times the startup itself.
+DEFERRED_IMPORTS = ("rest_framework.serializers", "rest_framework_simplejwt.settings", "numpy", "django.test", "django.contrib.admin")
+
+
+class EndpointBenchmarkTestCase(BenchmarkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = CustomUser.objects.create_user(username="benchmark", password="password123")
+        watchlist = Watchlist.objects.get(user=cls.user)
+        kinds = {model: kind for kind, model in WatchlistMembership.ASSET_MODELS.items()}
+        WatchlistMembership.objects.bulk_create([
+            WatchlistMembership(watchlist=watchlist, asset_kind=kinds[model], asset_id=object_id)
+            for model, size in WATCHLIST_SIZE.items()
+            for object_id in model.objects.order_by("id").values_list("id", flat=True)[:size]
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+
+class MarketDataBenchmarks(EndpointBenchmarkTestCase):
+    def test_each_group_uncached(self):
+        for name, group in GROUPS.items():
+            with self.subTest(name):
+                client = self.client if group.per_user else self.anonymous
+                results = measure(
+                    lambda i: client.get("/core/api/market-data/", {"data_type": name}),
+                    setup=lambda i: cache.clear(),
+                )
+                self.assertWithinBaseline(f"market_data.{name}", results)
+
+    def test_compact_uncached(self):
+        results = measure(
+            lambda i: self.anonymous.get(
+                "/core/api/market-data/", {"data_type": "indian_stocks,us_stocks", "format": "compact"}
+            ),
+            setup=lambda i: cache.clear(),
+        )
+        self.assertWithinBaseline("market_data.compact", results)
+
+    def test_all_groups_cached(self):
+        params = {"data_type": ",".join(name for name, group in GROUPS.items() if not group.per_user)}
+        self.anonymous.get("/core/api/market-data/", params)
+        results = measure(lambda i: self.anonymous.get("/core/api/market-data/", params))
+        self.assertWithinBaseline("market_data.cached", results)
+
+
+def list_order(watchlist):
+    """(asset_kind, asset_id) of the list's unblocked assets, in list order."""
+    return list(
+        watchlist.memberships.unblocked().order_by("position", "created_at").values_list("asset_kind", "asset_id")
+    )
+
+
+class WatchlistBenchmarks(EndpointBenchmarkTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        stock_ids = list(Stock.objects.order_by("-id").values_list("id", flat=True)[:EXTRA_WATCHLIST_SIZE])
+        for n in range(EXTRA_WATCHLISTS):
+            watchlist = Watchlist.objects.create(user=cls.user, name=f"list {n}")
+            WatchlistMembership.objects.bulk_create([
+                WatchlistMembership(watchlist=watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=stock_id)
+                for stock_id in stock_ids
+            ])
+
+    def setUp(self):
+        super().setUp()
+        watched = WatchlistMembership.objects.filter(
+            watchlist__user=self.user, asset_kind=WatchlistMembership.STOCK
+        ).values_list("asset_id", flat=True)
+        # Stocks that are not in the watchlist yet, one per run
+        self.stock_ids = list(Stock.objects.exclude(id__in=watched).order_by("id").values_list("id", flat=True))
+
+    def test_get(self):
+        results = measure(lambda i: self.client.get("/core/api/watchlist/"))
+        self.assertWithinBaseline("watchlist.get", results)
+
+    def test_all_lists(self):
+        results = measure(lambda i: self.client.get("/core/api/watchlists/"))
+        self.assertWithinBaseline("watchlists.all", results)
+
+    def test_reorder(self):
+        watchlist = Watchlist.objects.filter(user=self.user).order_by("id").first()
+        first_stocks = list(
+            watchlist.memberships.filter(asset_kind=WatchlistMembership.STOCK)
+            .order_by("asset_id").values_list("asset_id", flat=True)[:2]
+        )
+
+        # Two stocks take turns moving into the same slot, so its gap runs out and the list is renumbered
+        def move(i):
+            asset = {"asset_type": "stock", "asset_id": first_stocks[i % 2], "index": 1}
+            return self.client.post(f"/core/api/watchlists/{watchlist.id}/reorder/", asset, format="json")
+
+        # The list starts unspaced (all positions 0); the first move spaces it out, untimed
+        move(-1)
+        expected = list_order(watchlist)
+        results = measure(move)
+        self.assertWithinBaseline("watchlists.reorder", results)
+
+        for i in range(settings.BENCHMARK_RUNS):
+            expected.remove((WatchlistMembership.STOCK, first_stocks[i % 2]))
+            expected.insert(1, (WatchlistMembership.STOCK, first_stocks[i % 2]))
+        self.assertEqual(list_order(watchlist), expected)
+
+    def test_add_and_remove(self):
+        def asset(i):
+            return {"asset_type": "stock", "asset_id": self.stock_ids[i]}
+
+        # Watch counts are adjusted after commit; run those callbacks inside the measurement
+        def committed(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                return request()
+
+        results = measure(lambda i: committed(
+            lambda: self.client.post("/core/api/watchlist/add-asset/", asset(i), format="json")
+        ))
+        self.assertWithinBaseline("watchlist.add", results)
+        results = measure(lambda i: committed(
+            lambda: self.client.delete("/core/api/watchlist/remove-asset/", asset(i), format="json")
+        ))
+        self.assertWithinBaseline("watchlist.remove", results)
+
+
+class WorkerStartupTests(SimpleTestCase):
+    def test_heavy_imports_deferred(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE="backend.settings_worker")
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, django; django.setup(); print(*sys.modules)"],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        loaded = set(result.stdout.split())
+        self.assertEqual([name for name in DEFERRED_IMPORTS if name in loaded], [])
+
+
+def authenticated_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+class MarketDataWatchlistStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        exchange = Exchange.objects.create(name="NSE", country="India")
+        cls.watched, cls.other = (
+            Stock.objects.create(symbol=symbol, exchange=exchange, last_price=10, previous_close_price=9)
+            for symbol in ("AAA", "BBB")
+        )
+        cls.user = CustomUser.objects.create_user(username="watcher", password="password123")
+        WatchlistMembership.objects.create(
+            watchlist=Watchlist.objects.get(user=cls.user), asset_kind=WatchlistMembership.STOCK, asset_id=cls.watched.id
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def statuses(self, client):
+        response = client.get("/core/api/market-data/?data_type=indian_stocks")
+        self.assertEqual(response.status_code, 200)
+        return {row["symbol"]: row["watchlist_status"] for row in json.loads(response.content)["indian_stocks"]}
+
+    def test_flags_are_per_user(self):
+        self.assertEqual(self.statuses(authenticated_client(self.user)), {"AAA": True, "BBB": False})
+        # Served from the group and body caches filled by the request above
+        self.assertEqual(self.statuses(APIClient()), {"AAA": False, "BBB": False})
+        stranger = CustomUser.objects.create_user(username="stranger", password="password123")
+        self.assertEqual(self.statuses(authenticated_client(stranger)), {"AAA": False, "BBB": False})
+        self.assertEqual(self.statuses(authenticated_client(self.user)), {"AAA": True, "BBB": False})
+
+    def test_user_bodies_are_cached_until_their_watchlist_changes(self):
+        client = authenticated_client(self.user)
+        with mock.patch("core.market_data._encode_body", wraps=market_data._encode_body) as encode:
+            self.statuses(client)
+            self.assertEqual(self.statuses(client), {"AAA": True, "BBB": False})
+            self.assertEqual(encode.call_count, 1)
+            response = client.post(
+                "/core/api/watchlist/add-asset/", {"asset_type": "stock", "asset_id": self.other.id}, format="json"
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(self.statuses(client), {"AAA": True, "BBB": True})
+            self.assertEqual(encode.call_count, 2)
+
+
+class ReplicaInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="writer", password="password123")
+        patcher = mock.patch("core.market_data.has_replica", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalidated_groups_are_rebuilt_from_default(self):
+        with mock.patch("core.market_data.primary_reads", side_effect=nullcontext) as primary_reads:
+            get_groups(["watchlists"], self.user)
+            self.assertFalse(primary_reads.called)
+            invalidate_user_groups(self.user)
+            get_groups(["watchlists"], self.user)
+            self.assertEqual(primary_reads.call_count, 1)
+
+
+class WatchCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.exchange = Exchange.objects.create(name="NSE", country="India")
+        cls.sector = Sector.objects.create(name="Energy")
+        cls.stock, cls.blocked = (
+            Stock.objects.create(symbol=symbol, exchange=cls.exchange, sector=cls.sector, is_block=is_block)
+            for symbol, is_block in (("AAA", False), ("BBB", True))
+        )
+        cls.user = CustomUser.objects.create_user(username="watcher", password="password123")
+        refresh_summaries()
+
+    def setUp(self):
+        cache.clear()
+        self.client = authenticated_client(self.user)
+
+    def watch_counts(self):
+        return (
+            SectorSummary.objects.get(sector=self.sector).watch_count,
+            ExchangeSummary.objects.get(exchange=self.exchange).watch_count,
+        )
+
+    def test_add_and_remove_adjust_the_groups(self):
+        asset = {"asset_type": "stock", "asset_id": self.stock.id}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post("/core/api/watchlist/add-asset/", asset, format="json").status_code, 201)
+        self.assertEqual(self.watch_counts(), (1, 1))
+        other = CustomUser.objects.create_user(username="other", password="password123")
+        with self.captureOnCommitCallbacks(execute=True):
+            authenticated_client(other).post("/core/api/watchlist/add-asset/", asset, format="json")
+        self.assertEqual(self.watch_counts(), (2, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete("/core/api/watchlist/remove-asset/", asset, format="json").status_code, 200)
+        self.assertEqual(self.watch_counts(), (1, 1))
+        refresh_summaries()
+        self.assertEqual(self.watch_counts(), (1, 1))
+
+    def test_blocked_stocks_and_memberships_are_not_counted(self):
+        watchlist = Watchlist.objects.get(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            WatchlistMembership.objects.create(
+                watchlist=watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=self.blocked.id
+            )
+            membership = WatchlistMembership.objects.create(
+                watchlist=watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=self.stock.id, is_block=True
+            )
+        self.assertEqual(self.watch_counts(), (0, 0))
+        membership.is_block = False
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.save()
+        self.assertEqual(self.watch_counts(), (1, 1))
+        membership.is_block = True
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.save(update_fields=["is_block"])
+        self.assertEqual(self.watch_counts(), (0, 0))
+
+    def test_blocked_watchlists_are_not_counted(self):
+        watchlist = Watchlist.objects.get(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            WatchlistMembership.objects.create(watchlist=watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=self.stock.id)
+        watchlist.is_block = True
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.save()
+        self.assertEqual(self.watch_counts(), (0, 0))
+        blocked_list = Watchlist.objects.create(user=self.user, name="hidden", is_block=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            WatchlistMembership.objects.create(watchlist=blocked_list, asset_kind=WatchlistMembership.STOCK, asset_id=self.stock.id)
+        self.assertEqual(self.watch_counts(), (0, 0))
+        watchlist.is_block = False
+        with self.captureOnCommitCallbacks(execute=True):
+            watchlist.save()
+        self.assertEqual(self.watch_counts(), (1, 1))
+        # The incremental and full counts agree
+        refresh_summaries()
+        self.assertEqual(self.watch_counts(), (1, 1))
+
+    def test_stock_saves_refresh_summaries_after_commit(self):
+        self.stock.last_price, self.stock.previous_close_price = 11, 10
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.stock.save()
+            self.assertEqual(SectorSummary.objects.get(sector=self.sector).advancers, 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(SectorSummary.objects.get(sector=self.sector).advancers, 1)
+
+
+class IndexValueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.index = Index.objects.create(name="Test 2", symbol="TST2")
+        cls.first, cls.second = (
+            Stock.objects.create(symbol=symbol, last_price=last, previous_close_price=previous)
+            for symbol, last, previous in (("AAA", 100, 90), ("BBB", 50, 55))
+        )
+        IndexConstituent.objects.bulk_create([
+            IndexConstituent(index=cls.index, stock=cls.first, weight=2),
+            IndexConstituent(index=cls.index, stock=cls.second, weight=3),
+        ])
+
+    def value(self):
+        self.index.refresh_from_db()
+        return self.index.Value, self.index.change
+
+    def test_values_follow_price_batches(self):
+        # 2 * 110 + 3 * 50, change 2 * (110 - 90) + 3 * (50 - 55)
+        apply_price_batch([("AAA", "110", None)])
+        self.assertEqual(self.value(), (370, 25))
+        apply_price_batch([("BBB", "60", "50")])
+        self.assertEqual(self.value(), (400, 70))
+
+    def test_prices_written_elsewhere_are_used(self):
+        apply_price_batch([("AAA", "110", None)])
+        # Another process's batch: this process's engine never sees it
+        Stock.objects.filter(id=self.second.id).update(last_price=70)
+        self.first.last_price = 120
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.save()
+        self.assertEqual(self.value(), (450, 105))
+
+    def test_rolled_back_prices_are_not_kept(self):
+        apply_price_batch([("AAA", "110", None)])
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            apply_price_batch([("BBB", "1000", None)])
+            1 / 0
+        apply_price_batch([("AAA", "120", None)])
+        self.assertEqual(self.value(), (390, 45))
+
+
+class ChangeLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = Sector.objects.create(name="Energy")
+        cls.stock = Stock.objects.create(symbol="AAA", sector=cls.sector)
+        cls.other = Stock.objects.create(symbol="BBB")
+
+    def changes(self, since):
+        response = self.client.get(f"/core/api/market-data/changes/?since={since}")
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_recent_entries_wait_until_they_settle(self):
+        ChangeLogEntry.objects.filter(object_id=self.stock.id).update(changed_at=timezone.now() - timedelta(minutes=1))
+        with override_settings(CHANGE_LOG_SETTLE_SECONDS=30):
+            version = json.loads(self.client.get("/core/api/market-data/changes/").content)["version"]
+            payload = self.changes(0)
+        self.assertEqual(version, payload["version"])
+        self.assertEqual([row["symbol"] for row in payload["stocks"]], ["AAA"])
+        with override_settings(CHANGE_LOG_SETTLE_SECONDS=0):
+            payload = self.changes(version)
+        self.assertEqual([row["symbol"] for row in payload["stocks"]], ["BBB"])
+
+    @override_settings(CHANGE_LOG_SETTLE_SECONDS=30)
+    def test_skewed_app_clocks_do_not_settle_entries(self):
+        ChangeLogEntry.objects.update(changed_at=timezone.now() - timedelta(minutes=1))
+        settled = current_version()
+        self.stock.save()
+        # Read by an app server whose clock runs an hour ahead: the new entry is still unsettled
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() + timedelta(hours=1)):
+            self.assertEqual(current_version(), settled)
+
+    @override_settings(CHANGE_LOG_SETTLE_SECONDS=0)
+    def test_pruned_versions_are_gone(self):
+        oldest = ChangeLogEntry.objects.order_by("id").values_list("id", flat=True).first()
+        ChangeLogEntry.objects.filter(id=oldest).delete()
+        response = self.client.get(f"/core/api/market-data/changes/?since={oldest - 1}")
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual([row["symbol"] for row in self.changes(oldest)["stocks"]], ["BBB"])
+
+    @override_settings(CHANGE_LOG_SETTLE_SECONDS=0)
+    def test_sector_edits_log_their_stocks(self):
+        version = self.changes(0)["version"]
+        self.sector.is_block = True
+        self.sector.save()
+        payload = self.changes(version)
+        self.assertEqual([(row["symbol"], row["sector"]) for row in payload["stocks"]], [("AAA", None)])
+        self.sector.delete()
+        self.assertEqual([row["symbol"] for row in self.changes(payload["version"])["stocks"]], ["AAA"])
+
+
+class NAVReturnTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.latest = date(2026, 6, 30)
+        # NAV grows by 1 a day from 100, 3 years and 10 days back; the second fund has one month of history
+        cls.fund, cls.young = MutualFund.objects.create(name="Growth"), MutualFund.objects.create(name="New")
+        days = 3 * 365 + 10
+        MutualFundNAV.objects.bulk_create([
+            MutualFundNAV(fund=cls.fund, date=cls.latest - timedelta(days=days - n), nav=100 + n) for n in range(days + 1)
+        ] + [
+            MutualFundNAV(fund=cls.young, date=cls.latest - timedelta(days=30 - n), nav=10) for n in range(31)
+        ])
+
+    def returns(self, fund):
+        fund.refresh_from_db()
+        return fund.nav, fund.nav_date, fund.one_month_return, fund.one_year_return, fund.three_year_return
+
+    def check_returns(self):
+        self.assertEqual(recompute_returns({}), 2)
+        nav, nav_date, one_month, one_year, three_year = self.returns(self.fund)
+        self.assertEqual((nav, nav_date), (1205, self.latest))
+        self.assertEqual(one_month, Decimal("2.55"))  # 1205 / 1175
+        self.assertEqual(one_year, Decimal("43.45"))  # 1205 / 840
+        self.assertEqual(three_year, Decimal("122.09"))  # (1205 / 110) ** (1 / 3)
+        self.assertEqual(self.returns(self.young), (10, self.latest, Decimal("0.00"), None, None))
+
+    def test_returns(self):
+        self.check_returns()
+
+    def test_returns_in_chunks(self):
+        with mock.patch("core.nav.FUND_CHUNK_SIZE", 1):
+            self.check_returns()
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_decimals_are_strings(self):
+        self.assertEqual(json.loads(dumps({"price": Decimal("10.50")})), {"price": "10.50"})
+
+    def test_non_finite_numbers_raise(self):
+        for value in (float("nan"), float("inf"), Decimal("NaN"), Decimal("-Infinity")):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                ORJSONRenderer().render({"rows": [{"change": value}]})
+
+
+@override_settings(REQUEST_PROFILING=True)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(username="staff", password="password123", is_staff=True)
+
+    def test_server_timing_is_sent_to_staff_only(self):
+        self.assertNotIn("Server-Timing", APIClient().get("/core/api/market-data/?data_type=indexes"))
+        response = authenticated_client(self.staff).get("/core/api/market-data/?data_type=indexes")
+        self.assertIn("db;desc=", response["Server-Timing"])
+
+    def test_async_requests(self):
+        async def get_response(request):
+            request.user = self.staff
+            return HttpResponse("ok")
+
+        middleware = ProfilingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+
+class MetricsTests(TestCase):
+    def test_scrapes_need_the_token(self):
+        with override_settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+        with override_settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE http_requests_total counter", response.content)
+
+    def test_async_requests(self):
+        async def get_response(request):
+            return HttpResponse("ok")
+
+        middleware = MetricsMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        key = http_requests.key({"view": "unmatched", "method": "GET", "status": "2xx"})
+        count = registry.snapshot()["series"].get(key, 0)
+        self.assertEqual(async_to_sync(middleware)(RequestFactory().get("/")).status_code, 200)
+        self.assertEqual(registry.snapshot()["series"][key], count + 1)
+
+    def test_files_are_written_off_the_request_thread(self):
+        flushed = threading.Event()
+        threads = []
+
+        def flush():
+            threads.append(threading.current_thread().name)
+            flushed.set()
+
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            override_settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0.01),
+            mock.patch.object(registry, "flush", side_effect=flush),
+        ):
+            http_requests.inc(view="unmatched", method="GET", status="2xx")
+            self.assertTrue(flushed.wait(timeout=5))
+            registry._flusher_pid = None
+            registry._flusher.join()
+        self.assertEqual(set(threads), {"metrics-flush"})
+
+
+class BackfillWatchlistMembershipsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.watchlist = Watchlist.objects.create(user=CustomUser.objects.create_user(username="old", password="password123"))
+        content_type = ContentType.objects.get_for_model(Stock)
+        cls.kept, cls.deleted, cls.blocked, cls.late = (
+            WatchlistItem.objects.create(watchlist=cls.watchlist, content_type=content_type, object_id=object_id)
+            for object_id in (1, 2, 3, 4)
+        )
+
+    def memberships(self):
+        return list(
+            WatchlistMembership.objects.filter(watchlist=self.watchlist).order_by("asset_id").values_list("asset_id", "is_block")
+        )
+
+    def test_catch_up_and_reconcile(self):
+        call_command("backfill_watchlist_memberships", "--all", stdout=StringIO())
+        self.assertEqual(self.memberships(), [(1, False), (2, False), (3, False), (4, False)])
+        # The old code keeps writing until the switch
+        self.deleted.delete()
+        WatchlistItem.objects.filter(id=self.blocked.id).update(is_block=True)
+        added = WatchlistItem.objects.create(
+            watchlist=self.watchlist, content_type=self.kept.content_type, object_id=5
+        )
+        out = StringIO()
+        call_command("backfill_watchlist_memberships", "--after", self.late.id, "--reconcile", stdout=out)
+        self.assertIn(f"copied 1 watchlist items up to id {added.id}", out.getvalue())
+        self.assertEqual(self.memberships(), [(1, False), (3, True), (4, False), (5, False)])
+
+    def test_start_is_required(self):
+        with self.assertRaises(CommandError):
+            call_command("backfill_watchlist_memberships", stdout=StringIO())
+
+
+class WatchlistAddRemoveTests(TestCase):
+    """The sync views through the client, and the async ones (settings.ASYNC_VIEWS) called directly."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username="adder", password="password123")
+        cls.stock = Stock.objects.create(symbol="AAA")
+
+    def setUp(self):
+        cache.clear()
+
+    def sync_request(self, method, path, data):
+        client = authenticated_client(self.user)
+        return getattr(client, method)(f"/core/api/watchlist/{path}/", data, format="json")
+
+    def async_request(self, method, path, data):
+        view = {"add-asset": AddAssetToWatchlistAsyncAPIView, "remove-asset": RemoveAssetFromWatchlistAsyncAPIView}[path]
+        request = getattr(APIRequestFactory(), method)(f"/core/api/watchlist/{path}/", data, format="json")
+        force_authenticate(request, self.user)
+        return async_to_sync(view.as_view())(request)
+
+    def test_add_and_remove(self):
+        for request in (self.sync_request, self.async_request):
+            with self.subTest(request=request.__name__):
+                asset = {"asset_type": "stock", "asset_id": self.stock.id}
+                self.assertEqual(request("post", "add-asset", asset).status_code, 201)
+                response = request("post", "add-asset", asset)
+                self.assertEqual((response.status_code, response.data["message"]), (200, "Asset already in watchlist."))
+                self.assertEqual(request("delete", "remove-asset", asset).status_code, 200)
+                self.assertEqual(request("delete", "remove-asset", asset).status_code, 404)
+
+    def test_concurrent_add_is_a_repeat(self):
+        watchlist = Watchlist.objects.get(user=self.user)
+        WatchlistMembership.objects.create(watchlist=watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=self.stock.id)
+        get = QuerySet.get
+
+        def added_meanwhile(queryset, *args, **kwargs):
+            # The lookup misses, as if another request inserted the row right after it
+            if queryset.model is WatchlistMembership and not looked_up:
+                looked_up.append(True)
+                raise WatchlistMembership.DoesNotExist
+            return get(queryset, *args, **kwargs)
+
+        for request in (self.sync_request, self.async_request):
+            looked_up = []
+            with self.subTest(request=request.__name__), mock.patch.object(QuerySet, "get", added_meanwhile):
+                response = request("post", "add-asset", {"asset_type": "stock", "asset_id": self.stock.id})
+                self.assertEqual((response.status_code, response.data["message"]), (200, "Asset already in watchlist."))
+                self.assertEqual(looked_up, [True])
+
+    def test_asset_id_must_be_an_integer(self):
+        for request in (self.sync_request, self.async_request):
+            for method, path in (("post", "add-asset"), ("delete", "remove-asset")):
+                with self.subTest(request=request.__name__, path=path):
+                    response = request(method, path, {"asset_type": "stock", "asset_id": "abc"})
+                    self.assertEqual(response.status_code, 400)
+
+
+class WatchlistReorderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username="sorter", password="password123")
+        cls.watchlist = Watchlist.objects.get(user=cls.user)
+        cls.stocks = [Stock.objects.create(symbol=f"S{n}").id for n in range(5)]
+        WatchlistMembership.objects.bulk_create([
+            WatchlistMembership(
+                watchlist=cls.watchlist, asset_kind=WatchlistMembership.STOCK, asset_id=stock_id,
+                position=n * POSITION_GAP, is_block=n == 2,
+            )
+            for n, stock_id in enumerate(cls.stocks)
+        ])
+
+    def move(self, stock_id, index):
+        asset = {"asset_type": "stock", "asset_id": stock_id, "index": index}
+        return authenticated_client(self.user).post(f"/core/api/watchlists/{self.watchlist.id}/reorder/", asset, format="json")
+
+    def order(self):
+        return [asset_id for _, asset_id in list_order(self.watchlist)]
+
+    def test_moves(self):
+        s0, s1, s2, s3, s4 = self.stocks
+        self.assertEqual(self.move(s4, 0).status_code, 200)
+        self.assertEqual(self.order(), [s4, s0, s1, s3])
+        self.move(s0, 99)
+        self.assertEqual(self.order(), [s4, s1, s3, s0])
+        # Blocked assets can't be moved
+        self.assertEqual(self.move(s2, 0).status_code, 404)
+
+    def test_renumbering_keeps_blocked_rows_in_place(self):
+        s0, s1, s2, s3, s4 = self.stocks
+        # Two assets take turns moving into the same slot until its gap runs out
+        for i in range(2 * POSITION_GAP.bit_length()):
+            self.move((s3, s4)[i % 2], 1)
+            self.assertEqual(self.order()[:2], [s0, (s3, s4)[i % 2]])
+        self.assertEqual(self.order(), [s0, s4, s3, s1])
+        WatchlistMembership.objects.filter(asset_id=s2).update(is_block=False)
+        # s2 sat between s1 and s3 before the moves, and still follows s1
+        self.assertEqual(self.order(), [s0, s4, s3, s1, s2])
+
+    def test_items_are_identified_by_asset(self):
+        response = authenticated_client(self.user).get("/core/api/market-data/?data_type=watchlists")
+        items = json.loads(response.content)["watchlists"][0]["items"]
+        s0, s1, s2, s3, s4 = self.stocks
+        self.assertEqual([(item["asset_type"], item["asset_id"]) for item in items], [("stock", s) for s in (s0, s1, s3, s4)])
+
+
+class MarketSummaryTests(TestCase):
+    def test_rollup_counts(self):
+        exchange = Exchange.objects.create(name="NSE", country="India")
+        energy, banks = Sector.objects.create(name="Energy"), Sector.objects.create(name="Banks")
+        for symbol, sector, last, previous, is_block in (
+            ("UP", energy, 110, 100, False),
+            ("DOWN", energy, 90, 100, False),
+            ("FLAT", banks, 100, 100, False),
+            ("HIDDEN", banks, 500, 100, True),
+        ):
+            Stock.objects.create(
+                symbol=symbol, exchange=exchange, sector=sector, last_price=last, previous_close_price=previous, is_block=is_block
+            )
+        refresh_summaries()
+
+        fields = ("stock_count", "advancers", "decliners", "unchanged", "avg_change_percentage")
+        self.assertEqual(
+            SectorSummary.objects.filter(sector=energy).values_list(*fields).get(), (2, 1, 1, 0, Decimal("0.0000"))
+        )
+        self.assertEqual(
+            SectorSummary.objects.filter(sector=banks).values_list(*fields).get(), (1, 0, 0, 1, Decimal("0.0000"))
+        )
+        self.assertEqual(
+            ExchangeSummary.objects.filter(exchange=exchange).values_list(*fields).get(), (3, 1, 1, 1, Decimal("0.0000"))
+        )
+
+        # A sector left without unblocked stocks loses its summary
+        Stock.objects.filter(symbol="FLAT").update(is_block=True)
+        refresh_summaries()
+        self.assertFalse(SectorSummary.objects.filter(sector=banks).exists())
+
+
+class CompactLayoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        exchange = Exchange.objects.create(name="NSE", country="India")
+        cls.sector = Sector.objects.create(name="Energy")
+        cls.blocked_sector = Sector.objects.create(name="Hidden", is_block=True)
+        cls.stock = Stock.objects.create(
+            symbol="AAA", exchange=exchange, sector=cls.sector, last_price=110, previous_close_price=100
+        )
+        Stock.objects.create(symbol="BBB", exchange=exchange, sector=cls.blocked_sector)
+        Stock.objects.create(symbol="CCC", exchange=exchange, is_block=True)
+        cls.user = CustomUser.objects.create_user(username="compact", password="password123")
+        WatchlistMembership.objects.create(
+            watchlist=Watchlist.objects.get(user=cls.user), asset_kind=WatchlistMembership.STOCK, asset_id=cls.stock.id
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, client, layout=""):
+        response = client.get(f"/core/api/market-data/?data_type=indian_stocks&format=compact{layout}")
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_rows(self):
+        payload = self.get(authenticated_client(self.user))
+        self.assertEqual(set(payload), {"lookups", "indian_stocks", "watchlisted"})
+        rows = {row["symbol"]: row for row in payload["indian_stocks"]}
+        self.assertEqual(set(rows), {"AAA", "BBB"})
+        self.assertEqual(rows["AAA"]["sector"], self.sector.id)
+        self.assertEqual(rows["AAA"]["last_price"], "110.00")
+        self.assertEqual(rows["AAA"]["price_difference_percentage"], 10.0)
+        # Blocked sectors are left out of the lookups, and their stocks point at none
+        self.assertIsNone(rows["BBB"]["sector"])
+        self.assertEqual(list(payload["lookups"]["sectors"]), [str(self.sector.id)])
+        self.assertEqual(payload["lookups"]["sectors"][str(self.sector.id)]["name"], "Energy")
+        self.assertEqual(payload["watchlisted"], {"stock": [self.stock.id], "mutualfund": [], "index": []})
+
+    def test_columns(self):
+        payload = self.get(APIClient(), "&layout=columns")
+        group = payload["indian_stocks"]
+        self.assertEqual(set(group), {"columns", "rows"})
+        symbol = group["columns"].index("symbol")
+        self.assertEqual(sorted(row[symbol] for row in group["rows"]), ["AAA", "BBB"])
+        self.assertTrue(all(len(row) == len(group["columns"]) for row in group["rows"]))
+        self.assertEqual(payload["watchlisted"], {"stock": [], "mutualfund": [], "index": []})
+
+
+class SoftBlockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        exchange = Exchange.objects.create(name="NSE", country="India")
+        cls.stock = Stock.objects.create(symbol="AAA", exchange=exchange)
+        cls.user = CustomUser.objects.create_user(username="blocked", password="password123")
+
+    def setUp(self):
+        cache.clear()
+        self.client = authenticated_client(self.user)
+
+    def symbols(self):
+        market_data = json.loads(self.client.get("/core/api/market-data/?data_type=indian_stocks").content)
+        watchlist = json.loads(self.client.get("/core/api/watchlist/").content)
+        return [row["symbol"] for row in market_data["indian_stocks"]], [row["symbol"] for row in watchlist["stocks"]]
+
+    def set_blocked(self, is_block):
+        self.stock.is_block = is_block
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.save()
+
+    def test_blocked_stocks_are_hidden_until_unblocked(self):
+        asset = {"asset_type": "stock", "asset_id": self.stock.id}
+        self.client.post("/core/api/watchlist/add-asset/", asset, format="json")
+        self.assertEqual(self.symbols(), (["AAA"], ["AAA"]))
+
+        self.set_blocked(True)
+        self.assertEqual(self.symbols(), ([], []))
+        self.assertEqual(self.client.post("/core/api/watchlist/add-asset/", asset, format="json").status_code, 404)
+
+        # The membership was kept, so unblocking restores it
+        self.set_blocked(False)
+        self.assertEqual(self.symbols(), (["AAA"], ["AAA"]))
+
+
+class ThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stocks = [Stock.objects.create(symbol=f"S{n}").id for n in range(3)]
+        cls.user, cls.other = (
+            CustomUser.objects.create_user(username=username, password="password123") for username in ("first", "second")
+        )
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(ScopedTokenBucketThrottle, "THROTTLE_RATES", {"watchlist_write_user": "2/min"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, user, stock_id):
+        asset = {"asset_type": "stock", "asset_id": stock_id}
+        return authenticated_client(user).post("/core/api/watchlist/add-asset/", asset, format="json")
+
+    def test_writes_are_limited_per_user(self):
+        self.assertEqual([self.add(self.user, stock_id).status_code for stock_id in self.stocks[:2]], [201, 201])
+        response = self.add(self.user, self.stocks[2])
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(self.add(self.other, self.stocks[2]).status_code, 201)
@@ -0,0 +1,104 @@
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class ScopedTokenBucketThrottle(ScopedRateThrottle):
+    """
+    Rate limit for views that set `throttle_scope`, kept with atomic cache operations.
+
+    DRF's throttles store a timestamp list per client and rewrite it on every request,
+    which is a read-modify-write race across workers. Here each client has one counter
+    per fixed window, bumped with cache.add + cache.incr, and the previous window's
+    count is weighted by how much of it still overlaps the sliding window. That behaves
+    like a token bucket of `num_requests` tokens refilled evenly over the period, costs
+    three cache round trips and stays exact under concurrency.
+
+    Rates come from DEFAULT_THROTTLE_RATES under "<scope>_<rate_suffix>"; a scope with
+    no rate for this throttle is not limited by it.
+    """
+
+    rate_suffix = None
+    cache_format = 'throttle_%(scope)s_%(suffix)s_%(ident)s'
+
+    def get_rate(self):
+        return self.THROTTLE_RATES.get(f"{self.scope}_{self.rate_suffix}")
+
+    def get_ident_for(self, request):
+        raise NotImplementedError('.get_ident_for() must be overridden')
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_for(request)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'suffix': self.rate_suffix, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f"{self.key}_{window}"
+
+        # Windows live for two periods so the next window can still read this one
+        self.cache.add(current_key, 0, timeout=self.duration * 2)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(current_key, 1, timeout=self.duration * 2)
+            self.current = 1
+        self.previous = self.cache.get(f"{self.key}_{window - 1}", 0)
+
+        self.elapsed = self.now - window * self.duration
+        weight = 1 - self.elapsed / self.duration
+        if self.previous * weight + self.current <= self.num_requests:
+            return True
+
+        # Rejected requests do not use up capacity
+        self.cache.decr(current_key)
+        self.current -= 1
+        return False
+
+    def wait(self):
+        """Seconds until the sliding estimate leaves room for one more request."""
+        room = self.num_requests - self.current - 1
+        if self.previous and room >= 0:
+            # Solve previous * (1 - (elapsed + t) / duration) <= room for t
+            return max(0.0, (1 - room / self.previous) * self.duration - self.elapsed)
+        # This window is full on its own: wait for the next one, then for this
+        # window's count to slide out far enough
+        slide = max(0.0, (1 - (self.num_requests - 1) / self.current) * self.duration)
+        return self.duration - self.elapsed + slide
+
+
+class UserTokenBucketThrottle(ScopedTokenBucketThrottle):
+    """Per-user limit (`<scope>_user` rate); anonymous requests are left to the IP throttle."""
+
+    rate_suffix = 'user'
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPTokenBucketThrottle(ScopedTokenBucketThrottle):
+    """
+    Per-client-IP limit (`<scope>_ip` rate), applied to every request in the scope. The
+    address comes from REMOTE_ADDR, or from X-Forwarded-For only as far as NUM_PROXIES
+    trusted proxies vouch for it, so rotating the header doesn't reset the limit.
+    """
+
+    rate_suffix = 'ip'
+
+    def get_ident_for(self, request):
+        return self.get_ident(request)
@@ -1,11 +1,30 @@
 # core/urls.py
+from django.conf import settings
 from django.urls import path
-from core.views import MarketDataGroupedAPIView,AddAssetToWatchlistAPIView,WatchlistAPIView,RemoveAssetFromWatchlistAPIView
+from core.views import (
+    DatabasePoolStatsAPIView, MarketDataChangesAPIView, ReorderWatchlistAPIView, WatchlistDetailAPIView, WatchlistsAPIView,
+)
+
+if settings.ASYNC_VIEWS:
+    # Experimental coroutine views for the ASGI (uvicorn) deployment; see settings.ASYNC_VIEWS
+    from core.async_views import (
+        MarketDataGroupedAsyncAPIView as MarketDataGroupedAPIView,
+        AddAssetToWatchlistAsyncAPIView as AddAssetToWatchlistAPIView,
+        WatchlistAsyncAPIView as WatchlistAPIView,
+        RemoveAssetFromWatchlistAsyncAPIView as RemoveAssetFromWatchlistAPIView,
+    )
+else:
+    from core.views import MarketDataGroupedAPIView,AddAssetToWatchlistAPIView,WatchlistAPIView,RemoveAssetFromWatchlistAPIView
 
 urlpatterns = [
     path("api/market-data/", MarketDataGroupedAPIView.as_view(), name="market-data-grouped"),
+    path("api/market-data/changes/", MarketDataChangesAPIView.as_view(), name="market-data-changes"),
     path('api/watchlist/add-asset/', AddAssetToWatchlistAPIView.as_view(), name='add-asset-to-watchlist'),
     path('api/watchlist/', WatchlistAPIView.as_view(), name='watchlist'),
-    path('api/watchlist/remove-asset/',RemoveAssetFromWatchlistAPIView.as_view(),name='remove-asset-from-watchlist')
+    path('api/watchlist/remove-asset/',RemoveAssetFromWatchlistAPIView.as_view(),name='remove-asset-from-watchlist'),
+    path('api/watchlists/', WatchlistsAPIView.as_view(), name='watchlists'),
+    path('api/watchlists/<int:watchlist_id>/', WatchlistDetailAPIView.as_view(), name='watchlist-detail'),
+    path('api/watchlists/<int:watchlist_id>/reorder/', ReorderWatchlistAPIView.as_view(), name='reorder-watchlist'),
+    path('api/db-pool-stats/', DatabasePoolStatsAPIView.as_view(), name='db-pool-stats'),
 
 ]
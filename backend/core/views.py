@@ -1,102 +1,84 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from django.core.cache import cache
-from core.models import Stock, Index, MutualFund, Watchlist,WatchlistItem
+from core.models import Stock, Index, MutualFund, Watchlist, WatchlistMembership, visible_objects
 from core.serializers import StockSerializer, IndexSerializer, MutualFundSerializer, WatchlistSerializer
-from django.contrib.contenttypes.models import ContentType
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework import status
 from accounts.models import CustomUser
-
-CACHE_TIMEOUT = 60  # seconds
+from rest_framework.settings import api_settings
+from core.market_data import parse_data_types, parse_layout, get_payload, get_encoded_body, invalidate_user_groups
+from core.compression import negotiate_encoding, encoded_response
+from core.renderers import CompactJSONRenderer
+from core.changes import changes_since, current_version, VersionExpired
+from core.db import pool_stats
+from core.metrics import registry
+from core.watchlists import (
+    asset_kind, get_watchlist, in_list_order, move_membership, next_position, parse_asset_id, user_watchlists,
+)
 
 
 class MarketDataGroupedAPIView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
-
-    def get_cached_or_fetch(self, cache_key, fetch_func):
-        data = cache.get(cache_key)
-        if data is not None:
-            return data
-        data = fetch_func()
-        cache.set(cache_key, data, timeout=CACHE_TIMEOUT)
-        return data
+    read_replica = True
+    throttle_scope = 'market_data'
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CompactJSONRenderer]
 
     def get(self, request, *args, **kwargs):
         user = request.user if request.user.is_authenticated else None
-        data_types = request.query_params.get("data_type", "indian_stocks")
-        requested_types = [t.strip() for t in data_types.split(",")]
-
-        response_data = {}
-
-        if "indian_stocks" in requested_types:
-            response_data["indian_stocks"] = self.get_cached_or_fetch(
-                "indian_stocks",
-                lambda: StockSerializer(
-                    Stock.objects.filter(exchange__country="India"),
-                    many=True,
-                    context={"user": user}
-                ).data
-            )
-
-        if "us_stocks" in requested_types:
-            response_data["us_stocks"] = self.get_cached_or_fetch(
-                "us_stocks",
-                lambda: StockSerializer(
-                    Stock.objects.filter(exchange__country="USA"),
-                    many=True,
-                    context={"user": user}
-                ).data
-            )
-
-        if "indian_indexes" in requested_types:
-            response_data["indian_indexes"] = self.get_cached_or_fetch(
-                "indian_indexes",
-                lambda: IndexSerializer(
-                    Index.objects.filter(country__iexact="India"),
-                    many=True
-                ).data
-            )
-
-        if "global_indexes" in requested_types:
-            response_data["global_indexes"] = self.get_cached_or_fetch(
-                "global_indexes",
-                lambda: IndexSerializer(
-                    Index.objects.exclude(country__iexact="India"),
-                    many=True
-                ).data
-            )
-
-        if "mutual_funds" in requested_types:
-            response_data["mutual_funds"] = self.get_cached_or_fetch(
-                "mutual_funds",
-                lambda: MutualFundSerializer(
-                    MutualFund.objects.all(),
-                    many=True,
-                    context={"user": user}
-                ).data
-            )
-
-        if "watchlists" in requested_types and user:
-            cache_key = f"watchlists_user_{user.id}"
-            response_data["watchlists"] = self.get_cached_or_fetch(
-                cache_key,
-                lambda: WatchlistSerializer(
-                    Watchlist.objects.filter(user=user),
-                    many=True,
-                    context={"user": user}
-                ).data
-            )
-        elif "watchlists" in requested_types:
-            response_data["watchlists"] = []
+        names = parse_data_types(request)
+        layout = parse_layout(request)
+
+        # Serve the cached, pre-compressed body unless another renderer (browsable API) was negotiated
+        if request.accepted_renderer.format in ('json', 'compact'):
+            return encoded_response(*get_encoded_body(names, user, negotiate_encoding(request), layout))
+
+        response_data = get_payload(names, user, layout)
 
         return Response(response_data)
 
 
 
+# Delta sync: instruments changed since a version (core.changes)
+class MarketDataChangesAPIView(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    read_replica = True
+    throttle_scope = 'market_data'
+
+    def get(self, request, *args, **kwargs):
+        since = request.query_params.get("since")
+        if since is None:
+            # Read the version before fetching the full list, then sync from it
+            return Response({"version": current_version()})
+
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": "since must be a non-negative integer version."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user = request.user if request.user.is_authenticated else None
+        try:
+            return Response(changes_since(since, user))
+        except VersionExpired:
+            return Response(
+                {"error": "Version is too old. Fetch the full market data again."},
+                status=status.HTTP_410_GONE,
+            )
+
+
 class AddAssetToWatchlistAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'watchlist_write'
 
     def post(self, request, *args, **kwargs):
         user = request.user
@@ -109,49 +91,52 @@ class AddAssetToWatchlistAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            watchlist = Watchlist.objects.get(user=user)
-        except Watchlist.DoesNotExist:
+        asset_id = parse_asset_id(asset_id)
+        if asset_id is None:
+            return Response(
+                {"error": "asset_id must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # The given list, or the user's first one
+        watchlist = get_watchlist(user, request.data.get("watchlist_id"))
+        if watchlist is None:
             return Response(
                 {"error": "Watchlist not found. Please contact support."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Validate content type
-        try:
-            content_type = ContentType.objects.get(model=asset_type.lower())
-        except ContentType.DoesNotExist:
+        # Validate asset type
+        kind = asset_kind(asset_type)
+        if kind is None:
             return Response(
                 {"error": f"Invalid asset_type '{asset_type}'."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Validate asset existence
-        model_class = content_type.model_class()
+        # Validate asset existence; blocked assets count as missing
+        model_class = WatchlistMembership.ASSET_MODELS[kind]
         try:
-            asset_instance = model_class.objects.get(id=asset_id)
+            asset_instance = visible_objects(model_class).get(id=asset_id)
         except model_class.DoesNotExist:
             return Response(
                 {"error": f"{asset_type} with id {asset_id} not found."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Check if already added
-        exists = WatchlistItem.objects.filter(
+        # Add at the end of the list, unless already there (a primary key lookup). A concurrent
+        # add of the same asset loses on the primary key and is answered like a repeat.
+        _, created = WatchlistMembership.objects.get_or_create(
             watchlist=watchlist,
-            content_type=content_type,
-            object_id=asset_id,
-        ).exists()
+            asset_kind=kind,
+            asset_id=asset_instance.id,
+            defaults={"position": lambda: next_position(watchlist)},
+        )
 
-        if exists:
+        if not created:
             return Response({"message": "Asset already in watchlist."}, status=status.HTTP_200_OK)
 
-        # Create watchlist item
-        WatchlistItem.objects.create(
-            watchlist=watchlist,
-            content_type=content_type,
-            object_id=asset_id,
-        )
+        invalidate_user_groups(user)
 
         return Response({"message": "Asset added to watchlist."}, status=status.HTTP_201_CREATED)
 
@@ -159,28 +144,21 @@ class AddAssetToWatchlistAPIView(APIView):
 #fetch from watchlist
 class WatchlistAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    read_replica = True
 
     def get(self, request):
         user = request.user
-        watchlist = Watchlist.objects.filter(user=user).first()
+        watchlist = get_watchlist(user, request.query_params.get("watchlist_id"))
 
         if not watchlist:
             return Response({"error": "No watchlist found"}, status=404)
 
-        # Fetch grouped items
-        stock_ct = ContentType.objects.get_for_model(Stock)
-        mf_ct = ContentType.objects.get_for_model(MutualFund)
-        index_ct = ContentType.objects.get_for_model(Index)
-
-        stocks = Stock.objects.filter(
-            id__in=watchlist.items.filter(content_type=stock_ct).values_list('object_id', flat=True)
-        )
-        mfs = MutualFund.objects.filter(
-            id__in=watchlist.items.filter(content_type=mf_ct).values_list('object_id', flat=True)
-        )
-        indexes = Index.objects.filter(
-            id__in=watchlist.items.filter(content_type=index_ct).values_list('object_id', flat=True)
+        # Fetch grouped items, in list order
+        stocks = in_list_order(watchlist, WatchlistMembership.STOCK, Stock.objects.unblocked()).select_related(
+            'exchange', 'sector', 'index'
         )
+        mfs = in_list_order(watchlist, WatchlistMembership.MUTUAL_FUND, MutualFund.objects.all())
+        indexes = in_list_order(watchlist, WatchlistMembership.INDEX, Index.objects.unblocked())
 
         return Response({
             "stocks": StockSerializer(stocks, many=True).data,
@@ -192,6 +170,7 @@ class WatchlistAPIView(APIView):
 
 class RemoveAssetFromWatchlistAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'watchlist_write'
 
     def delete(self, request, *args, **kwargs):
         user = request.user
@@ -204,41 +183,182 @@ class RemoveAssetFromWatchlistAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            watchlist = Watchlist.objects.get(user=user)
-        except Watchlist.DoesNotExist:
+        asset_id = parse_asset_id(asset_id)
+        if asset_id is None:
+            return Response(
+                {"error": "asset_id must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        watchlist = get_watchlist(user, request.data.get('watchlist_id'))
+        if watchlist is None:
             return Response(
                 {'error': 'Watchlist not found. Please contact support.'},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Validate content type
-        try:
-            content_type = ContentType.objects.get(model=asset_type.lower())
-        except ContentType.DoesNotExist:
+        # Validate asset type
+        kind = asset_kind(asset_type)
+        if kind is None:
             return Response(
                 {"error": f"Invalid asset_type '{asset_type}'."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Validate asset existence
-        model_class = content_type.model_class()
+        # Validate asset existence; blocked assets count as missing
+        model_class = WatchlistMembership.ASSET_MODELS[kind]
         try:
-            asset_instance = model_class.objects.get(id=asset_id)
+            asset_instance = visible_objects(model_class).get(id=asset_id)
         except model_class.DoesNotExist:
             return Response(
                 {"error": f"{asset_type} with id {asset_id} not found."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Delete asset from watchlist
-        deleted, _ = WatchlistItem.objects.filter(
-            watchlist=watchlist,
-            content_type=content_type,
-            object_id=asset_id,
+        # Delete asset from watchlist. Through the list's manager, so the deleted rows come with
+        # `watchlist` set and the watch-count signal (core.signals) needn't fetch it
+        deleted, _ = watchlist.memberships.filter(
+            asset_kind=kind,
+            asset_id=asset_instance.id,
         ).delete()
 
         if deleted:
+            invalidate_user_groups(user)
             return Response({"message": "Asset removed from watchlist."}, status=status.HTTP_200_OK)
         else:
             return Response({"error": "Asset not found in watchlist."}, status=status.HTTP_404_NOT_FOUND)
+
+
+def _watchlist_name(data):
+    """The stripped `name` from request data, or None if it is missing or too long."""
+    name = str(data.get("name") or "").strip()
+    if not name or len(name) > Watchlist._meta.get_field("name").max_length:
+        return None
+    return name
+
+
+# Every list of the user with its assets, in list order, in a fixed number of queries
+class WatchlistsAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    read_replica = True
+    throttle_scope = 'watchlist_write'
+
+    def get_throttles(self):
+        # Only creating a list counts against the write budget
+        if self.request.method == 'GET':
+            return []
+        return super().get_throttles()
+
+    def get(self, request):
+        watchlists = user_watchlists(request.user)
+        return Response(WatchlistSerializer(watchlists, many=True, context={"user": request.user}).data)
+
+    def post(self, request, *args, **kwargs):
+        name = _watchlist_name(request.data)
+        if name is None:
+            return Response(
+                {"error": "name is required and must be at most 100 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        watchlist = Watchlist.objects.create(user=request.user, name=name)
+        invalidate_user_groups(request.user)
+        data = WatchlistSerializer([watchlist], many=True, context={"user": request.user}).data[0]
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class WatchlistDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'watchlist_write'
+
+    def patch(self, request, watchlist_id):
+        watchlist = get_watchlist(request.user, watchlist_id)
+        if watchlist is None:
+            return Response({"error": "Watchlist not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        name = _watchlist_name(request.data)
+        if name is None:
+            return Response(
+                {"error": "name is required and must be at most 100 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        watchlist.name = name
+        watchlist.save(update_fields=["name", "updated_at"])
+        invalidate_user_groups(request.user)
+        return Response({"id": watchlist.id, "name": watchlist.name}, status=status.HTTP_200_OK)
+
+    def delete(self, request, watchlist_id):
+        watchlist = get_watchlist(request.user, watchlist_id)
+        if watchlist is None:
+            return Response({"error": "Watchlist not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        # Add/remove without a watchlist_id go to the first list, so one always remains
+        if not Watchlist.objects.unblocked().filter(user=request.user).exclude(id=watchlist.id).exists():
+            return Response(
+                {"error": "Cannot delete the only watchlist."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        watchlist.delete()
+        invalidate_user_groups(request.user)
+        return Response({"message": "Watchlist deleted."}, status=status.HTTP_200_OK)
+
+
+# Moves one asset within a list; only its row is written (core.watchlists.move_membership)
+class ReorderWatchlistAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'watchlist_write'
+
+    def post(self, request, watchlist_id):
+        asset_type = request.data.get("asset_type")
+        asset_id = request.data.get("asset_id")
+        index = request.data.get("index")
+
+        if not all([asset_type, asset_id]) or index is None:
+            return Response(
+                {"error": "asset_type, asset_id and index are required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        kind = asset_kind(asset_type)
+        try:
+            asset_id = int(asset_id)
+            index = int(index)
+        except (TypeError, ValueError):
+            kind = None
+        if kind is None:
+            return Response(
+                {"error": "asset_type must be stock, mutualfund or index; asset_id and index integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        watchlist = get_watchlist(request.user, watchlist_id)
+        if watchlist is None:
+            return Response({"error": "Watchlist not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if not move_membership(watchlist, kind, asset_id, index):
+            return Response({"error": "Asset not found in watchlist."}, status=status.HTTP_404_NOT_FOUND)
+
+        invalidate_user_groups(request.user)
+        return Response({"message": "Watchlist reordered."}, status=status.HTTP_200_OK)
+
+
+# Connection pool sizing and wait-time counters
+class DatabasePoolStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_stats())
+
+
+# Prometheus scrape target; a plain Django view, so no JWT auth or throttling. Behind a proxy
+# every request comes from the proxy's address, so access takes METRICS_TOKEN, not an IP check.
+class MetricsView(View):
+    def get(self, request):
+        if not settings.METRICS_TOKEN:
+            raise Http404
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(token, settings.METRICS_TOKEN):
+            return HttpResponseForbidden()
+        return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,226 @@
+"""
+Watchlists and their contents (WatchlistMembership): finding a user's lists, asset
+kinds, loading the assets behind memberships, ordering, and the batched copy from the
+old WatchlistItem table.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Max, OuterRef, Prefetch, Subquery, Value, When
+from core.models import Watchlist, WatchlistMembership, visible_objects
+
+# "stock" -> WatchlistMembership.STOCK, ...; the asset_type values the endpoints accept
+ASSET_KINDS = {name: kind for kind, name in WatchlistMembership.ASSET_KIND_CHOICES}
+
+# Spacing of the positions handed out by appends and renumbering: about 20 moves into the
+# same spot halve a gap down to nothing before the list has to be renumbered
+POSITION_GAP = 1 << 20
+
+
+def user_watchlists(user):
+    """The user's lists, oldest first, with their memberships prefetched in list order."""
+    return Watchlist.objects.unblocked().filter(user=user).order_by("id").prefetch_related(
+        Prefetch("memberships", queryset=WatchlistMembership.objects.unblocked().order_by("position", "created_at"))
+    )
+
+
+def get_watchlist(user, watchlist_id=None):
+    """The user's list with that id, or their first (default) list; None if there is no such list."""
+    watchlists = Watchlist.objects.unblocked().filter(user=user).order_by("id")
+    if watchlist_id is None:
+        return watchlists.first()
+    try:
+        return watchlists.filter(id=int(watchlist_id)).first()
+    except (TypeError, ValueError):
+        return None
+
+
+def asset_kind(asset_type):
+    """The asset kind for an asset_type name, or None if it isn't one."""
+    return ASSET_KINDS.get(str(asset_type).lower())
+
+
+def parse_asset_id(asset_id):
+    """`asset_id` from request data as an int, or None if it isn't one."""
+    try:
+        return int(asset_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def attach_assets(memberships):
+    """
+    Sets `asset` on each membership, in one query per asset kind present. Blocked or
+    deleted assets are left as None.
+    """
+    ids_by_kind = {}
+    for membership in memberships:
+        ids_by_kind.setdefault(membership.asset_kind, set()).add(membership.asset_id)
+    assets = {}
+    for kind, ids in ids_by_kind.items():
+        queryset = visible_objects(WatchlistMembership.ASSET_MODELS[kind]).filter(id__in=ids)
+        if kind == WatchlistMembership.STOCK:
+            queryset = queryset.select_related("exchange", "sector", "index")
+        assets.update(((kind, asset.id), asset) for asset in queryset)
+    for membership in memberships:
+        membership.asset = assets.get((membership.asset_kind, membership.asset_id))
+
+
+def in_list_order(watchlist, kind, queryset):
+    """The assets in `queryset` that are in the list as `kind`, in list order."""
+    memberships = watchlist.memberships.unblocked().filter(asset_kind=kind)
+    position = memberships.filter(asset_id=OuterRef("id")).values("position")
+    # The subqueries are ranges of the membership primary key
+    return queryset.filter(id__in=memberships.values("asset_id")).alias(
+        watchlist_position=Subquery(position)
+    ).order_by("watchlist_position")
+
+
+def next_position(watchlist):
+    """Position for an asset added to the end of the list."""
+    last = watchlist.memberships.aggregate(last=Max("position"))["last"]
+    return POSITION_GAP if last is None else last + POSITION_GAP
+
+
+def _between(before, after):
+    """A position strictly between two neighbours (None for either end), or None if there is no room."""
+    if before is None and after is None:
+        return 0
+    if before is None:
+        return after - POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+
+def _neighbours(rows, index):
+    """Positions of the rows just above and below `index`, None past either end."""
+    return (
+        rows[index - 1][2] if index > 0 else None,
+        rows[index][2] if index < len(rows) else None,
+    )
+
+
+def move_membership(watchlist, kind, asset_id, index):
+    """
+    Moves an asset to `index` among the list's unblocked assets (0 is the top, past the end is the bottom) by
+    giving it a position between its new neighbours, so only its row is written. When the
+    neighbours have no room left between them, the list is renumbered first, in one UPDATE.
+    Blocked rows are renumbered too, keeping their place, so unblocking one puts it back where
+    it was. Returns False if the asset is not an unblocked member of the list.
+    """
+    with transaction.atomic():
+        # Locked so concurrent moves in the same list can't pick the same position
+        rows = list(
+            watchlist.memberships.select_for_update().order_by("position", "created_at")
+            .values_list("asset_kind", "asset_id", "position", "is_block")
+        )
+        if (kind, asset_id, False) not in {(row_kind, row_id, is_block) for row_kind, row_id, _, is_block in rows}:
+            return False
+        others = [row for row in rows if row[:2] != (kind, asset_id)]
+        visible = [row for row in others if not row[3]]
+        index = max(0, min(index, len(visible)))
+
+        position = _between(*_neighbours(visible, index))
+        if position is None:
+            others = [(row_kind, row_id, (i + 1) * POSITION_GAP, is_block)
+                      for i, (row_kind, row_id, _, is_block) in enumerate(others)]
+            watchlist.memberships.update(position=Case(
+                *(When(asset_kind=row_kind, asset_id=row_id, then=Value(row_position))
+                  for row_kind, row_id, row_position, _ in others),
+                default=F("position"),
+                output_field=BigIntegerField(),
+            ))
+            visible = [row for row in others if not row[3]]
+            position = _between(*_neighbours(visible, index))
+        watchlist.memberships.filter(asset_kind=kind, asset_id=asset_id).update(position=position)
+    return True
+
+
+def copy_watchlist_items(item_model, membership_model, kinds, after=0, batch_size=5000, sleep=0.0, using="default"):
+    """
+    Copies WatchlistItem rows with id > `after` into WatchlistMembership, `batch_size` per
+    transaction, so it runs next to live traffic. Rows already copied are skipped, so it
+    can be rerun to catch up. `kinds` maps content type ids to asset kinds
+    (kinds_by_content_type). Returns (items read, last item id).
+    """
+    read = 0
+    while True:
+        with transaction.atomic(using=using):
+            items = list(
+                item_model.objects.using(using).filter(id__gt=after).order_by("id").values_list(
+                    "id", "watchlist_id", "content_type_id", "object_id", "created_at", "is_block"
+                )[:batch_size]
+            )
+            if not items:
+                return read, after
+            membership_model.objects.using(using).bulk_create(
+                [
+                    membership_model(
+                        watchlist_id=watchlist_id, asset_kind=kinds[content_type_id],
+                        asset_id=object_id, created_at=created_at, is_block=is_block,
+                    )
+                    for _, watchlist_id, content_type_id, object_id, created_at, is_block in items
+                    if content_type_id in kinds
+                ],
+                ignore_conflicts=True,
+            )
+        read += len(items)
+        after = items[-1][0]
+        if sleep:
+            time.sleep(sleep)
+
+
+def reconcile_watchlist_memberships(item_model, membership_model, kinds, batch_size=500, sleep=0.0):
+    """
+    Applies what the old code did to already-copied WatchlistItem rows: memberships whose
+    item was deleted are removed and is_block follows the item. Walks the lists by id,
+    `batch_size` lists per transaction. Only for before the switch: memberships the new
+    code adds have no item and would be removed. Returns (removed, updated).
+    """
+    removed = updated = 0
+    after = 0
+    while True:
+        with transaction.atomic():
+            watchlist_ids = list(
+                membership_model.objects.filter(watchlist_id__gt=after).order_by("watchlist_id")
+                .values_list("watchlist_id", flat=True).distinct()[:batch_size]
+            )
+            if not watchlist_ids:
+                return removed, updated
+            items = {
+                (watchlist_id, kinds[content_type_id], object_id): is_block
+                for watchlist_id, content_type_id, object_id, is_block in item_model.objects.filter(
+                    watchlist_id__in=watchlist_ids, content_type_id__in=list(kinds)
+                ).values_list("watchlist_id", "content_type_id", "object_id", "is_block")
+            }
+            missing = []
+            blocked = {True: [], False: []}
+            for *key, is_block in membership_model.objects.filter(watchlist_id__in=watchlist_ids).values_list(
+                "watchlist_id", "asset_kind", "asset_id", "is_block"
+            ):
+                key = tuple(key)
+                if key not in items:
+                    missing.append(key)
+                elif items[key] != is_block:
+                    blocked[items[key]].append(key)
+            if missing:
+                removed += membership_model.objects.filter(pk__in=missing).delete()[0]
+            for is_block, keys in blocked.items():
+                if keys:
+                    updated += membership_model.objects.filter(pk__in=keys).update(is_block=is_block)
+        after = watchlist_ids[-1]
+        if sleep:
+            time.sleep(sleep)
+
+
+def kinds_by_content_type(content_type_model, using="default"):
+    """{content type id: asset kind} for the asset models; unknown ones are skipped by the copy."""
+    return dict(
+        (content_type_id, ASSET_KINDS[model])
+        for content_type_id, model in content_type_model.objects.using(using).filter(
+            app_label="core", model__in=ASSET_KINDS
+        ).values_list("id", "model")
+    )
@@ -3,10 +3,26 @@
 import os
 import sys
 
+# Commands run from cron or as workers: they get the lean backend.settings_worker unless
+# DJANGO_SETTINGS_MODULE or --settings says otherwise
+WORKER_COMMANDS = {
+    'backfill_watchlist_memberships',
+    'import_nav',
+    'import_users',
+    'ingest_prices',
+    'load_index_constituents',
+    'prune_change_log',
+    'prune_token_blacklist',
+    'refresh_market_summaries',
+    'seed_dummy_data',
+}
+
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    settings_module = 'backend.settings_worker' if command in WORKER_COMMANDS else 'backend.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: